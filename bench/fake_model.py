@@ -0,0 +1,147 @@
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from agno.metrics import MessageMetrics
+from agno.models.base import Model
+from agno.models.response import ModelResponse
+from src.models.schemas import TaskSpec, Bid, Contract, ValidationResult
+from src.utils.model_registry import set_model_factory
+from src.agents.base import clear_shared_agents
+
+_WORDS = "the function returns a value for every input and the test suite covers edge cases".split()
+
+def _find(pattern: str, text: str, default: Optional[str] = None) -> Optional[str]:
+    m = re.search(pattern, text)
+    return m.group(1).strip() if m else default
+
+@dataclass
+class FakeModel(Model):
+    """
+    Deterministic, offline stand-in for an Agno model. Structured calls get a
+    schema-valid TaskSpec/Bid/Contract/ValidationResult derived from the prompt;
+    plain calls get filler text. latency (+/- jitter) seconds are spent per call;
+    streamed calls spread it evenly over chunks of chunk_chars characters.
+    """
+    id: str = "fake-model"
+    name: str = "FakeModel"
+    provider: str = "Fake"
+    supports_native_structured_outputs: bool = True
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    pass_rate: float = 0.9
+    output_words: int = 200
+    chunk_chars: int = 64
+    seed: int = 0
+
+    def __post_init__(self):
+        super().__post_init__()
+        self._rng = random.Random(self.seed)
+        self._rng_lock = threading.Lock()
+
+    def _random(self) -> float:
+        with self._rng_lock:
+            return self._rng.random()
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + self.jitter * (2 * self._random() - 1))
+
+    def _respond(self, messages: List[Any], response_format: Any) -> ModelResponse:
+        prompt = next((m.content for m in reversed(messages) if m.role == "user"), "") or ""
+        if isinstance(response_format, type):
+            content = json.dumps(self._structured(response_format, prompt))
+        else:
+            content = " ".join(_WORDS[i % len(_WORDS)] for i in range(self.output_words))
+        usage = MessageMetrics(input_tokens=len(prompt) // 4, output_tokens=len(content) // 4)
+        usage.total_tokens = usage.input_tokens + usage.output_tokens
+        return ModelResponse(role="assistant", content=content, response_usage=usage)
+
+    def _structured(self, schema: type, prompt: str) -> Dict[str, Any]:
+        r = self._random()
+        if schema is TaskSpec:
+            request = _find(r"specification for:(.*)", prompt, prompt)
+            return TaskSpec(
+                task_id=str(uuid.uuid4()),
+                description=request,
+                acceptance_criteria=["Output addresses the request", "Output includes a usage example"],
+                budget=float(_find(r"\$(\d+(?:\.\d+)?)", request, "100")),
+                deadline="3 days",
+                required_skills=["python"],
+            ).model_dump()
+        if schema is Bid:
+            budget = float(_find(r"Budget:\s*([\d.]+)", prompt, "100"))
+            return Bid(
+                bid_id=str(uuid.uuid4()),
+                task_id="",
+                agent_id=_find(r"matches your ID:\s*(\S+)", prompt, "worker"),
+                price=round(budget * (0.5 + 0.6 * r), 2),
+                timeline=f"{1 + int(r * 5)} days",
+                confidence=round(0.5 + 0.45 * r, 2),
+                plan="Break the task down, implement, then test.",
+            ).model_dump()
+        if schema is Contract:
+            return Contract(
+                contract_id=str(uuid.uuid4()),
+                task_id="",
+                selected_worker=_find(r"selected_worker:\s*(\S+)", prompt, "worker"),
+                deliverables=["Implementation", "Tests", "Usage notes"],
+                tests=["Implementation runs without errors", "Tests cover the acceptance criteria"],
+                payment=float(_find(r"payment:\s*([\d.]+)", prompt, "0")),
+                penalty_rules=["10% penalty per day late"],
+            ).model_dump()
+        if schema is ValidationResult:
+            passed = r < self.pass_rate
+            return ValidationResult(
+                task_id="",
+                passed=passed,
+                score=round(70 + 30 * r, 1) if passed else round(60 * r, 1),
+                issues=[] if passed else ["Output misses an acceptance test"],
+                retry_allowed=not passed,
+            ).model_dump()
+        raise ValueError(f"FakeModel cannot produce {schema.__name__}")
+
+    def invoke(self, messages, assistant_message, response_format=None, **kwargs) -> ModelResponse:
+        time.sleep(self._delay())
+        return self._respond(messages, response_format)
+
+    async def ainvoke(self, messages, assistant_message, response_format=None, **kwargs) -> ModelResponse:
+        await asyncio.sleep(self._delay())
+        return self._respond(messages, response_format)
+
+    def _chunks(self, content: str) -> List[str]:
+        return [content[i:i + self.chunk_chars] for i in range(0, len(content), self.chunk_chars)]
+
+    def invoke_stream(self, messages, assistant_message, response_format=None, **kwargs) -> Iterator[ModelResponse]:
+        delay = self._delay()
+        chunks = self._chunks(self._respond(messages, response_format).content)
+        for chunk in chunks:
+            time.sleep(delay / len(chunks))
+            yield ModelResponse(role="assistant", content=chunk)
+
+    async def ainvoke_stream(self, messages, assistant_message, response_format=None, **kwargs) -> AsyncIterator[ModelResponse]:
+        delay = self._delay()
+        chunks = self._chunks(self._respond(messages, response_format).content)
+        for chunk in chunks:
+            await asyncio.sleep(delay / len(chunks))
+            yield ModelResponse(role="assistant", content=chunk)
+
+    def _parse_provider_response(self, response, **kwargs) -> ModelResponse:
+        return response
+
+    def _parse_provider_response_delta(self, response) -> ModelResponse:
+        return response
+
+def install_fake_model(**kwargs) -> None:
+    """Makes every agent built from now on use a FakeModel(**kwargs)."""
+    set_model_factory(lambda model_id, host: FakeModel(id=model_id, **kwargs))
+    clear_shared_agents()
+
+def uninstall_fake_model() -> None:
+    set_model_factory(None)
+    clear_shared_agents()
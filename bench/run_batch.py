@@ -0,0 +1,244 @@
+"""
+Offline batch runner: pushes a file of requests (one per line) through the
+marketplace with FakeModel standing in for Ollama, then reports throughput,
+per-stage latency percentiles and ledger/reputation I/O cost.
+
+    python -m bench.run_batch bench/requests.txt --count 200 --latency 0.02 --concurrency 8
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench.fake_model import install_fake_model
+from src.orchestration import MarketSimulation
+from src.async_orchestration import AsyncMarketSimulation, MarketScheduler
+from src.pipelined_orchestration import PipelinedMarket
+from src.sharded_orchestration import ShardedMarket
+from src.agents.worker_registry import WorkerRegistry
+from src.models.schemas import WorkerProfile
+
+TimedEvent = Tuple[float, Dict[str, Any]]
+
+SKILLS = ["python", "sql", "bash", "writing", "design", "translation", "testing", "data"]
+
+STATE_FILES = ["escrow_ledger.wal", "escrow_ledger.snapshot.json", "escrow_ledger.sqlite3", "escrow_ledger.sqlite3-wal",
+               "reputation_db.sqlite3", "reputation_db.sqlite3-wal"]
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(q / 100.0 * len(ordered))) - 1))
+    return ordered[idx]
+
+def stage_durations(start: float, events: List[TimedEvent]) -> Dict[str, float]:
+    """Attributes the time until the next event to the step of the current one."""
+    durations: Dict[str, float] = defaultdict(float)
+    prev_t, prev_step = start, None
+    for t, event in events:
+        if prev_step is not None:
+            durations[prev_step] += t - prev_t
+        prev_t, prev_step = t, event.get("step")
+    return durations
+
+class IOMeter:
+    """Times calls to persistence methods by wrapping them in place."""
+    def __init__(self):
+        self.calls: Dict[str, List[float]] = defaultdict(list)
+
+    def wrap(self, name: str, obj: Any, method: str):
+        original = getattr(obj, method)
+
+        def _timed(*args, **kwargs):
+            t = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.calls[name].append(time.perf_counter() - t)
+        setattr(obj, method, _timed)
+
+def _instrument(sim: MarketSimulation, meter: IOMeter):
+    for method in ("lock_funds", "release_funds", "refund_funds", "settle_many"):
+        meter.wrap(f"ledger.{method}", sim.escrow.ledger, method)
+    for method in ("update_stats", "update_many"):
+        meter.wrap(f"reputation.{method}", sim.reputation.db, method)
+
+def synthetic_registry(count: int, seed: int) -> WorkerRegistry:
+    rng = random.Random(seed)
+    registry = WorkerRegistry()
+    for i in range(count):
+        low = round(rng.uniform(0.4, 1.0), 2)
+        high = round(low + rng.uniform(0.1, 0.3), 2)
+        registry.register(WorkerProfile(
+            agent_id=f"worker_{i:05d}",
+            persona=f"Synthetic worker #{i}. You charge {int(100 * low)}-{int(100 * high)}% of budget.",
+            skills=rng.sample(SKILLS, rng.randint(0, 3)),
+            price_min=low, price_max=high,
+        ))
+    return registry
+
+def run_sync(sim: MarketSimulation, requests: List[str], concurrency: int) -> List[Tuple[float, List[TimedEvent]]]:
+    def _one(user_request: str):
+        start = time.perf_counter()
+        return start, [(time.perf_counter(), e) for e in sim.run_stream(user_request)]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(_one, requests))
+
+def run_async(sim: AsyncMarketSimulation, requests: List[str], concurrency: int, pipelined: bool = False) -> List[Tuple[float, List[TimedEvent]]]:
+    if pipelined:
+        runner = PipelinedMarket(sim, workers_per_stage=concurrency)
+    else:
+        runner = MarketScheduler(sim, max_concurrent=concurrency)
+
+    async def _all():
+        logs: List[List[TimedEvent]] = [[] for _ in requests]
+        start = time.perf_counter()
+        async for idx, event in runner.stream(requests):
+            logs[idx].append((time.perf_counter(), event))
+        # Transactions start as soon as a slot frees up; approximate with the first event
+        return [(log[0][0] if log else start, log) for log in logs]
+    return asyncio.run(_all())
+
+def run_sharded(market: ShardedMarket, requests: List[str]) -> List[Tuple[float, List[TimedEvent]]]:
+    logs: List[List[TimedEvent]] = [[] for _ in requests]
+    start = time.perf_counter()
+    for idx, event in market.stream(requests):
+        logs[idx].append((time.perf_counter(), event))
+    return [(log[0][0] if log else start, log) for log in logs]
+
+def summarize(results: List[Tuple[float, List[TimedEvent]]], wall: float, meter: IOMeter, workdir: str) -> Dict[str, Any]:
+    stages: Dict[str, List[float]] = defaultdict(list)
+    outcomes: Dict[str, int] = defaultdict(int)
+    for start, events in results:
+        for step, seconds in stage_durations(start, events).items():
+            stages[step].append(seconds)
+        final = events[-1][1] if events else {}
+        outcomes[final.get("status", "error") if final.get("step") == "FINAL" else "error"] += 1
+
+    io = {}
+    for name, calls in meter.calls.items():
+        io[name] = {"ops": len(calls), "mean_us": 1e6 * sum(calls) / len(calls), "total_ms": 1e3 * sum(calls)}
+    bytes_written = sum(os.path.getsize(os.path.join(workdir, f)) for f in STATE_FILES if os.path.exists(os.path.join(workdir, f)))
+
+    return {
+        "transactions": len(results),
+        "outcomes": dict(outcomes),
+        "wall_s": wall,
+        "throughput_tx_s": len(results) / wall if wall else 0.0,
+        "stages_ms": {
+            step: {"count": len(v), "p50": 1e3 * percentile(v, 50), "p95": 1e3 * percentile(v, 95), "p99": 1e3 * percentile(v, 99)}
+            for step, v in stages.items()
+        },
+        "io": io,
+        "state_bytes": bytes_written,
+    }
+
+def print_report(report: Dict[str, Any]):
+    print(f"Transactions: {report['transactions']} {report['outcomes']} in {report['wall_s']:.2f}s "
+          f"-> {report['throughput_tx_s']:.2f} tx/s")
+    print(f"\n{'Stage':<12}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for step, s in report["stages_ms"].items():
+        print(f"{step:<12}{s['count']:>8}{s['p50']:>10.1f}{s['p95']:>10.1f}{s['p99']:>10.1f}")
+    print(f"\n{'Persistence':<28}{'ops':>8}{'mean us':>10}{'total ms':>10}")
+    for name, s in report["io"].items():
+        print(f"{name:<28}{s['ops']:>8}{s['mean_us']:>10.1f}{s['total_ms']:>10.1f}")
+    print(f"State on disk: {report['state_bytes']} bytes")
+    if "broker_fast_path" in report:
+        fp = report["broker_fast_path"]
+        print(f"Broker fast path: {fp['hits']} hits, {fp['partial']} partial, {fp['misses']} misses ({100 * fp['rate']:.0f}% without LLM)")
+
+def load_requests(path: str, count: int) -> List[str]:
+    with open(path, "r") as f:
+        lines = [l.strip().replace("\\n", "\n") for l in f if l.strip() and not l.startswith("#")]
+    if count and lines:
+        lines = (lines * (count // len(lines) + 1))[:count]
+    return lines
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("requests", help="File with one user request per line")
+    parser.add_argument("--count", type=int, default=0, help="Repeat/trim the file to this many requests")
+    parser.add_argument("--mode", choices=["sync", "async", "pipeline", "sharded"], default="sync")
+    parser.add_argument("--concurrency", type=int, default=1, help="Transactions in flight at once (pipeline: workers per stage; sharded: per process)")
+    parser.add_argument("--processes", type=int, help="Worker processes for --mode sharded (default: one per core)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake model seconds per call")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--pass-rate", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the LLM response cache")
+    parser.add_argument("--no-fast-path", action="store_true", help="Always use the LLM broker")
+    parser.add_argument("--workers", type=int, default=0, help="Register this many synthetic workers instead of the default team")
+    parser.add_argument("--top-k", type=int, help="Invite only the K best-matching workers to bid")
+    parser.add_argument("--bid-strategy", choices=["llm", "heuristic", "hybrid"], help="Override every worker's bid strategy")
+    parser.add_argument("--settle-window", type=float, default=0.0, help="Seconds to gather settlements into one batch write")
+    parser.add_argument("--speculative", action="store_true", help="Start execution alongside contract drafting")
+    parser.add_argument("--workdir", help="Directory for ledger/reputation state (default: fresh temp dir)")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    requests = load_requests(args.requests, args.count)
+    json_path = os.path.abspath(args.json) if args.json else None
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="agentbazaar-bench-"))
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+    fake_model = functools.partial(install_fake_model, latency=args.latency, jitter=args.jitter, pass_rate=args.pass_rate, seed=args.seed)
+    if args.mode == "sharded":
+        # Worker processes build their own simulation; only picklable options are passed on
+        if args.workers or args.no_cache or args.no_fast_path:
+            parser.error("--workers, --no-cache and --no-fast-path are not supported with --mode sharded")
+        market = ShardedMarket(processes=args.processes, concurrency=args.concurrency, initializer=fake_model,
+                               simulation_kwargs={"bid_top_k": args.top_k, "bid_strategy": args.bid_strategy,
+                                                  "settle_window": args.settle_window, "speculative_execution": args.speculative})
+        t = time.perf_counter()
+        results = run_sharded(market, requests)
+        report = summarize(results, time.perf_counter() - t, IOMeter(), workdir)
+        report["config"] = {k: v for k, v in vars(args).items() if k != "json"}
+        print_report(report)
+        if json_path:
+            with open(json_path, "w") as f:
+                json.dump(report, f, indent=2)
+        return
+
+    fake_model()
+    registry = synthetic_registry(args.workers, args.seed) if args.workers else None
+    sim_cls = MarketSimulation if args.mode == "sync" else AsyncMarketSimulation
+    sim = sim_cls(registry=registry, bid_top_k=args.top_k, bid_strategy=args.bid_strategy, settle_window=args.settle_window,
+                  speculative_execution=args.speculative)
+    if args.no_cache:
+        for agent in [sim.broker, sim.contractor, sim.executor, sim.validator, *sim.workers]:
+            agent.cache = None
+    sim.broker.fast_path = not args.no_fast_path
+    meter = IOMeter()
+    _instrument(sim, meter)
+
+    t = time.perf_counter()
+    if args.mode != "sync":
+        results = run_async(sim, requests, args.concurrency, pipelined=args.mode == "pipeline")
+    else:
+        results = run_sync(sim, requests, args.concurrency)
+    wall = time.perf_counter() - t
+
+    report = summarize(results, wall, meter, workdir)
+    report["broker_fast_path"] = dict(sim.broker.fast_path_stats, rate=sim.broker.fast_path_rate)
+    report["config"] = {k: v for k, v in vars(args).items() if k != "json"}
+    print_report(report)
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+from src.utils.llm_cache import ResponseCache, get_default_cache, namespace_key, reset_default_cache
+from src.utils.metrics import record_llm_call, record_parse_failure, record_prompt
+from src.utils.structured_output import StructuredOutputError, coerce_output, repair_prompt
+from src.utils.token_budget import estimate_tokens, get_default_budget
+
+@dataclass
+class LLMCall:
+    content: Any
+    cache_hit: bool = False
+    llm_s: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+def _token_usage(response) -> Tuple[int, int]:
+    metrics = getattr(response, "metrics", None)
+    if metrics is None:
+        return 0, 0
+    if isinstance(metrics, dict):
+        # Older Agno releases report per-message lists
+        return sum(metrics.get("input_tokens", []) or [0]), sum(metrics.get("output_tokens", []) or [0])
+    return getattr(metrics, "input_tokens", 0) or 0, getattr(metrics, "output_tokens", 0) or 0
+
+_shared: Dict[tuple, "LLMAgent"] = {}
+_shared_lock = threading.Lock()
+
+def clear_shared_agents():
+    """Drops all shared instances and the default response cache, e.g. after swapping the model factory."""
+    with _shared_lock:
+        _shared.clear()
+    reset_default_cache()
+
+class LLMAgent:
+    """
+    Base for marketplace agents backed by an Agno Agent. Subclasses implement
+    _build_agent; the Agno Agent is only constructed on first use of self.agent.
+    _run and _arun go through the shared ResponseCache unless the agent opted out.
+    Every prompt's estimated size is recorded on the active stage span.
+    """
+    # Model-router role (see src.utils.model_router.ROLES)
+    ROLE: Optional[str] = None
+    # Structured-output guard: unusable replies are re-prompted with the parse error
+    # up to MAX_PARSE_RETRIES times, waiting PARSE_BACKOFF_S * 2**n before retry n
+    MAX_PARSE_RETRIES = 2
+    PARSE_BACKOFF_S = 0.25
+
+    def __init__(self, model_id: str, host: Optional[str] = None,
+                 cache: Optional[ResponseCache] = None, use_cache: bool = True):
+        self.model_id = model_id
+        self.host = host
+        self.cache = (cache or get_default_cache()) if use_cache else None
+        self._namespace = None
+        self._agent = None
+        self._agent_lock = threading.Lock()
+        # Prompt-size limits for compacting oversized inputs (see TokenBudget)
+        self.budget = get_default_budget()
+
+    @classmethod
+    def shared(cls, *args, **kwargs):
+        """Process-wide instance for these arguments, reused across MarketSimulations."""
+        key = (cls, args, tuple(sorted(kwargs.items())))
+        with _shared_lock:
+            instance = _shared.get(key)
+            if instance is None:
+                instance = _shared[key] = cls(*args, **kwargs)
+            return instance
+
+    @classmethod
+    def evict_shared(cls, **match) -> int:
+        """Drops shared instances of cls built with these keyword arguments; returns how many."""
+        with _shared_lock:
+            stale = [key for key in _shared
+                     if key[0] is cls and all(dict(key[2]).get(k, object()) == v for k, v in match.items())]
+            for key in stale:
+                del _shared[key]
+            return len(stale)
+
+    def _build_agent(self):
+        raise NotImplementedError
+
+    @property
+    def agent(self):
+        if self._agent is None:
+            with self._agent_lock:
+                if self._agent is None:
+                    self._agent = self._build_agent()
+        return self._agent
+
+    @property
+    def namespace(self) -> str:
+        if self._namespace is None:
+            self._namespace = namespace_key(
+                self.agent.model.id,
+                [self.agent.description, self.agent.instructions],
+                self.agent.output_schema,
+            )
+        return self._namespace
+
+    def _encode(self, content) -> Optional[dict]:
+        schema = self.agent.output_schema
+        if schema is not None:
+            # Only schema-valid responses are worth replaying
+            return {"content": content.model_dump()} if isinstance(content, schema) else None
+        return {"content": content} if isinstance(content, str) else None
+
+    def _decode(self, payload: dict):
+        schema = self.agent.output_schema
+        return schema.model_validate(payload["content"]) if schema is not None else payload["content"]
+
+    def _cached(self, prompt: str) -> Optional[LLMCall]:
+        if self.cache is None:
+            return None
+        t = time.perf_counter()
+        payload = self.cache.get(self.namespace, prompt)
+        if payload is None:
+            return None
+        call = LLMCall(content=self._decode(payload), cache_hit=True, llm_s=time.perf_counter() - t)
+        record_llm_call(call.llm_s, cache_hit=True)
+        return call
+
+    def _completed(self, response, started: float) -> LLMCall:
+        prompt_tokens, completion_tokens = _token_usage(response)
+        call = LLMCall(
+            content=response.content,
+            llm_s=time.perf_counter() - started,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        )
+        record_llm_call(call.llm_s, prompt_tokens, completion_tokens)
+        return call
+
+    def _accept(self, call: LLMCall) -> Optional[str]:
+        """
+        Coerces call.content into the output schema, repairing malformed JSON locally
+        when possible. Returns None on success, else the error for the re-prompt.
+        """
+        schema = self.agent.output_schema
+        if schema is None:
+            return None
+        content, error, repaired = coerce_output(call.content, schema)
+        if content is None:
+            record_parse_failure(type(self).__name__, self.model_id, "invalid")
+            return error
+        if repaired:
+            record_parse_failure(type(self).__name__, self.model_id, "repaired")
+        call.content = content
+        return None
+
+    def _give_up(self, attempts: int, error: str) -> StructuredOutputError:
+        record_parse_failure(type(self).__name__, self.model_id, "failed")
+        return StructuredOutputError(type(self).__name__, self.model_id, attempts, error)
+
+    def _store(self, prompt: str, content):
+        if self.cache is None:
+            return
+        payload = self._encode(content)
+        if payload is not None:
+            self.cache.put(self.namespace, prompt, payload)
+
+    def _run(self, prompt: str) -> LLMCall:
+        record_prompt(estimate_tokens(prompt))
+        call = self._cached(prompt)
+        if call is not None:
+            return call
+        attempt_prompt = prompt
+        for attempt in range(self.MAX_PARSE_RETRIES + 1):
+            if attempt:
+                time.sleep(self.PARSE_BACKOFF_S * 2 ** (attempt - 1))
+            started = time.perf_counter()
+            call = self._completed(self.agent.run(attempt_prompt), started)
+            error = self._accept(call)
+            if error is None:
+                # Cached under the original prompt, so a hit skips the repair round trips
+                self._store(prompt, call.content)
+                return call
+            attempt_prompt = repair_prompt(prompt, self.agent.output_schema, call.content, error)
+        raise self._give_up(attempt + 1, error)
+
+    async def _arun(self, prompt: str) -> LLMCall:
+        record_prompt(estimate_tokens(prompt))
+        call = self._cached(prompt)
+        if call is not None:
+            return call
+        attempt_prompt = prompt
+        for attempt in range(self.MAX_PARSE_RETRIES + 1):
+            if attempt:
+                await asyncio.sleep(self.PARSE_BACKOFF_S * 2 ** (attempt - 1))
+            started = time.perf_counter()
+            call = self._completed(await self.agent.arun(attempt_prompt), started)
+            error = self._accept(call)
+            if error is None:
+                self._store(prompt, call.content)
+                return call
+            attempt_prompt = repair_prompt(prompt, self.agent.output_schema, call.content, error)
+        raise self._give_up(attempt + 1, error)
+
+    # Streaming is for plain-text agents. Closing the iterator early stops generation;
+    # only fully streamed responses are cached. Agno reports no token usage mid-stream.
+
+    def _stream(self, prompt: str) -> Iterator[str]:
+        record_prompt(estimate_tokens(prompt))
+        call = self._cached(prompt)
+        if call is not None:
+            yield call.content
+            return
+        started = time.perf_counter()
+        chunks = []
+        events = self.agent.run(prompt, stream=True)
+        try:
+            for event in events:
+                content = getattr(event, "content", None)
+                if isinstance(content, str) and content:
+                    chunks.append(content)
+                    yield content
+            self._store(prompt, "".join(chunks))
+        finally:
+            events.close()
+            record_llm_call(time.perf_counter() - started)
+
+    async def _astream(self, prompt: str) -> AsyncIterator[str]:
+        record_prompt(estimate_tokens(prompt))
+        call = self._cached(prompt)
+        if call is not None:
+            yield call.content
+            return
+        started = time.perf_counter()
+        chunks = []
+        events = self.agent.arun(prompt, stream=True)
+        try:
+            async for event in events:
+                content = getattr(event, "content", None)
+                if isinstance(content, str) and content:
+                    chunks.append(content)
+                    yield content
+            self._store(prompt, "".join(chunks))
+        finally:
+            await events.aclose()
+            record_llm_call(time.perf_counter() - started)
@@ -1,12 +1,28 @@
+import threading
+from typing import Dict, Optional
 from agno.agent import Agent
-from agno.models.ollama import Ollama
 from src.models.schemas import TaskSpec
+from src.agents.base import LLMAgent, LLMCall
+from src.utils.llm_cache import ResponseCache
+from src.utils.model_registry import get_model
+from src.utils.request_parser import ParsedRequest, parse_request
 import uuid
 
-class BrokerAgent:
-    def __init__(self, model_id="llama3.2:latest"):
-        self.agent = Agent(
-            model=Ollama(id=model_id),
+class BrokerAgent(LLMAgent):
+    ROLE = "broker"
+
+    def __init__(self, model_id="llama3.2:latest", host: Optional[str] = None,
+                 cache: Optional[ResponseCache] = None, use_cache: bool = True, fast_path: bool = True):
+        super().__init__(model_id, host=host, cache=cache, use_cache=use_cache)
+        # Templated requests are turned into a TaskSpec by parse_request without an LLM call;
+        # partially parsed ones still go to the LLM, but the parsed fields win
+        self.fast_path = fast_path
+        self.fast_path_stats: Dict[str, int] = {"hits": 0, "partial": 0, "misses": 0}
+        self._stats_lock = threading.Lock()
+
+    def _build_agent(self) -> Agent:
+        return Agent(
+            model=get_model(self.model_id, self.host, role=self.ROLE),
             description="You are a Task Broker. Your job is to analyze loose user requests and convert them into structured professional task specifications.",
             instructions=[
                 "Analyze the user's request thoroughly.",
@@ -18,11 +34,66 @@ class BrokerAgent:
             output_schema=TaskSpec,
         )
 
-    def create_task(self, user_request: str) -> TaskSpec:
-        # We can perform additional logic here if needed, but for now direct delegation
-        response = self.agent.run(f"Create a strict task specification for: {user_request}")
+    def _prompt(self, user_request: str) -> str:
+        return f"Create a strict task specification for: {user_request}"
+
+    def _to_task(self, call: LLMCall, parsed: Optional[ParsedRequest] = None) -> TaskSpec:
         # The Agno Agent with response_model returns a RunResponse, response.content is the model
-        task = response.content
-        if not task.task_id:
-            task.task_id = str(uuid.uuid4())
+        task = call.content
+        # Checkpoints and in-flight tracking are keyed on task_id, so it is never the
+        # model's (which may repeat, e.g. "task-1") nor a cached template's
+        task.task_id = str(uuid.uuid4())
+        if parsed is not None:
+            # Fields the parser was sure about override the LLM's reading; the LLM keeps
+            # its rewrite of the free-text description
+            for name in ("budget", "deadline", "acceptance_criteria", "required_skills"):
+                value = getattr(parsed, name)
+                if value:
+                    setattr(task, name, value)
         return task
+
+    def _count(self, outcome: str):
+        with self._stats_lock:
+            self.fast_path_stats[outcome] += 1
+
+    @property
+    def fast_path_rate(self) -> float:
+        """Share of requests answered without an LLM call."""
+        with self._stats_lock:
+            total = sum(self.fast_path_stats.values())
+            return self.fast_path_stats["hits"] / total if total else 0.0
+
+    def _parse(self, user_request: str) -> Optional[ParsedRequest]:
+        if not self.fast_path:
+            return None
+        parsed = parse_request(user_request)
+        if parsed.complete:
+            self._count("hits")
+        elif parsed.budget is not None or parsed.deadline or parsed.acceptance_criteria or parsed.required_skills:
+            self._count("partial")
+        else:
+            self._count("misses")
+            return None
+        return parsed
+
+    def _from_parsed(self, parsed: ParsedRequest) -> TaskSpec:
+        return TaskSpec(
+            task_id=str(uuid.uuid4()),
+            description=parsed.description,
+            acceptance_criteria=parsed.acceptance_criteria,
+            budget=parsed.budget,
+            deadline=parsed.deadline,
+            required_skills=parsed.required_skills,
+        )
+
+    def create_task(self, user_request: str) -> TaskSpec:
+        parsed = self._parse(user_request)
+        if parsed is not None and parsed.complete:
+            return self._from_parsed(parsed)
+        return self._to_task(self._run(self._prompt(user_request)), parsed)
+
+    async def acreate_task(self, user_request: str) -> TaskSpec:
+        parsed = self._parse(user_request)
+        if parsed is not None and parsed.complete:
+            return self._from_parsed(parsed)
+        return self._to_task(await self._arun(self._prompt(user_request)), parsed)
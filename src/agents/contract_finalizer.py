@@ -1,12 +1,22 @@
+from typing import Optional
 from agno.agent import Agent
-from agno.models.ollama import Ollama
 from src.models.schemas import TaskSpec, Bid, Contract
+from src.agents.base import LLMAgent, LLMCall
+from src.utils.llm_cache import ResponseCache
+from src.utils.model_registry import get_model
+from src.utils.token_budget import dedupe_sentences
 import uuid
 
-class ContractFinalizerAgent:
-    def __init__(self, model_id="llama3.2:latest"):
-        self.agent = Agent(
-            model=Ollama(id=model_id),
+class ContractFinalizerAgent(LLMAgent):
+    ROLE = "contract"
+
+    def __init__(self, model_id="llama3.2:latest", host: Optional[str] = None,
+                 cache: Optional[ResponseCache] = None, use_cache: bool = True):
+        super().__init__(model_id, host=host, cache=cache, use_cache=use_cache)
+
+    def _build_agent(self) -> Agent:
+        return Agent(
+            model=get_model(self.model_id, self.host, role=self.ROLE),
             description="Contract Finalizer",
             instructions=[
                 "Draft a strict JSON contract.",
@@ -16,15 +26,15 @@ class ContractFinalizerAgent:
             output_schema=Contract,
         )
 
-    def finalize_contract(self, task: TaskSpec, bid: Bid) -> Contract:
-        prompt = f"""
-        Task: {task.description}
+    def _prompt(self, task: TaskSpec, bid: Bid) -> str:
+        return f"""
+        Task: {self.budget.fit(self.ROLE, dedupe_sentences(task.description))}
         Agreed Bid: {bid.price} by {bid.agent_id}
         Timeline: {bid.timeline}
         
         Create a Contract object.
         contract_id should be unique.
-        task_id: {task.task_id}
+        task_id: "" (filled in by the marketplace)
         selected_worker: {bid.agent_id}
         deliverables: Split the task description into 3-5 sub-deliverables.
         tests: Create 2-3 acceptance criteria tests.
@@ -32,8 +42,20 @@ class ContractFinalizerAgent:
         payment: {bid.price}
         status: "pending"
         """
-        response = self.agent.run(prompt)
-        contract = response.content
-        if not contract.contract_id:
+
+    def _to_contract(self, task: TaskSpec, bid: Bid, call: LLMCall) -> Contract:
+        contract = call.content
+        if not contract.contract_id or call.cache_hit:
              contract.contract_id = str(uuid.uuid4())
+        # The prompt leaves out the per-request task id so repeat templates hit the
+        # cache; fresh and replayed terms alike are bound to this task and bid here
+        contract.task_id = task.task_id
+        contract.selected_worker = bid.agent_id
+        contract.payment = bid.price
         return contract
+
+    def finalize_contract(self, task: TaskSpec, bid: Bid) -> Contract:
+        return self._to_contract(task, bid, self._run(self._prompt(task, bid)))
+
+    async def afinalize_contract(self, task: TaskSpec, bid: Bid) -> Contract:
+        return self._to_contract(task, bid, await self._arun(self._prompt(task, bid)))
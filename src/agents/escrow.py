@@ -1,19 +1,24 @@
+from typing import Optional
 from src.utils.ledger import Ledger
 
 class EscrowAgent:
-    def __init__(self):
-        self.ledger = Ledger()
+    def __init__(self, ledger: Optional[Ledger] = None):
+        self.ledger = ledger or Ledger()
 
     def lock(self, contract_id: str, amount: float, task_id: str):
         self.ledger.lock_funds(contract_id, amount, task_id)
         return f"Funds ({amount}) locked for contract {contract_id}"
 
     def release(self, contract_id: str, worker_id: str):
-        if self.ledger.release_funds(contract_id, worker_id):
-            return f"Funds released to {worker_id}"
-        return "Failed to release funds"
+        return self.release_message(self.ledger.release_funds(contract_id, worker_id), worker_id)
 
     def refund(self, contract_id: str):
-        if self.ledger.refund_funds(contract_id):
-            return "Funds refunded to Broker"
-        return "Failed to refund"
+        return self.refund_message(self.ledger.refund_funds(contract_id))
+
+    @staticmethod
+    def release_message(released: bool, worker_id: str) -> str:
+        return f"Funds released to {worker_id}" if released else "Failed to release funds"
+
+    @staticmethod
+    def refund_message(refunded: bool) -> str:
+        return "Funds refunded to Broker" if refunded else "Failed to refund"
@@ -1,11 +1,21 @@
+from typing import AsyncIterator, Iterator, Optional
 from agno.agent import Agent
-from agno.models.ollama import Ollama
-from src.models.schemas import Contract, ExecutionResult
+from src.models.schemas import Contract, ExecutionResult, TaskSpec
+from src.agents.base import LLMAgent, LLMCall
+from src.utils.llm_cache import ResponseCache
+from src.utils.model_registry import get_model
 
-class ExecutorAgent:
-    def __init__(self, model_id="llama3.2:latest"):
-        self.agent = Agent(
-            model=Ollama(id=model_id),
+class ExecutorAgent(LLMAgent):
+    ROLE = "executor"
+
+    # Execution output is the actual work product, so it is not replayed from cache by default
+    def __init__(self, model_id="llama3.2:latest", host: Optional[str] = None,
+                 cache: Optional[ResponseCache] = None, use_cache: bool = False):
+        super().__init__(model_id, host=host, cache=cache, use_cache=use_cache)
+
+    def _build_agent(self) -> Agent:
+        return Agent(
+            model=get_model(self.model_id, self.host, role=self.ROLE),
             description="You are a Task Executor. Your job is to actually do the work defined in the contract.",
             instructions=[
                 "Read the contract deliverables carefully.",
@@ -15,18 +25,51 @@ class ExecutorAgent:
             ]
         )
 
-    def execute_task(self, contract: Contract) -> ExecutionResult:
-        prompt = f"""
+    def _prompt(self, contract: Contract) -> str:
+        return f"""
         Execute this contract:
         Deliverables: {contract.deliverables}
         
         Generate the actual content/code required.
         """
-        response = self.agent.run(prompt)
+
+    def _spec_prompt(self, task: TaskSpec) -> str:
+        # Speculative runs start before the contract's deliverables exist
+        return f"""
+        Execute this task:
+        Description: {task.description}
+        Acceptance criteria: {task.acceptance_criteria}
         
+        Generate the actual content/code required.
+        """
+
+    def _to_result(self, contract: Contract, call: LLMCall) -> ExecutionResult:
+        return self.result_from_output(contract, call.content)
+
+    def result_from_output(self, contract: Contract, output: str) -> ExecutionResult:
         return ExecutionResult(
             task_id=contract.task_id,
             worker_id=contract.selected_worker,
-            output=response.content,
+            output=output,
             artifacts=["result.txt"]
         )
+
+    def execute_task(self, contract: Contract) -> ExecutionResult:
+        return self._to_result(contract, self._run(self._prompt(contract)))
+
+    async def aexecute_task(self, contract: Contract) -> ExecutionResult:
+        return self._to_result(contract, await self._arun(self._prompt(contract)))
+
+    def stream_task(self, contract: Contract) -> Iterator[str]:
+        """Yields output chunks as they are generated; close() cancels generation."""
+        return self._stream(self._prompt(contract))
+
+    def astream_task(self, contract: Contract) -> AsyncIterator[str]:
+        return self._astream(self._prompt(contract))
+
+    def stream_spec(self, task: TaskSpec) -> Iterator[str]:
+        """Like stream_task, working from the task spec alone."""
+        return self._stream(self._spec_prompt(task))
+
+    def astream_spec(self, task: TaskSpec) -> AsyncIterator[str]:
+        return self._astream(self._spec_prompt(task))
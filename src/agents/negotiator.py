@@ -1,87 +1,228 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
+import numpy as np
 from agno.agent import Agent
-from agno.models.ollama import Ollama
-from src.models.schemas import Bid, TaskSpec, Contract
-from src.agents.worker import WorkerAgent
+from src.models.schemas import Bid, TaskSpec, Contract, NegotiationStep
+from src.models.bid_book import BidBook
 from src.utils.reputation_db import ReputationDB
+from src.utils.model_registry import get_model
+from src.agents.base import LLMAgent
+from src.utils.structured_output import StructuredOutputError
 
-class NegotiatorAgent:
-    def __init__(self, model_id="llama3.2:latest"):
-        self.agent = Agent(
-            model=Ollama(id=model_id),
+class ScoredBids:
+    """
+    Bids ranked best-first, with the per-component score arrays in the same order.
+    Pydantic Bids are only taken from the book when asked for.
+    """
+    def __init__(self, book: BidBook, price: np.ndarray, rep: np.ndarray, conf: np.ndarray, scores: np.ndarray):
+        self.order = np.argsort(-scores, kind="stable")
+        self.book = book
+        self.price = price[self.order]
+        self.rep = rep[self.order]
+        self.conf = conf[self.order]
+        self.scores = scores[self.order]
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    @property
+    def bids(self) -> List[Bid]:
+        return [self.book.bid(i) for i in self.order.tolist()]
+
+    def ranked(self) -> List[Tuple[float, Bid]]:
+        return list(zip(self.scores.tolist(), self.bids))
+
+    def best(self) -> Tuple[float, Bid]:
+        return float(self.scores[0]), self.book.bid(int(self.order[0]))
+
+    def display(self) -> List[Dict[str, Any]]:
+        book = self.book
+        return [
+            {"agent": book.agent_ids[i], "score": f"{score:.2f}", "price": book.prices[i]}
+            for score, i in zip(self.scores.tolist(), self.order.tolist())
+        ]
+
+class AuctionResult:
+    """Winning bid of a reverse auction, every bidder's final ask (book order) and the per-round log."""
+    def __init__(self, bid: Bid, winner: int, asks: np.ndarray, rounds: int, history: List[Dict[str, Any]]):
+        self.bid = bid
+        self.winner = winner
+        self.asks = asks
+        self.rounds = rounds
+        self.history = history
+
+    def summary(self) -> Dict[str, Any]:
+        return {"rounds": self.rounds, "history": self.history, "winner": self.bid.agent_id, "price": self.bid.price}
+
+class NegotiatorAgent(LLMAgent):
+    ROLE = "negotiator"
+
+    # Scoring weights, overridable per instance
+    W_PRICE = 0.4
+    W_REP = 0.3
+    W_CONF = 0.3
+
+    # Auction: round cap, how far below the leader's equivalent price a rival bids,
+    # the largest cut of its own ask a bidder makes per round, and the floor (as a
+    # fraction of the opening ask) for bidders without a known reservation price
+    MAX_ROUNDS = 20
+    BID_DECREMENT = 0.02
+    MAX_CONCESSION = 0.1
+    DEFAULT_RESERVATION = 0.85
+
+    def __init__(self, model_id="llama3.2:latest", host: Optional[str] = None, rep_db: Optional[ReputationDB] = None,
+                 w_price: Optional[float] = None, w_rep: Optional[float] = None, w_conf: Optional[float] = None,
+                 llm_counter_offers: bool = False):
+        super().__init__(model_id, host=host, use_cache=False)
+        self.rep_db = rep_db or ReputationDB()
+        # Rounds run locally; the LLM only drafts a counter-offer when the winner is
+        # still over budget and this is on
+        self.llm_counter_offers = llm_counter_offers
+        if w_price is not None:
+            self.W_PRICE = w_price
+        if w_rep is not None:
+            self.W_REP = w_rep
+        if w_conf is not None:
+            self.W_CONF = w_conf
+        if min(self.W_PRICE, self.W_REP, self.W_CONF) < 0:
+            raise ValueError(f"Scoring weights must not be negative, got price={self.W_PRICE}, "
+                             f"reputation={self.W_REP}, confidence={self.W_CONF}")
+
+    def _build_agent(self) -> Agent:
+        return Agent(
+            model=get_model(self.model_id, self.host, role=self.ROLE),
             description="You are a shrewd Negotiator. Your goal is to get the best value for the Broker.",
             instructions=[
-                "Compare the incoming bids against the TaskSpec.",
-                "Identify the best candidate based on a balance of price, timeline, and confidence.",
-                "You can ask for a lower price (e.g. 10% lower) or faster timeline.",
+                "The bids have already been compared; you are writing a counter-offer to the winner.",
+                "Put the price you propose in offer_price and the message in content.",
                 "Be polite but firm."
-            ]
+            ],
+            output_schema=NegotiationStep,
         )
-        self.rep_db = ReputationDB()
 
-    def score_bid(self, bid: Bid, task_budget: float) -> float:
+    def score_bids(self, bids: Union[BidBook, List[Bid]], task_budget: float) -> ScoredBids:
         """
         Score = (price_weight * normalized_price_inverse)
               + (reputation_weight * reputation)
               + (confidence_weight * confidence)
+
+        Computed for all bids at once from the book's columns, with one batched
+        reputation lookup.
         """
-        # Weights
-        W_PRICE = 0.4
-        W_REP = 0.3
-        W_CONF = 0.3
+        book = bids if isinstance(bids, BidBook) else BidBook.from_bids(bids)
+        prices = book.price_array()
+        conf_score = book.confidence_array()
 
         # Normalize Price (Lower is better)
-        # If bid > budget, strict penalty? Or just relative?
         # Inverse: budget / bid. If bid is 50 and budget 100, score 2.0. If bid 200, score 0.5.
-        price_score = task_budget / max(bid.price, 1.0)
-        # Cap price score to avoid skewing
-        price_score = min(price_score, 2.0) / 2.0 # Normalized to 0-1 approx
-
-        # Reputation
-        stats = self.rep_db.get_stats(bid.agent_id)
-        rep_score = stats.avg_score / 100.0 if stats.tasks_completed > 0 else 0.5 # Default to 0.5
-
-        # Confidence
-        conf_score = bid.confidence
-
-        final_score = (W_PRICE * price_score) + (W_REP * rep_score) + (W_CONF * conf_score)
-        return final_score
-
-    def negotiate(self, task: TaskSpec, bids: List[Bid], workers: List[WorkerAgent]) -> Bid:
-        # 1. Score Bids
-        scored_bids = []
-        for b in bids:
-            score = self.score_bid(b, task.budget)
-            scored_bids.append((score, b))
-        
-        # Sort desc
-        scored_bids.sort(key=lambda x: x[0], reverse=True)
-        best_score, best_bid = scored_bids[0]
-        
-        # 2. Negotiate (Simple 1-round logic for demo purposes, but extensible)
-        # If price is within budget, accept. Else, ask for reduction.
-        if best_bid.price <= task.budget:
-             return best_bid
-        
-        # Negotiation Loop (Max 3 rounds)
-        current_bid = best_bid
-        rounds = 0
-        max_rounds = 3
-        
-        while current_bid.price > task.budget and rounds < max_rounds:
-            rounds += 1
-            # Ask for 10% reduction
-            target_price = current_bid.price * 0.90
-            
-            # Simulate Worker Response (simplified)
-            # In a real agent system, we'd call worker.revise_bid(msg)
-            # Here: if target > 70% of original ask, they accept.
-            
-            # We assume the best_bid.price is their "ask".
-            # For the demo, let's say they agree to meet halfway to budget if it's reasonable.
-            
-            new_price = max(target_price, task.budget) # Don't go below budget if not needed
-            current_bid.price = new_price
-            current_bid.plan += f" [Negotiated: Dropped price to {new_price}]"
-
-        return current_bid
+        # Capped at 2.0 to avoid skewing, then normalized to 0-1 approx
+        price_score = np.minimum(task_budget / np.maximum(prices, 1.0), 2.0) / 2.0
+
+        # Reputation: agents without completed tasks default to 0.5
+        known = self.rep_db.avg_scores(book.agent_ids)
+        rep_score = np.fromiter((known.get(a, 50.0) / 100.0 for a in book.agent_ids), dtype=float, count=len(book))
+
+        scores = (self.W_PRICE * price_score) + (self.W_REP * rep_score) + (self.W_CONF * conf_score)
+        return ScoredBids(book, price_score, rep_score, conf_score, scores)
+
+    def score_bid(self, bid: Bid, task_budget: float) -> float:
+        return float(self.score_bids([bid], task_budget).scores[0])
+
+    def _reservations(self, book: BidBook, opening: np.ndarray, reservations: Optional[Dict[str, float]]) -> np.ndarray:
+        """Lowest price each bidder accepts: its known floor, else DEFAULT_RESERVATION of its opening ask."""
+        floor = opening * self.DEFAULT_RESERVATION
+        if reservations:
+            known = np.fromiter((reservations.get(a, np.nan) for a in book.agent_ids), dtype=float, count=len(book))
+            floor = np.where(np.isnan(known), floor, known)
+        # Nobody raises their own ask
+        return np.minimum(floor, opening)
+
+    def _counter_offer(self, task: TaskSpec, bid: Bid, ask: float) -> Optional[float]:
+        prompt = f"""
+        Task: {task.description}
+        Budget: {task.budget}
+
+        Best remaining offer after the auction: {ask} from {bid.agent_id}
+        Timeline: {bid.timeline}, confidence: {bid.confidence}
+        Plan: {bid.plan}
+
+        Write one counter-offer to {bid.agent_id} that brings the price as close to the budget as is realistic.
+        """
+        try:
+            return self._run(prompt).content.offer_price
+        except StructuredOutputError:
+            return None
+
+    def auction(self, task: TaskSpec, bids: Union[BidBook, List[Bid]], reservations: Optional[Dict[str, float]] = None,
+                scored: Optional[ScoredBids] = None) -> AuctionResult:
+        """
+        Reverse auction over every bid at once. Each round the leader (best score)
+        holds, and every rival that can still overtake it within its reservation
+        price undercuts to the price that would, less BID_DECREMENT, but by at most
+        MAX_CONCESSION of its ask per round. Rivals that cannot win drop out. Stops
+        when nobody moves or after MAX_ROUNDS; a winner still over budget gets a
+        counter-offer at the budget, or at an LLM-drafted price with llm_counter_offers.
+        With W_PRICE = 0 no price cut can change the ranking, so there are no rounds.
+
+        reservations maps agent_id to the lowest price that worker accepts.
+        """
+        if scored is None:
+            scored = self.score_bids(bids, task.budget)
+        book = scored.book
+        n = len(book)
+        budget = task.budget
+        opening = book.price_array()
+        asks = opening.copy()
+        floor = self._reservations(book, opening, reservations)
+
+        # Reputation and confidence don't change between rounds; back to book order
+        fixed = np.empty(n)
+        fixed[scored.order] = self.W_REP * scored.rep + self.W_CONF * scored.conf
+        rivals_of = ~np.eye(n, dtype=bool)
+        active = np.ones(n, dtype=bool)
+        history = []
+
+        def _scores():
+            return self.W_PRICE * np.minimum(budget / np.maximum(asks, 1.0), 2.0) / 2.0 + fixed
+
+        for round_no in range(1, self.MAX_ROUNDS + 1 if self.W_PRICE > 0 else 1):
+            scores = _scores()
+            leader = int(np.argmax(np.where(active, scores, -np.inf)))
+            # Price score each bidder needs to tie the leader, and the ask that beats it
+            needed = (scores[leader] - fixed) / self.W_PRICE
+            with np.errstate(divide="ignore"):
+                target = np.where(needed > 0, budget / (2.0 * np.maximum(needed, 1e-12)), asks)
+            target = np.floor(target * (1.0 - self.BID_DECREMENT) * 100) / 100
+            rivals = active & rivals_of[leader]
+            can_win = (needed < 1.0) & (target >= floor)
+            movers = rivals & can_win
+            active &= ~(rivals & ~can_win)
+            if not movers.any():
+                break
+            asks = np.where(movers, np.maximum(target, np.round(asks * (1.0 - self.MAX_CONCESSION), 2)), asks)
+            history.append({"round": round_no, "leader": book.agent_ids[leader], "price": float(asks[leader]),
+                            "moved": int(movers.sum()), "active": int(active.sum())})
+
+        winner = int(np.argmax(np.where(active, _scores(), -np.inf)))
+        final = float(asks[winner])
+        if final > budget:
+            # Counter-offer at the budget (or the LLM's price); the worker accepts down to its reservation
+            offer = budget
+            if self.llm_counter_offers:
+                drafted = self._counter_offer(task, book.bid(winner), final)
+                offer = offer if drafted is None else drafted
+            final = min(final, max(offer, float(floor[winner])))
+        final = round(final, 2)
+
+        bid = book.bid(winner)
+        if final != bid.price:
+            # The book's Bid stays as submitted
+            bid = bid.model_copy(update={
+                "price": final,
+                "plan": bid.plan + f" [Negotiated: {bid.price} -> {final} over {len(history)} round(s)]",
+            })
+        return AuctionResult(bid, winner, asks, len(history), history)
+
+    def negotiate(self, task: TaskSpec, bids: Union[BidBook, List[Bid]], *, scored: Optional[ScoredBids] = None,
+                  reservations: Optional[Dict[str, float]] = None) -> Bid:
+        """Winning bid of auction(); a new Bid when its price changed."""
+        return self.auction(task, bids, reservations=reservations, scored=scored).bid
@@ -1,8 +1,9 @@
+from typing import Optional
 from src.utils.reputation_db import ReputationDB
 
 class ReputationAgent:
-    def __init__(self):
-        self.db = ReputationDB()
+    def __init__(self, db: Optional[ReputationDB] = None):
+        self.db = db or ReputationDB()
 
     def update(self, agent_id: str, success: bool, score: float):
         self.db.update_stats(agent_id, success, score)
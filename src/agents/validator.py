@@ -1,11 +1,30 @@
+import asyncio
+import contextvars
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 from agno.agent import Agent
-from agno.models.ollama import Ollama
 from src.models.schemas import Contract, ExecutionResult, ValidationResult
+from src.agents.base import LLMAgent, LLMCall
+from src.utils.llm_cache import ResponseCache
+from src.utils.metrics import record_prompt
+from src.utils.model_registry import get_model
+from src.utils.token_budget import estimate_tokens, split_chunks, trim_extractive
 
-class ValidatorAgent:
-    def __init__(self, model_id="llama3.2:latest"):
-        self.agent = Agent(
-            model=Ollama(id=model_id),
+class ValidatorAgent(LLMAgent):
+    ROLE = "validator"
+    # Output over the token budget is reviewed in up to MAX_CHUNKS parallel calls,
+    # whose verdicts one more call combines
+    MAX_CHUNKS = 4
+
+    def __init__(self, model_id="llama3.2:latest", host: Optional[str] = None,
+                 cache: Optional[ResponseCache] = None, use_cache: bool = True):
+        super().__init__(model_id, host=host, cache=cache, use_cache=use_cache)
+
+    def _build_agent(self) -> Agent:
+        return Agent(
+            model=get_model(self.model_id, self.host, role=self.ROLE),
             description="You are a QA Validator. You strictly check if the deliverables match the contract.",
             instructions=[
                 "Compare the Execution Result against the Contract Deliverables and Tests.",
@@ -17,15 +36,174 @@ class ValidatorAgent:
             output_schema=ValidationResult,
         )
 
-    def validate_work(self, contract: Contract, result: ExecutionResult) -> ValidationResult:
-        prompt = f"""
+    def _prompt(self, contract: Contract, output: str, part: Optional[Tuple[int, int]] = None) -> str:
+        if part is None:
+            return f"""
         Contract Tests: {contract.tests}
         Deliverables: {contract.deliverables}
         
         Work Output:
-        {result.output}
+        {output}
         
         Did the worker satisfy the requirements?
         """
-        response = self.agent.run(prompt)
-        return response.content
+        return f"""
+        Contract Tests: {contract.tests}
+        Deliverables: {contract.deliverables}
+
+        Work Output (part {part[0]} of {part[1]}; the other parts are reviewed separately):
+        {output}
+
+        Is this part correct, and which tests and deliverables does it cover?
+        List every problem in it, and every test it gives evidence for, as issues.
+        """
+
+    def _reduce_prompt(self, contract: Contract, parts: List[ValidationResult]) -> str:
+        reviews = "\n".join(
+            f"        Part {i}: score {p.score}, {'passed' if p.passed else 'failed'}, issues: {p.issues}"
+            for i, p in enumerate(parts, 1)
+        )
+        return f"""
+        Contract Tests: {contract.tests}
+        Deliverables: {contract.deliverables}
+
+        The work output was too long to review at once. Its {len(parts)} parts were reviewed separately:
+{reviews}
+
+        Taking all parts together, did the worker satisfy the requirements?
+        """
+
+    def _chunks(self, contract: Contract, result: ExecutionResult) -> Optional[List[str]]:
+        """
+        None when the output fits the validator's token budget. Otherwise the output
+        in at most MAX_CHUNKS consecutive parts, each trimmed to the budget keeping
+        lines that mention identifiers the tests quote, so latency stays bounded
+        however long the output is.
+        """
+        available = self.budget.available(self.ROLE, self._prompt(contract, "", (0, 0)))
+        tokens = estimate_tokens(result.output)
+        if available is None or tokens <= available:
+            return None
+        n = min(math.ceil(tokens / available), self.MAX_CHUNKS)
+        chunks = split_chunks(result.output, math.ceil(tokens / n))
+        while len(chunks) > n:
+            chunks[-2] += "\n" + chunks.pop()
+        keep = IncrementalValidator._required_terms(contract)
+        chunks = [trim_extractive(chunk, available, keep) for chunk in chunks]
+        saved = tokens - sum(estimate_tokens(c) for c in chunks)
+        if saved > 0:
+            record_prompt(0, saved=saved)
+        return chunks
+
+    def _to_validation(self, result: ExecutionResult, call: LLMCall) -> ValidationResult:
+        validation = call.content
+        if call.cache_hit:
+            validation.task_id = result.task_id
+        return validation
+
+    def validate_work(self, contract: Contract, result: ExecutionResult) -> ValidationResult:
+        chunks = self._chunks(contract, result)
+        if chunks is None:
+            return self._to_validation(result, self._run(self._prompt(contract, result.output)))
+        # Map: parts are reviewed in parallel, each thread reporting to the active stage span
+        with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, self._run, self._prompt(contract, chunk, (i, len(chunks))))
+                       for i, chunk in enumerate(chunks, 1)]
+            parts = [f.result().content for f in futures]
+        # Reduce
+        return self._to_validation(result, self._run(self._reduce_prompt(contract, parts)))
+
+    async def avalidate_work(self, contract: Contract, result: ExecutionResult) -> ValidationResult:
+        chunks = self._chunks(contract, result)
+        if chunks is None:
+            return self._to_validation(result, await self._arun(self._prompt(contract, result.output)))
+        calls = await asyncio.gather(*(self._arun(self._prompt(contract, chunk, (i, len(chunks))))
+                                       for i, chunk in enumerate(chunks, 1)))
+        return self._to_validation(result, await self._arun(self._reduce_prompt(contract, [c.content for c in calls])))
+
+class IncrementalValidator:
+    """
+    Cheap, LLM-free checks run on executor output while it streams in. feed()
+    returns an issue as soon as the output has clearly failed (refusal, a looping
+    generation, runaway length) so the caller can cancel generation; finish()
+    adds end-of-output checks. Anything that passes still goes to ValidatorAgent.
+
+    Identifiers the contract tests or deliverables quote in `backticks` must appear
+    somewhere in the final output.
+    """
+    REFUSAL = re.compile(r"^\W*(i'?m sorry|i am sorry|i can'?not|i can'?t|i am unable|i'?m unable|as an ai\b)", re.IGNORECASE)
+    REFUSAL_WINDOW = 200
+
+    def __init__(self, contract: Contract, max_chars: int = 40000, repeat_limit: int = 8, min_line: int = 8):
+        self.contract = contract
+        self.max_chars = max_chars
+        self.repeat_limit = repeat_limit
+        self.min_line = min_line
+        self.required_terms = self._required_terms(contract)
+        self.chunks: List[str] = []
+        self.chars = 0
+        self.issue: Optional[str] = None
+        self._head = ""
+        self._partial_line = ""
+        self._last_line = None
+        self._repeats = 0
+
+    @staticmethod
+    def _required_terms(contract: Contract) -> List[str]:
+        terms = []
+        for text in contract.tests + contract.deliverables:
+            for term in re.findall(r"`([^`]+)`", text):
+                term = term.strip()
+                if term and term not in terms:
+                    terms.append(term)
+        return terms
+
+    @property
+    def output(self) -> str:
+        return "".join(self.chunks)
+
+    def feed(self, chunk: str) -> Optional[str]:
+        if self.issue:
+            return self.issue
+        self.chunks.append(chunk)
+        self.chars += len(chunk)
+
+        if len(self._head) < self.REFUSAL_WINDOW:
+            self._head = (self._head + chunk)[:self.REFUSAL_WINDOW]
+            if self.REFUSAL.match(self._head):
+                self.issue = "Executor refused the task."
+                return self.issue
+
+        if self.chars > self.max_chars:
+            self.issue = f"Output exceeded {self.max_chars} characters."
+            return self.issue
+
+        # Only complete lines count towards the repetition check
+        *lines, self._partial_line = (self._partial_line + chunk).split("\n")
+        for line in lines:
+            line = line.strip()
+            if len(line) < self.min_line:
+                continue
+            if line == self._last_line:
+                self._repeats += 1
+                if self._repeats >= self.repeat_limit:
+                    self.issue = f"Output is looping: line repeated {self._repeats + 1} times."
+                    return self.issue
+            else:
+                self._last_line, self._repeats = line, 0
+        return None
+
+    def finish(self) -> Optional[str]:
+        if self.issue:
+            return self.issue
+        output = self.output
+        if not output.strip():
+            self.issue = "Executor produced no output."
+        else:
+            missing = [t for t in self.required_terms if t.lower() not in output.lower()]
+            if missing:
+                self.issue = f"Output never mentions {', '.join(missing)} required by the contract."
+        return self.issue
+
+    def failure(self) -> ValidationResult:
+        return ValidationResult(task_id=self.contract.task_id, passed=False, score=0.0, issues=[self.issue], retry_allowed=True)
@@ -1,16 +1,103 @@
-from typing import List
+import re
+from typing import Any, Dict, List, Optional, Tuple
 from agno.agent import Agent
-from agno.models.ollama import Ollama
-from src.models.schemas import Bid, TaskSpec
+from src.models.schemas import Bid, TaskSpec, WorkerProfile
+from src.agents.base import LLMAgent, LLMCall
+from src.utils.llm_cache import ResponseCache
+from src.utils.model_registry import get_model
+from src.utils.request_parser import deadline_days
+from src.utils.token_budget import TokenBudget, dedupe_sentences
 import uuid
 
-class WorkerAgent:
-    def __init__(self, agent_id: str, persona: str, model_id="llama3.2:latest"):
+# llm: the whole Bid comes from the model. heuristic: price, timeline and confidence are
+# computed locally and the plan is a template. hybrid: heuristic numbers, LLM-written plan.
+BID_STRATEGIES = ("llm", "heuristic", "hybrid")
+DEFAULT_PRICE_BAND = (0.75, 0.9)
+
+def price_band_from_persona(persona: str) -> Tuple[float, float]:
+    m = re.search(r"(\d+)\s*-\s*(\d+)\s*%", persona)
+    return (int(m.group(1)) / 100, int(m.group(2)) / 100) if m else DEFAULT_PRICE_BAND
+
+def heuristic_terms(task: TaskSpec, price_band: Tuple[float, float], reputation: float) -> Tuple[float, str, float]:
+    """
+    (price, timeline, confidence) without an LLM. Reputation (0-100) and task size
+    (acceptance criteria, description length) push the price up the worker's band;
+    pricier bands take longer and are more confident.
+    """
+    low, high = price_band
+    rep = min(max(reputation / 100.0, 0.0), 1.0)
+    size = min(len(task.acceptance_criteria) / 8.0 + len(task.description) / 2000.0, 1.0)
+    position = 0.5 * rep + 0.5 * size
+    price = round(task.budget * (low + position * (high - low)), 2)
+
+    tier = min(max((low + high) / 2, 0.0), 1.1) / 1.1
+    days = deadline_days(task.deadline)
+    if days is None:
+        days = 1 + len(task.acceptance_criteria)
+    timeline_days = max(1, round(days * (0.4 + 0.5 * tier)))
+    timeline = f"{timeline_days} day" + ("s" if timeline_days != 1 else "")
+
+    confidence = round(min(0.4 + 0.3 * tier + 0.3 * rep, 0.99), 2)
+    return price, timeline, confidence
+
+def task_description(task: TaskSpec, budget: TokenBudget, role: str) -> str:
+    """The description without repeated sentences, cut to the role's token budget; criteria are sent separately and in full."""
+    return budget.fit(role, dedupe_sentences(task.description), reserved=str(task.acceptance_criteria))
+
+class PlanWriterAgent(LLMAgent):
+    """Writes just the plan text for hybrid bids: one short plain-text call, no JSON."""
+    ROLE = "worker"
+
+    def __init__(self, model_id="llama3.2:latest", host: Optional[str] = None,
+                 cache: Optional[ResponseCache] = None, use_cache: bool = True):
+        super().__init__(model_id, host=host, cache=cache, use_cache=use_cache)
+
+    def _build_agent(self) -> Agent:
+        return Agent(
+            model=get_model(self.model_id, self.host, role=self.ROLE),
+            description="You write short execution plans for freelance bids.",
+            instructions=[
+                "Write a 2-3 sentence high-level plan for the task.",
+                "Match the worker persona.",
+                "Return only the plan text."
+            ]
+        )
+
+    def _prompt(self, task: TaskSpec, persona: str) -> str:
+        return f"""
+        Persona: {persona}
+        Task: {task_description(task, self.budget, self.ROLE)}
+        Criteria: {task.acceptance_criteria}
+        """
+
+    def write_plan(self, task: TaskSpec, persona: str) -> str:
+        return self._run(self._prompt(task, persona)).content.strip()
+
+    async def awrite_plan(self, task: TaskSpec, persona: str) -> str:
+        return (await self._arun(self._prompt(task, persona))).content.strip()
+
+class WorkerAgent(LLMAgent):
+    ROLE = "worker"
+
+    def __init__(self, agent_id: str, persona: str, model_id="llama3.2:latest", host: Optional[str] = None,
+                 cache: Optional[ResponseCache] = None, use_cache: bool = True,
+                 price_band: Optional[Tuple[float, float]] = None, bid_strategy: str = "llm"):
+        super().__init__(model_id, host=host, cache=cache, use_cache=use_cache)
+        if bid_strategy not in BID_STRATEGIES:
+            raise ValueError(f"Unknown bid strategy {bid_strategy!r}; expected one of {BID_STRATEGIES}")
         self.agent_id = agent_id
         self.persona = persona
-        
+        self.price_band = tuple(price_band) if price_band else price_band_from_persona(persona)
+        self.bid_strategy = bid_strategy
+
+    @classmethod
+    def from_profile(cls, profile: WorkerProfile) -> "WorkerAgent":
+        return cls.shared(agent_id=profile.agent_id, persona=profile.persona, model_id=profile.model_id, host=profile.host,
+                          price_band=(profile.price_min, profile.price_max), bid_strategy=profile.bid_strategy)
+
+    def _build_agent(self) -> Agent:
         instructions = [
-            f"You are a Worker Agent with the following persona: {persona}.",
+            f"You are a Worker Agent with the following persona: {self.persona}.",
             "Analyze the Task Specification provided.",
             "Decide if you want to bid on this task based on your persona.",
             "If you bid, create a realistic Bid object.",
@@ -18,31 +105,88 @@ class WorkerAgent:
             "Return the result strictly as a Bid JSON object."
         ]
 
-        self.agent = Agent(
-            model=Ollama(id=model_id),
-            description=f"Worker Agent {agent_id}",
+        return Agent(
+            model=get_model(self.model_id, self.host, role=self.ROLE),
+            description=f"Worker Agent {self.agent_id}",
             instructions=instructions,
             output_schema=Bid,
         )
 
-    def generate_bid(self, task: TaskSpec) -> Bid:
-        prompt = f"""
+    def _prompt(self, task: TaskSpec) -> str:
+        return f"""
         Review this task:
-        Description: {task.description}
+        Description: {task_description(task, self.budget, self.ROLE)}
         Budget: {task.budget}
         Deadline: {task.deadline}
         Criteria: {task.acceptance_criteria}
 
         Generate a bid for this task.
         Always ensure the agent_id in the Bid matches your ID: {self.agent_id}
-        and task_id matches: {task.task_id}
+        and leave task_id as "" (the marketplace fills it in).
+        """
+
+    def _to_bid(self, task: TaskSpec, call: LLMCall) -> Bid:
+        bid = call.content
+        if call.cache_hit:
+            # Replayed bids may come from a near-identical task; rebind them to this one
+            bid.bid_id = str(uuid.uuid4())
+            bid.agent_id = self.agent_id
+        # Not in the prompt, which keeps it cacheable across requests for the same template
+        bid.task_id = task.task_id
+        return bid
+
+    def _heuristic_row(self, task: TaskSpec, reputation: Optional[float], plan: Optional[str] = None) -> Dict[str, Any]:
+        price, timeline, confidence = heuristic_terms(task, self.price_band, 50.0 if reputation is None else reputation)
+        if plan is None:
+            plan = (f"Review the {len(task.acceptance_criteria)} acceptance criteria, implement the deliverables, "
+                    f"self-check against each criterion and deliver within {timeline}.")
+        return {"bid_id": str(uuid.uuid4()), "task_id": task.task_id, "agent_id": self.agent_id,
+                "price": price, "timeline": timeline, "confidence": confidence, "plan": plan}
+
+    def _plan_writer(self) -> PlanWriterAgent:
+        return PlanWriterAgent.shared(model_id=self.model_id, host=self.host)
+
+    def bid_row(self, task: TaskSpec, strategy: Optional[str] = None, reputation: Optional[float] = None) -> Dict[str, Any]:
         """
-        response = self.agent.run(prompt)
-        return response.content
+        Same bid as generate_bid, as a BidBook row (Bid.model_dump() layout). The
+        marketplace collects bids this way, so heuristic bids never build a model.
+        """
+        strategy = strategy or self.bid_strategy
+        if strategy == "heuristic":
+            return self._heuristic_row(task, reputation)
+        if strategy == "hybrid":
+            return self._heuristic_row(task, reputation, self._plan_writer().write_plan(task, self.persona))
+        return self._to_bid(task, self._run(self._prompt(task))).model_dump()
+
+    async def abid_row(self, task: TaskSpec, strategy: Optional[str] = None, reputation: Optional[float] = None) -> Dict[str, Any]:
+        strategy = strategy or self.bid_strategy
+        if strategy == "heuristic":
+            return self._heuristic_row(task, reputation)
+        if strategy == "hybrid":
+            return self._heuristic_row(task, reputation, await self._plan_writer().awrite_plan(task, self.persona))
+        return self._to_bid(task, await self._arun(self._prompt(task))).model_dump()
+
+    def generate_bid(self, task: TaskSpec, strategy: Optional[str] = None, reputation: Optional[float] = None) -> Bid:
+        """strategy overrides this worker's bid_strategy for one call; reputation is its 0-100 average score."""
+        if (strategy or self.bid_strategy) == "llm":
+            return self._to_bid(task, self._run(self._prompt(task)))
+        # Heuristic fields are computed locally with the right type, so skip Pydantic validation
+        return Bid.model_construct(**self.bid_row(task, strategy, reputation))
+
+    async def agenerate_bid(self, task: TaskSpec, strategy: Optional[str] = None, reputation: Optional[float] = None) -> Bid:
+        if (strategy or self.bid_strategy) == "llm":
+            return self._to_bid(task, await self._arun(self._prompt(task)))
+        return Bid.model_construct(**await self.abid_row(task, strategy, reputation))
+
+DEFAULT_WORKER_PROFILES = [
+    WorkerProfile(agent_id="worker_fast_cheap", persona="Fast and Cheap. You prioritize speed and low cost. You might cut corners. You charge 50-70% of budget.",
+                  price_min=0.5, price_max=0.7),
+    WorkerProfile(agent_id="worker_premium", persona="Premium and Thoroughbred. You are expensive and take your time, but produce high quality. You charge 90-110% of budget.",
+                  price_min=0.9, price_max=1.1),
+    WorkerProfile(agent_id="worker_balanced", persona="Balanced and Reliable. You offer a fair price for good work. You charge 75-90% of budget.",
+                  price_min=0.75, price_max=0.9),
+]
 
 def get_worker_team():
-    return [
-        WorkerAgent(agent_id="worker_fast_cheap", persona="Fast and Cheap. You prioritize speed and low cost. You might cut corners. You charge 50-70% of budget."),
-        WorkerAgent(agent_id="worker_premium", persona="Premium and Thoroughbred. You are expensive and take your time, but produce high quality. You charge 90-110% of budget."),
-        WorkerAgent(agent_id="worker_balanced", persona="Balanced and Reliable. You offer a fair price for good work. You charge 75-90% of budget.")
-    ]
+    # Shared, lazily built workers: listing the team (e.g. in the UI) costs no model setup
+    return [WorkerAgent.from_profile(p) for p in DEFAULT_WORKER_PROFILES]
@@ -0,0 +1,117 @@
+import heapq
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from src.models.schemas import TaskSpec, WorkerProfile
+from src.agents.worker import WorkerAgent, DEFAULT_WORKER_PROFILES
+from src.utils.reputation_db import ReputationDB
+
+class WorkerRegistry:
+    """
+    Runtime-mutable pool of worker profiles with an inverted skill index, so a task
+    only reaches workers that cover at least one of its required_skills (generalists,
+    with no skills, are eligible for everything). select() ranks the eligible workers
+    by skill coverage, then by a reputation and price-band prior, and returns the top K.
+    """
+    def __init__(self, profiles: Optional[Iterable[WorkerProfile]] = None):
+        self._profiles: Dict[str, WorkerProfile] = {}
+        self._by_skill: Dict[str, Set[str]] = defaultdict(set)
+        self._generalists: Set[str] = set()
+        self._lock = threading.RLock()
+        for profile in profiles or []:
+            self.register(profile)
+
+    @classmethod
+    def default(cls) -> "WorkerRegistry":
+        return cls(DEFAULT_WORKER_PROFILES)
+
+    @staticmethod
+    def _skills(skills: Iterable[str]) -> Set[str]:
+        return {s.strip().lower() for s in skills if s.strip()}
+
+    def register(self, profile: WorkerProfile):
+        """Adds a worker, replacing any existing profile with the same agent_id."""
+        with self._lock:
+            self.unregister(profile.agent_id)
+            self._profiles[profile.agent_id] = profile
+            skills = self._skills(profile.skills)
+            if not skills:
+                self._generalists.add(profile.agent_id)
+            for skill in skills:
+                self._by_skill[skill].add(profile.agent_id)
+
+    def unregister(self, agent_id: str) -> bool:
+        with self._lock:
+            profile = self._profiles.pop(agent_id, None)
+            if profile is None:
+                return False
+            # A re-registered profile must not be served by the old shared agent
+            WorkerAgent.evict_shared(agent_id=agent_id)
+            self._generalists.discard(agent_id)
+            for skill in self._skills(profile.skills):
+                ids = self._by_skill.get(skill)
+                if ids is not None:
+                    ids.discard(agent_id)
+                    if not ids:
+                        del self._by_skill[skill]
+            return True
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def __contains__(self, agent_id: str) -> bool:
+        return agent_id in self._profiles
+
+    def get(self, agent_id: str) -> Optional[WorkerProfile]:
+        return self._profiles.get(agent_id)
+
+    def profiles(self) -> List[WorkerProfile]:
+        with self._lock:
+            return list(self._profiles.values())
+
+    def agents(self) -> List[WorkerAgent]:
+        return [WorkerAgent.from_profile(p) for p in self.profiles()]
+
+    def eligible(self, task: TaskSpec) -> Dict[str, int]:
+        """agent_id -> number of required skills covered; generalists count 0."""
+        required = self._skills(task.required_skills)
+        with self._lock:
+            if not required:
+                return dict.fromkeys(self._profiles, 0)
+            coverage: Dict[str, int] = dict.fromkeys(self._generalists, 0)
+            for skill in required:
+                for agent_id in self._by_skill.get(skill, ()):
+                    coverage[agent_id] = coverage.get(agent_id, 0) + 1
+            return coverage
+
+    def select(self, task: TaskSpec, k: Optional[int] = None, rep_db: Optional[ReputationDB] = None,
+               min_reputation: Optional[float] = None) -> List[WorkerAgent]:
+        """
+        Top-k eligible workers, best first (all of them when k is None). Workers with a
+        known average score below min_reputation are dropped; new workers are kept.
+        """
+        coverage = self.eligible(task)
+        if not coverage:
+            return []
+        reputation = rep_db.avg_scores(coverage) if rep_db is not None else {}
+
+        ranked: List[Tuple[int, float, str]] = []
+        found: Dict[str, WorkerProfile] = {}
+        for agent_id, covered in coverage.items():
+            profile = self._profiles.get(agent_id)
+            if profile is None:  # unregistered meanwhile
+                continue
+            rep = reputation.get(agent_id)
+            if min_reputation is not None and rep is not None and rep < min_reputation:
+                continue
+            # Same shape as the negotiator's price and reputation terms, on the band midpoint
+            midpoint = max((profile.price_min + profile.price_max) / 2, 0.01)
+            prior = 0.5 * min(1.0 / midpoint, 2.0) / 2.0 + 0.5 * (50.0 if rep is None else rep) / 100.0
+            ranked.append((covered, prior, agent_id))
+            found[agent_id] = profile
+
+        if k is not None and k < len(ranked):
+            ranked = heapq.nlargest(k, ranked)
+        else:
+            ranked.sort(reverse=True)
+        return [WorkerAgent.from_profile(found[agent_id]) for _, _, agent_id in ranked]
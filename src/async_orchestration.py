@@ -0,0 +1,369 @@
+import asyncio
+import time
+from contextlib import AsyncExitStack
+from typing import Dict, Any, AsyncGenerator, Iterable, List, Optional, Tuple
+from src.orchestration import MarketSimulation
+from src.agents.validator import IncrementalValidator
+from src.models.schemas import TaskSpec, Bid, Contract, ValidationResult
+from src.models.bid_book import BidBook
+from src.speculation import Speculation
+from src.utils.metrics import Span
+from src.utils.settlement import ReputationUpdateError
+
+class AsyncMarketSimulation(MarketSimulation):
+    """
+    Async counterpart of MarketSimulation. run_stream yields the same events, but
+    every LLM stage awaits Agno's arun so many transactions can share one event loop.
+    stage_limits caps concurrent calls per step, e.g. {"EXECUTOR": 2}.
+    """
+    def __init__(self, stage_limits: Optional[Dict[str, int]] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.stage_limits = {step: asyncio.Semaphore(n) for step, n in (stage_limits or {}).items()}
+
+    async def _acheckpoint(self, task_id: str, stage: str, **payload):
+        # The SQLite commit runs off the event loop, so it never stalls other transactions
+        await asyncio.to_thread(self._checkpoint, task_id, stage, **payload)
+
+    async def _arecord(self, root: Span, event: Dict[str, Any]):
+        # EventStore.append takes a file lock and commits; keep both off the loop
+        if self.event_store is not None:
+            await asyncio.to_thread(self._record, root, event)
+
+    def _limit(self, step: str):
+        # An empty AsyncExitStack is a no-op async context manager
+        return self.stage_limits.get(step) or AsyncExitStack()
+
+    async def _bid(self, worker, task: TaskSpec, root: Span, strategy: Optional[str], reputation: Optional[float]) -> Tuple[Dict[str, Any], Span]:
+        with self.metrics.stage("WORKERS/bid", root, agent_id=worker.agent_id) as span:
+            async with self._limit("WORKERS"):
+                return await asyncio.wait_for(worker.abid_row(task, strategy, reputation), self.bid_timeout), span
+
+    async def _collect_bids(self, task: TaskSpec, bids: BidBook, root: Span, bid_strategy: Optional[str] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        # Both read the reputation database
+        workers, event = await asyncio.to_thread(self._select_workers, task)
+        yield event
+        strategy = bid_strategy or self.bid_strategy
+        reputations = await asyncio.to_thread(self._bid_reputations, workers, strategy)
+        futures = {}
+        for worker in workers:
+            yield {"step": "WORKERS", "status": "thinking", "message": f"{worker.agent_id} ({worker.persona}) is formulating a bid..."}
+            futures[asyncio.ensure_future(self._bid(worker, task, root, strategy, reputations.get(worker.agent_id)))] = worker
+
+        deadline = time.monotonic() + self.bid_deadline if self.bid_deadline is not None else None
+        pending = set(futures)
+        try:
+            while pending:
+                if self.bid_quorum is not None and len(bids) >= self.bid_quorum:
+                    yield {"step": "WORKERS", "status": "quorum", "message": f"Quorum of {self.bid_quorum} bids reached; {len(pending)} bid(s) skipped."}
+                    break
+
+                timeout = None
+                if deadline is not None:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        yield {"step": "WORKERS", "status": "deadline", "message": f"Bidding deadline passed; {len(pending)} bid(s) skipped."}
+                        break
+
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for f in done:
+                    worker = futures[f]
+                    try:
+                        row, span = f.result()
+                    except asyncio.TimeoutError:
+                        yield {"step": "WORKERS", "status": "timeout", "message": f"{worker.agent_id} timed out after {self.bid_timeout}s."}
+                        continue
+                    except Exception as e:
+                        yield {"step": "WORKERS", "status": "error", "message": f"{worker.agent_id} failed to bid: {e}"}
+                        continue
+                    i = bids.add_row(row)
+                    yield {"step": "WORKERS", "status": "bid", "message": f"Bid from {worker.agent_id}: ${row['price']}", "data": bids.row(i), "metrics": span.as_dict()}
+        finally:
+            for f in pending:
+                f.cancel()
+
+    async def _execute(self, contract: Contract, root: Span, outcome: Dict[str, Any]) -> AsyncGenerator[Dict[str, Any], None]:
+        """Async _execute; stores "result" and the fail-fast "validation" (or None) in outcome."""
+        yield {"step": "EXECUTOR", "status": "active", "message": f"Worker {contract.selected_worker} executing task..."}
+        if not self.stream_execution:
+            with self.metrics.stage("EXECUTOR", root) as span:
+                async with self._limit("EXECUTOR"):
+                    outcome["result"] = await self.executor.aexecute_task(contract)
+            outcome["validation"] = None
+            await asyncio.to_thread(self._checkpoint_execution, contract, outcome["result"], None)
+            yield {"step": "EXECUTOR", "status": "done", "message": "Work complete.", "data": outcome["result"].model_dump(), "metrics": span.as_dict()}
+            return
+
+        span = Span("EXECUTOR", parent=root)
+        checker = IncrementalValidator(contract)
+        try:
+            async with self._limit("EXECUTOR"):
+                chunks = self.executor.astream_task(contract)
+                try:
+                    while True:
+                        # chunks.__anext__ rather than anext(), which needs Python 3.10
+                        try:
+                            with self.metrics.active(span):
+                                chunk = await chunks.__anext__()
+                        except StopAsyncIteration:
+                            break
+                        span.mark_first_byte()
+                        issue = checker.feed(chunk)
+                        yield self._partial_event(chunk, checker)
+                        if issue:
+                            break
+                finally:
+                    with self.metrics.active(span):
+                        await chunks.aclose()
+        finally:
+            self.metrics.finish(span)
+
+        outcome["result"], outcome["validation"], event = self._streamed_result(contract, checker, span)
+        await asyncio.to_thread(self._checkpoint_execution, contract, outcome["result"], outcome["validation"])
+        yield event
+
+    def _speculate(self, task: TaskSpec, bid: Bid, root: Span) -> Speculation:
+        spec = Speculation(task, bid, Span("EXECUTOR/speculative", parent=root, worker=bid.agent_id))
+        spec.future = asyncio.create_task(self._speculative_output(spec))
+        return spec
+
+    async def _speculative_output(self, spec: Speculation) -> Optional[str]:
+        chunks = []
+        async with self._limit("EXECUTOR"):
+            with self.metrics.active(spec.span):
+                stream = self.executor.astream_spec(spec.task)
+                try:
+                    async for chunk in stream:
+                        spec.span.mark_first_byte()
+                        chunks.append(chunk)
+                finally:
+                    await stream.aclose()
+        return "".join(chunks)
+
+    async def _finalize_contract(self, task: TaskSpec, bid: Bid, speculation: Optional[Speculation]) -> Contract:
+        try:
+            async with self._limit("CONTRACT"):
+                return await self.contractor.afinalize_contract(task, bid)
+        except BaseException:
+            if speculation is not None:
+                speculation.cancel()
+            raise
+
+    async def _execute_speculated(self, contract: Contract, root: Span, outcome: Dict[str, Any], spec: Speculation) -> AsyncGenerator[Dict[str, Any], None]:
+        try:
+            output = await spec.future
+        except asyncio.CancelledError:
+            # Only swallow our own cancel(), not the transaction being cancelled
+            if not spec.cancelled.is_set():
+                raise
+            output = None
+        except Exception as e:
+            spec.span.attributes["error"] = repr(e)
+            output = None
+        # Adopting the output checkpoints it
+        adopted, event = await asyncio.to_thread(self._reconcile, spec, contract, output)
+        yield event
+        if adopted is None:
+            async for event in self._execute(contract, root, outcome):
+                yield event
+        else:
+            outcome["result"], outcome["validation"] = adopted
+
+    async def _validate(self, contract: Contract, root: Span, outcome: Dict[str, Any]) -> AsyncGenerator[Dict[str, Any], None]:
+        yield {"step": "VALIDATOR", "status": "active", "message": "Validating output..."}
+        if outcome["validation"] is not None:
+            await self._acheckpoint(contract.task_id, "VALIDATOR", validation=outcome["validation"].model_dump())
+            yield self._failed_fast_event(outcome["validation"])
+            return
+        with self.metrics.stage("VALIDATOR", root) as span:
+            async with self._limit("VALIDATOR"):
+                outcome["validation"] = await self.validator.avalidate_work(contract, outcome["result"])
+        validation = outcome["validation"]
+        data = validation.model_dump()
+        await self._acheckpoint(contract.task_id, "VALIDATOR", validation=data)
+        yield {"step": "VALIDATOR", "status": "done", "message": f"Validation Score: {validation.score}", "data": data, "metrics": span.as_dict()}
+
+    async def _settle(self, contract: Contract, validation: ValidationResult, root: Span, done=frozenset()) -> AsyncGenerator[Dict[str, Any], None]:
+        # Waiting on the batch leaves the loop free for the transactions that share it
+        with self.metrics.stage("ESCROW/settle", root) as span:
+            try:
+                settled, rep_error = await asyncio.wrap_future(self._submit_settlement(contract, validation, done)), None
+            except ReputationUpdateError as e:
+                settled, rep_error = e.settled, e
+        for event in await asyncio.to_thread(self._settled, contract, validation, settled, span, done, rep_error):
+            yield event
+
+    async def sweep_escrow(self, max_age: float = 600.0) -> AsyncGenerator[Dict[str, Any], None]:
+        for contract_id, task_id, resumable in await asyncio.to_thread(self._orphaned_locks, max_age):
+            if resumable:
+                yield self._sweep_event(contract_id, task_id)
+                async for event in self.resume(task_id):
+                    yield event
+            else:
+                yield await asyncio.to_thread(self._refund_orphan, contract_id, task_id)
+
+    async def run_stream(self, user_request: str, bid_strategy: Optional[str] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        async for event in self._transaction(user_request, bid_strategy):
+            yield event
+
+    async def resume(self, task_id: str, bid_strategy: Optional[str] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        state = await asyncio.to_thread(self._restore, task_id)
+        # No await between this check and _transaction claiming the task
+        state, event = self._resume_check(task_id, state)
+        if event is not None:
+            yield event
+            return
+        async for event in self._transaction(state["user_request"], bid_strategy, state):
+            yield event
+
+    async def _transaction(self, user_request: str, bid_strategy: Optional[str] = None, state: Optional[Dict[str, Any]] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        root = self.metrics.start_transaction()
+        try:
+            async for event in self._run_stream(user_request, root, bid_strategy, state):
+                await self._arecord(root, event)
+                yield event
+        finally:
+            self._in_flight.discard(root.attributes.get("task_id"))
+            self.metrics.finish(root)
+
+    async def _run_stream(self, user_request: str, root: Span, bid_strategy: Optional[str] = None,
+                          state: Optional[Dict[str, Any]] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        # Stage spans wrap the stage semaphores, so wall_ms includes queueing and llm_ms does not
+        state = state or {"done": set()}
+        done = state["done"]
+
+        # 1. Broker
+        if "BROKER" in done:
+            task = state["task"]
+            self._begin(root, task)
+            yield self._resumed_event(task, done)
+        else:
+            yield {"step": "BROKER", "status": "active", "message": f"Broker analyzing request: {user_request}"}
+            with self.metrics.stage("BROKER", root) as span:
+                async with self._limit("BROKER"):
+                    task = await self.broker.acreate_task(user_request)
+            self._begin(root, task)
+            data = task.model_dump()
+            await self._acheckpoint(task.task_id, "BROKER", user_request=user_request, task=data)
+            yield {"step": "BROKER", "status": "done", "message": f"Task Created: {task.task_id}", "data": data, "metrics": span.as_dict()}
+
+        # 2. Bidding
+        if "WORKERS" in done:
+            bids = state["bids"]
+        else:
+            yield {"step": "WORKERS", "status": "active", "message": "Agents are evaluating the task..."}
+            bids = BidBook(task.task_id)
+            async for event in self._collect_bids(task, bids, root, bid_strategy):
+                yield event
+            if bids:
+                await self._acheckpoint(task.task_id, "WORKERS", bids=bids.rows())
+
+        if not bids:
+            yield {"step": "ERROR", "message": "No bids received."}
+            return
+
+        # 3. Negotiation (local scoring, no LLM call)
+        if "NEGOTIATOR" in done:
+            winning_bid = state["winning_bid"]
+        else:
+            yield {"step": "NEGOTIATOR", "status": "active", "message": "Negotiator scoring bids..."}
+            # Scores with a batched reputation read
+            events, winning_bid = await asyncio.to_thread(self._negotiate, task, bids, root)
+            await self._acheckpoint(task.task_id, "NEGOTIATOR", winning_bid=winning_bid.model_dump())
+            for event in events:
+                yield event
+
+        # 4. Contract (optionally with the executor already working from the task spec)
+        speculation = None
+        try:
+            if "CONTRACT" in done:
+                contract = state["contract"]
+            else:
+                if self.speculative_execution and "EXECUTOR" not in done:
+                    speculation = self._speculate(task, winning_bid, root)
+                    yield self._speculation_event(winning_bid)
+                yield {"step": "CONTRACT", "status": "active", "message": "Drafting contract..."}
+                with self.metrics.stage("CONTRACT", root) as span:
+                    contract = await self._finalize_contract(task, winning_bid, speculation)
+                data = contract.model_dump()
+                await self._acheckpoint(task.task_id, "CONTRACT", contract=data)
+                yield {"step": "CONTRACT", "status": "done", "message": f"Contract {contract.contract_id} signed.", "data": data, "metrics": span.as_dict()}
+
+            # 5. Escrow Lock
+            if "ESCROW" not in done:
+                yield {"step": "ESCROW", "status": "active", "message": "Locking funds..."}
+                with self.metrics.stage("ESCROW/lock", root) as span:
+                    lock_msg = await asyncio.to_thread(self.escrow.lock, contract.contract_id, contract.payment, task.task_id)
+                await self._acheckpoint(task.task_id, "ESCROW", lock=self._lock_data(contract))
+                yield {"step": "ESCROW", "status": "done", "message": lock_msg, "data": self._lock_data(contract), "metrics": span.as_dict()}
+
+            # 6. Execution
+            outcome: Dict[str, Any] = {}
+            if "EXECUTOR" in done:
+                outcome["result"], outcome["validation"] = state["result"], state["validation"]
+            elif speculation is not None:
+                async for event in self._execute_speculated(contract, root, outcome, speculation):
+                    yield event
+            else:
+                async for event in self._execute(contract, root, outcome):
+                    yield event
+
+            # 7. Validation (skipped when incremental checks already failed the output)
+            if "VALIDATOR" in done:
+                outcome["validation"] = state["validation"]
+            else:
+                async for event in self._validate(contract, root, outcome):
+                    yield event
+
+            # 8. Settlement
+            async for event in self._settle(contract, outcome["validation"], root, done):
+                yield event
+        finally:
+            # Also reached when the consumer closes the stream mid-transaction
+            if speculation is not None:
+                speculation.cancel()
+
+class MarketScheduler:
+    """
+    Runs many marketplace transactions concurrently on one event loop, with at most
+    max_concurrent transactions in flight at a time.
+    """
+    def __init__(self, simulation: Optional[AsyncMarketSimulation] = None, max_concurrent: int = 8):
+        self.simulation = simulation or AsyncMarketSimulation()
+        self.max_concurrent = max_concurrent
+
+    async def stream(self, user_requests: Iterable[str]) -> AsyncGenerator[Tuple[int, Dict[str, Any]], None]:
+        """Yields (request_index, event) pairs from all transactions as they happen."""
+        slots = asyncio.Semaphore(self.max_concurrent)
+        queue: asyncio.Queue = asyncio.Queue()
+        finished = object()
+
+        async def _transaction(idx: int, user_request: str):
+            try:
+                async with slots:
+                    async for event in self.simulation.run_stream(user_request):
+                        await queue.put((idx, event))
+            except Exception as e:
+                await queue.put((idx, {"step": "ERROR", "status": "failed", "message": f"Transaction crashed: {e}"}))
+            finally:
+                await queue.put((idx, finished))
+
+        tasks = [asyncio.ensure_future(_transaction(i, r)) for i, r in enumerate(user_requests)]
+        remaining = len(tasks)
+        try:
+            while remaining:
+                idx, event = await queue.get()
+                if event is finished:
+                    remaining -= 1
+                    continue
+                yield idx, event
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    async def run_all(self, user_requests: Iterable[str]) -> List[List[Dict[str, Any]]]:
+        """Runs every request and returns each transaction's event log, in request order."""
+        user_requests = list(user_requests)
+        logs: List[List[Dict[str, Any]]] = [[] for _ in user_requests]
+        async for idx, event in self.stream(user_requests):
+            logs[idx].append(event)
+        return logs
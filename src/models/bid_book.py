@@ -0,0 +1,102 @@
+import uuid
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import numpy as np
+from src.models.schemas import Bid
+
+class BidBook:
+    """
+    Struct-of-arrays store for the bids on one task. Prices and confidences sit in
+    packed float arrays that scoring reads in one copy, strings in parallel lists.
+    Bids appended as Pydantic models are kept as-is; rows added with add() or
+    add_row() only become a Bid (built without re-validation) when one is asked
+    for, so large open-market rounds allocate one model for the winner instead of
+    one per bid.
+    """
+    __slots__ = ("task_id", "bid_ids", "task_ids", "agent_ids", "timelines", "plans", "prices", "confidences", "_models")
+
+    def __init__(self, task_id: Optional[str] = None):
+        self.task_id = task_id
+        self.bid_ids: List[str] = []
+        self.task_ids: List[str] = []
+        self.agent_ids: List[str] = []
+        self.timelines: List[str] = []
+        self.plans: List[str] = []
+        self.prices = array("d")
+        self.confidences = array("d")
+        self._models: List[Optional[Bid]] = []
+
+    @classmethod
+    def from_bids(cls, bids: Iterable[Bid], task_id: Optional[str] = None) -> "BidBook":
+        book = cls(task_id)
+        for bid in bids:
+            book.append(bid)
+        return book
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]], task_id: Optional[str] = None) -> "BidBook":
+        """Inverse of rows(), e.g. for checkpointed bids."""
+        book = cls(task_id)
+        for r in rows:
+            book.add_row(r)
+        return book
+
+    def add(self, agent_id: str, price: float, timeline: str, confidence: float, plan: str,
+            bid_id: Optional[str] = None, model: Optional[Bid] = None, task_id: Optional[str] = None) -> int:
+        """Appends one bid's columns and returns its index. task_id defaults to the book's."""
+        self.task_id = self.task_id or task_id
+        self.bid_ids.append(bid_id or str(uuid.uuid4()))
+        self.task_ids.append(task_id or self.task_id)
+        self.agent_ids.append(agent_id)
+        self.timelines.append(timeline)
+        self.plans.append(plan)
+        self.prices.append(price)
+        self.confidences.append(confidence)
+        self._models.append(model)
+        return len(self._models) - 1
+
+    def add_row(self, row: Dict[str, Any]) -> int:
+        """Appends a row in the rows() layout, e.g. from WorkerAgent.bid_row or a checkpoint."""
+        return self.add(row["agent_id"], row["price"], row["timeline"], row["confidence"], row["plan"],
+                        bid_id=row["bid_id"], task_id=row["task_id"])
+
+    def append(self, bid: Bid) -> int:
+        return self.add(bid.agent_id, bid.price, bid.timeline, bid.confidence, bid.plan,
+                        bid_id=bid.bid_id, model=bid, task_id=bid.task_id)
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def __iter__(self) -> Iterator[Bid]:
+        return (self.bid(i) for i in range(len(self)))
+
+    def __getitem__(self, i: int) -> Bid:
+        return self.bid(i)
+
+    def bid(self, i: int) -> Bid:
+        model = self._models[i]
+        if model is None:
+            # Columns were typed on the way in; skip Pydantic validation
+            model = self._models[i] = Bid.model_construct(**self.row(i))
+        return model
+
+    def row(self, i: int) -> Dict[str, Any]:
+        """Same dict as bid(i).model_dump(), without building the model."""
+        return {
+            "bid_id": self.bid_ids[i],
+            "task_id": self.task_ids[i],
+            "agent_id": self.agent_ids[i],
+            "price": self.prices[i],
+            "timeline": self.timelines[i],
+            "confidence": self.confidences[i],
+            "plan": self.plans[i],
+        }
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return [self.row(i) for i in range(len(self))]
+
+    def price_array(self) -> np.ndarray:
+        return np.array(self.prices, dtype=float)
+
+    def confidence_array(self) -> np.ndarray:
+        return np.array(self.confidences, dtype=float)
@@ -18,6 +18,16 @@ class Bid(BaseModel):
     confidence: float = Field(..., description="Confidence score (0-1)")
     plan: str = Field(..., description="High-level execution plan")
 
+class WorkerProfile(BaseModel):
+    agent_id: str
+    persona: str
+    skills: List[str] = Field(default_factory=list, description="Empty for generalists, who are eligible for every task")
+    price_min: float = Field(0.75, description="Lowest price as a fraction of the task budget")
+    price_max: float = Field(0.9, description="Highest price as a fraction of the task budget")
+    model_id: str = "llama3.2:latest"
+    host: Optional[str] = None
+    bid_strategy: str = Field("llm", description="llm, heuristic or hybrid (heuristic numbers, LLM-written plan)")
+
 class NegotiationStep(BaseModel):
     step_id: int
     sender: str
@@ -1,97 +1,621 @@
-from typing import Dict, Any, Generator
+import contextvars
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Generator, List, Optional, Set, Tuple
 from src.agents.broker import BrokerAgent
-from src.agents.worker import get_worker_team
+from src.agents.worker import WorkerAgent
+from src.agents.worker_registry import WorkerRegistry
 from src.agents.negotiator import NegotiatorAgent
 from src.agents.contract_finalizer import ContractFinalizerAgent
 from src.agents.executor import ExecutorAgent
-from src.agents.validator import ValidatorAgent
+from src.agents.validator import ValidatorAgent, IncrementalValidator
 from src.agents.escrow import EscrowAgent
 from src.agents.reputation import ReputationAgent
+from src.utils.reputation_db import ReputationDB
+from src.utils.ledger import Ledger
+from src.utils.settlement import ReputationUpdateError, SettlementQueue
+from src.utils.metrics import METRICS, MetricsRegistry, Span
+from src.utils.event_store import EventStore
+from src.utils.checkpoints import CheckpointStore, CHECKPOINT_STAGES
 from src.models.schemas import TaskSpec, Bid, Contract, ExecutionResult, ValidationResult
+from src.models.bid_book import BidBook
+from src.speculation import Speculation, deliverable_overlap
 
 class MarketSimulation:
-    def __init__(self):
-        self.broker = BrokerAgent()
-        self.workers = get_worker_team()
-        self.negotiator = NegotiatorAgent()
-        self.contractor = ContractFinalizerAgent()
-        self.executor = ExecutorAgent()
-        self.validator = ValidatorAgent()
-        self.escrow = EscrowAgent()
-        self.reputation = ReputationAgent()
-
-    def run_stream(self, user_request: str) -> Generator[Dict[str, Any], None, None]:
-        log = []
-        
+    # Speculative output is kept when at least this share of the contract
+    # deliverables' content words appear in the task spec or the output
+    SPECULATION_MIN_OVERLAP = 0.5
+
+    def __init__(self, bid_timeout: Optional[float] = None, bid_deadline: Optional[float] = None,
+                 bid_quorum: Optional[int] = None, max_bid_workers: Optional[int] = None,
+                 metrics: Optional[MetricsRegistry] = None, stream_execution: bool = False,
+                 registry: Optional[WorkerRegistry] = None, bid_top_k: Optional[int] = None,
+                 min_reputation: Optional[float] = None, bid_strategy: Optional[str] = None,
+                 event_store: Optional[EventStore] = None, checkpoints: Optional[CheckpointStore] = None,
+                 ledger: Optional[Ledger] = None, settle_window: float = 0.0, speculative_execution: bool = False):
+        # LLM agents are process-wide and build their Agno Agent on first use, so a new
+        # MarketSimulation per request is cheap.
+        # Negotiator and reputation agent share one store so scoring sees fresh settlements
+        self.rep_db = ReputationDB()
+        self.broker = BrokerAgent.shared()
+        # Workers are looked up per task: only the top bid_top_k skill matches above
+        # min_reputation are asked to bid (None: every eligible worker / no floor)
+        self.registry = registry or WorkerRegistry.default()
+        self.bid_top_k = bid_top_k
+        self.min_reputation = min_reputation
+        # Overrides every worker's own bid_strategy ("llm", "heuristic", "hybrid") when set;
+        # run_stream can override it again per request
+        self.bid_strategy = bid_strategy
+        self.negotiator = NegotiatorAgent(rep_db=self.rep_db)
+        self.contractor = ContractFinalizerAgent.shared()
+        self.executor = ExecutorAgent.shared()
+        self.validator = ValidatorAgent.shared()
+        self.escrow = EscrowAgent(ledger)
+        self.reputation = ReputationAgent(db=self.rep_db)
+
+        # Bidding: per-worker timeout, overall deadline (seconds) and "first K bids" quorum.
+        # None disables the corresponding limit.
+        self.bid_timeout = bid_timeout
+        self.bid_deadline = bid_deadline
+        self.bid_quorum = bid_quorum
+        self.max_bid_workers = max_bid_workers
+
+        # Per-stage wall/LLM time, tokens and cache hits; attached to events as "metrics"
+        self.metrics = metrics or METRICS
+
+        # Stream executor output as EXECUTOR/partial events, checking it with an
+        # IncrementalValidator and cancelling generation on a clear failure
+        self.stream_execution = stream_execution
+
+        # Durable log of every run_stream event (None: events are not persisted)
+        self.event_store = event_store
+
+        # Every completed stage is checkpointed per task id so resume() can pick up
+        # after a crash; _in_flight holds the task ids running in this simulation
+        self.checkpoints = checkpoints or CheckpointStore()
+        self._in_flight: Set[str] = set()
+
+        # Payouts/refunds and reputation updates of concurrent transactions are
+        # written in batches, gathered for up to settle_window seconds
+        self.settlement = SettlementQueue(self.escrow.ledger, self.rep_db, window=settle_window)
+
+        # Start the winner's work from the task spec while the contract is drafted,
+        # keeping the output if it still covers the signed contract's deliverables
+        self.speculative_execution = speculative_execution
+
+    @property
+    def workers(self) -> List[WorkerAgent]:
+        """Every registered worker, whether or not it would be invited to bid."""
+        return self.registry.agents()
+
+    def _select_workers(self, task: TaskSpec) -> Tuple[List[WorkerAgent], Dict[str, Any]]:
+        workers = self.registry.select(task, self.bid_top_k, rep_db=self.rep_db, min_reputation=self.min_reputation)
+        event = {"step": "WORKERS", "status": "selected", "message": f"{len(workers)} of {len(self.registry)} workers invited to bid.",
+                 "data": {"workers": [w.agent_id for w in workers], "required_skills": task.required_skills}}
+        return workers, event
+
+    def _bid_reputations(self, workers: List[WorkerAgent], strategy: Optional[str]) -> Dict[str, float]:
+        # Only local bidders price off reputation; skip the lookup for all-LLM fan-outs
+        if all((strategy or w.bid_strategy) == "llm" for w in workers):
+            return {}
+        return self.rep_db.avg_scores(w.agent_id for w in workers)
+
+    def _collect_bids(self, task: TaskSpec, root: Span, bid_strategy: Optional[str] = None) -> Generator[Dict[str, Any], None, BidBook]:
+        """
+        Fans generate_bid out to every worker on a thread pool and yields a
+        WORKERS/bid event as soon as each bid lands. Returns the collected bids once
+        all workers answered, the quorum is reached or the deadline passes.
+        """
+        bids = BidBook(task.task_id)
+        started: Dict[str, float] = {}
+        workers, event = self._select_workers(task)
+        yield event
+        if not workers:
+            return bids
+        strategy = bid_strategy or self.bid_strategy
+        reputations = self._bid_reputations(workers, strategy)
+
+        def _bid(worker):
+            started[worker.agent_id] = time.monotonic()
+            with self.metrics.stage("WORKERS/bid", root, agent_id=worker.agent_id) as span:
+                return worker.bid_row(task, strategy, reputations.get(worker.agent_id)), span
+
+        pool = ThreadPoolExecutor(max_workers=self.max_bid_workers or len(workers))
+        futures = {}
+        for worker in workers:
+            yield {"step": "WORKERS", "status": "thinking", "message": f"{worker.agent_id} ({worker.persona}) is formulating a bid..."}
+            futures[pool.submit(_bid, worker)] = worker
+
+        deadline = time.monotonic() + self.bid_deadline if self.bid_deadline is not None else None
+        pending = set(futures)
+        try:
+            while pending:
+                if self.bid_quorum is not None and len(bids) >= self.bid_quorum:
+                    yield {"step": "WORKERS", "status": "quorum", "message": f"Quorum of {self.bid_quorum} bids reached; {len(pending)} bid(s) skipped."}
+                    break
+
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    yield {"step": "WORKERS", "status": "deadline", "message": f"Bidding deadline passed; {len(pending)} bid(s) skipped."}
+                    break
+
+                # Drop workers that have been running longer than bid_timeout
+                wake_at = [deadline] if deadline is not None else []
+                if self.bid_timeout is not None:
+                    queued = False
+                    for f in list(pending):
+                        worker = futures[f]
+                        start = started.get(worker.agent_id)
+                        if start is None:
+                            queued = True
+                        elif now - start >= self.bid_timeout:
+                            pending.discard(f)
+                            f.cancel()
+                            yield {"step": "WORKERS", "status": "timeout", "message": f"{worker.agent_id} timed out after {self.bid_timeout}s."}
+                        else:
+                            wake_at.append(start + self.bid_timeout)
+                    if not pending:
+                        break
+                    if queued:
+                        # Queued workers have no start time yet; re-check once one could have timed out
+                        wake_at.append(now + self.bid_timeout)
+
+                timeout = max(0.0, min(wake_at) - now) if wake_at else None
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for f in done:
+                    worker = futures[f]
+                    try:
+                        row, span = f.result()
+                    except Exception as e:
+                        yield {"step": "WORKERS", "status": "error", "message": f"{worker.agent_id} failed to bid: {e}"}
+                        continue
+                    i = bids.add_row(row)
+                    yield {"step": "WORKERS", "status": "bid", "message": f"Bid from {worker.agent_id}: ${row['price']}", "data": bids.row(i), "metrics": span.as_dict()}
+        finally:
+            # Late bids are discarded; running LLM calls finish in the background
+            pool.shutdown(wait=False, cancel_futures=True)
+        return bids
+
+    def _reservations(self, task: TaskSpec, bids: BidBook) -> Dict[str, float]:
+        """Registered workers won't go below the bottom of their price band."""
+        floors = {}
+        for agent_id in set(bids.agent_ids):
+            profile = self.registry.get(agent_id)
+            if profile is not None:
+                floors[agent_id] = profile.price_min * task.budget
+        return floors
+
+    def _negotiate(self, task: TaskSpec, bids: BidBook, root: Span) -> Tuple[List[Dict[str, Any]], Bid]:
+        events = []
+
+        with self.metrics.stage("NEGOTIATOR", root, bids=len(bids)) as span:
+            # Score once; the same ranking feeds the display event and the negotiation
+            scored = self.negotiator.score_bids(bids, task.budget)
+            result = self.negotiator.auction(task, bids, reservations=self._reservations(task, bids), scored=scored)
+            span.attributes["rounds"] = result.rounds
+        winning_bid = result.bid
+        events.append({"step": "NEGOTIATOR", "status": "scoring", "message": "Bid Scores Calculated", "data": scored.display()})
+        events.append({"step": "NEGOTIATOR", "status": "auction", "message": f"Reverse auction settled after {result.rounds} round(s)", "data": result.summary()})
+
+        if winning_bid.price > task.budget:
+             events.append({"step": "NEGOTIATOR", "status": "warning", "message": f"Negotiation finalized but over budget: {winning_bid.price} > {task.budget}"})
+
+        events.append({"step": "NEGOTIATOR", "status": "done", "message": f"Winner selected: {winning_bid.agent_id} at ${winning_bid.price}", "data": winning_bid.model_dump(), "metrics": span.as_dict()})
+        return events, winning_bid
+
+    def _record(self, root: Span, event: Dict[str, Any]):
+        if self.event_store is not None:
+            self.event_store.append(root.trace_id, event, task_id=root.attributes.get("task_id"))
+
+    def _lock_data(self, contract: Contract) -> Dict[str, Any]:
+        return {"contract_id": contract.contract_id, "amount": contract.payment, "task_id": contract.task_id}
+
+    def _partial_event(self, chunk: str, checker: IncrementalValidator) -> Dict[str, Any]:
+        return {"step": "EXECUTOR", "status": "partial", "message": f"{checker.chars} characters received...", "data": {"chunk": chunk}}
+
+    def _streamed_result(self, contract: Contract, checker: IncrementalValidator, span: Span) -> Tuple[ExecutionResult, Optional[ValidationResult], Dict[str, Any]]:
+        """Result, fail-fast validation (None if the output goes on to ValidatorAgent) and the closing EXECUTOR event."""
+        cancelled = checker.issue is not None
+        result = self.executor.result_from_output(contract, checker.output)
+        if cancelled:
+            span.attributes["cancelled"] = True
+            event = {"step": "EXECUTOR", "status": "cancelled", "message": f"Generation stopped early: {checker.issue}", "data": result.model_dump(), "metrics": span.as_dict()}
+        else:
+            event = {"step": "EXECUTOR", "status": "done", "message": "Work complete.", "data": result.model_dump(), "metrics": span.as_dict()}
+        return result, checker.failure() if checker.finish() else None, event
+
+    def _execute(self, contract: Contract, root: Span) -> Generator[Dict[str, Any], None, Tuple[ExecutionResult, Optional[ValidationResult]]]:
+        yield {"step": "EXECUTOR", "status": "active", "message": f"Worker {contract.selected_worker} executing task..."}
+        if not self.stream_execution:
+            with self.metrics.stage("EXECUTOR", root) as span:
+                result = self.executor.execute_task(contract)
+            self._checkpoint_execution(contract, result, None)
+            yield {"step": "EXECUTOR", "status": "done", "message": "Work complete.", "data": result.model_dump(), "metrics": span.as_dict()}
+            return result, None
+
+        # The span stays open across yields, so it is only made active around model calls
+        span = Span("EXECUTOR", parent=root)
+        checker = IncrementalValidator(contract)
+        chunks = self.executor.stream_task(contract)
+        try:
+            while True:
+                with self.metrics.active(span):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                span.mark_first_byte()
+                issue = checker.feed(chunk)
+                yield self._partial_event(chunk, checker)
+                if issue:
+                    break
+        finally:
+            with self.metrics.active(span):
+                chunks.close()
+            self.metrics.finish(span)
+
+        result, failed_fast, event = self._streamed_result(contract, checker, span)
+        self._checkpoint_execution(contract, result, failed_fast)
+        yield event
+        return result, failed_fast
+
+    # --- speculative execution ---
+
+    def _speculation_event(self, bid: Bid) -> Dict[str, Any]:
+        return {"step": "EXECUTOR", "status": "speculative", "message": f"Worker {bid.agent_id} starting from the task spec while the contract is drafted..."}
+
+    def _speculate(self, task: TaskSpec, bid: Bid, root: Span) -> Speculation:
+        spec = Speculation(task, bid, Span("EXECUTOR/speculative", parent=root, worker=bid.agent_id))
+        pool = ThreadPoolExecutor(max_workers=1)
+        spec.future = pool.submit(contextvars.copy_context().run, self._speculative_output, spec)
+        pool.shutdown(wait=False)
+        return spec
+
+    def _speculative_output(self, spec: Speculation) -> Optional[str]:
+        chunks = []
+        with self.metrics.active(spec.span):
+            stream = self.executor.stream_spec(spec.task)
+            try:
+                for chunk in stream:
+                    if spec.cancelled.is_set():
+                        # Closing the stream stops generation
+                        return None
+                    spec.span.mark_first_byte()
+                    chunks.append(chunk)
+            finally:
+                stream.close()
+        return "".join(chunks)
+
+    def _reconcile(self, spec: Speculation, contract: Contract, output: Optional[str]) -> Tuple[Optional[Tuple[ExecutionResult, Optional[ValidationResult]]], Dict[str, Any]]:
+        """
+        ((result, fail-fast validation), EXECUTOR event) when the speculative output
+        holds up against the signed contract, else (None, discard event) and the
+        caller runs the executor on the contract.
+        """
+        if output is None:
+            reason = "Speculative run did not finish"
+        else:
+            checker = IncrementalValidator(contract)
+            overlap = deliverable_overlap(contract, spec.task, output)
+            missing = [t for t in checker.required_terms if t.lower() not in output.lower()]
+            if overlap < self.SPECULATION_MIN_OVERLAP:
+                reason = f"Speculative output covers {overlap:.0%} of the contract deliverables"
+            elif missing:
+                reason = f"Speculative output never mentions {', '.join(missing)}"
+            else:
+                checker.feed(output)
+                self.metrics.finish(spec.span)
+                result, failed_fast, event = self._streamed_result(contract, checker, spec.span)
+                event["message"] += " (started before the contract was signed)"
+                self._checkpoint_execution(contract, result, failed_fast)
+                return (result, failed_fast), event
+        spec.span.attributes["discarded"] = True
+        self.metrics.finish(spec.span)
+        return None, {"step": "EXECUTOR", "status": "discarded", "message": f"{reason}; re-running against the contract.", "metrics": spec.span.as_dict()}
+
+    def _finalize_contract(self, task: TaskSpec, bid: Bid, speculation: Optional[Speculation]) -> Contract:
+        try:
+            return self.contractor.finalize_contract(task, bid)
+        except BaseException:
+            # No contract, no use for the speculative work
+            if speculation is not None:
+                speculation.cancel()
+            raise
+
+    def _execute_speculated(self, contract: Contract, root: Span, spec: Speculation) -> Generator[Dict[str, Any], None, Tuple[ExecutionResult, Optional[ValidationResult]]]:
+        try:
+            output = spec.future.result()
+        except Exception as e:
+            spec.span.attributes["error"] = repr(e)
+            output = None
+        adopted, event = self._reconcile(spec, contract, output)
+        yield event
+        if adopted is None:
+            adopted = yield from self._execute(contract, root)
+        return adopted
+
+    def _failed_fast_event(self, validation: ValidationResult) -> Dict[str, Any]:
+        return {"step": "VALIDATOR", "status": "done", "message": f"Validation Score: {validation.score} (failed fast: {validation.issues[0]})", "data": validation.model_dump()}
+
+    def _submit_settlement(self, contract: Contract, validation: ValidationResult, done=frozenset()) -> Future:
+        """Queues the payout (or refund) and reputation update, leaving out parts in done."""
+        return self.settlement.submit(
+            contract.contract_id if "ESCROW/settle" not in done else None,
+            contract.selected_worker if validation.passed else None,
+            contract.selected_worker if "REPUTATION" not in done else None,
+            validation.passed, validation.score, outcome_id=contract.contract_id,
+        )
+
+    def _settlement_result(self, future: Future) -> Tuple[Optional[bool], Optional[ReputationUpdateError]]:
+        """(ledger result, reputation failure) of a settled outcome; other failures raise."""
+        try:
+            return future.result(), None
+        except ReputationUpdateError as e:
+            return e.settled, e
+
+    def _settled(self, contract: Contract, validation: ValidationResult, settled: Optional[bool], span: Span,
+                 done=frozenset(), rep_error: Optional[ReputationUpdateError] = None) -> List[Dict[str, Any]]:
+        """
+        Checkpoints and events for a written settlement, closing the transaction. With
+        rep_error the payout is recorded but the transaction stays open for resume().
+        """
+        task_id = contract.task_id
+        events = []
+        if "ESCROW/settle" not in done:
+            self._checkpoint(task_id, "ESCROW/settle", passed=validation.passed)
+            if validation.passed:
+                events.append({"step": "ESCROW", "status": "release", "message": self.escrow.release_message(settled, contract.selected_worker),
+                               "data": {"contract_id": contract.contract_id, "recipient": contract.selected_worker}, "metrics": span.as_dict()})
+            else:
+                events.append({"step": "ESCROW", "status": "refund", "message": self.escrow.refund_message(settled),
+                               "data": {"contract_id": contract.contract_id}, "metrics": span.as_dict()})
+
+        if rep_error is not None:
+            events.append({"step": "ERROR", "status": "failed", "metrics": span.as_dict(),
+                           "message": f"Settled, but the {rep_error}. Resume task {task_id} to retry it."})
+            return events
+
+        if "REPUTATION" not in done:
+            self._checkpoint(task_id, "REPUTATION", passed=validation.passed)
+            events.append({"step": "REPUTATION", "status": "update", "message": "Reputation increased." if validation.passed else "Reputation penalized.",
+                           "data": {"agent_id": contract.selected_worker, "success": validation.passed, "score": validation.score}, "metrics": span.as_dict()})
+
+        if validation.passed:
+            self._checkpoint(task_id, "FINAL", status="success")
+            events.append({"step": "FINAL", "status": "success", "message": "Transaction Successfully Closed."})
+        else:
+            self._checkpoint(task_id, "FINAL", status="failed")
+            events.append({"step": "FINAL", "status": "failed", "message": "Transaction Failed."})
+        return events
+
+    def _settle(self, contract: Contract, validation: ValidationResult, root: Span, done=frozenset()) -> Generator[Dict[str, Any], None, None]:
+        """Pays out or refunds, updates reputation and closes the transaction, skipping parts in done."""
+        with self.metrics.stage("ESCROW/settle", root) as span:
+            settled, rep_error = self._settlement_result(self._submit_settlement(contract, validation, done))
+        yield from self._settled(contract, validation, settled, span, done, rep_error)
+
+    # --- checkpoints and recovery ---
+
+    def _checkpoint(self, task_id: str, stage: str, **payload):
+        self.checkpoints.save(task_id, stage, payload)
+
+    def _checkpoint_execution(self, contract: Contract, result: ExecutionResult, failed_fast: Optional[ValidationResult]):
+        self._checkpoint(contract.task_id, "EXECUTOR", result=result.model_dump(),
+                         failed_fast=failed_fast.model_dump() if failed_fast is not None else None)
+
+    def _begin(self, root: Span, task: TaskSpec):
+        root.attributes["task_id"] = task.task_id
+        self._in_flight.add(task.task_id)
+
+    def _restore(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Checkpointed stage outputs of task_id as the objects run_stream works with (None if unknown)."""
+        saved = self.checkpoints.load(task_id)
+        if "FINAL" in saved and "BROKER" not in saved:
+            # Closed transactions are compacted to their outcome
+            return {"done": {"FINAL"}, "final": saved["FINAL"]["status"]}
+        if "BROKER" not in saved:
+            return None
+        state = {"done": set(saved), "user_request": saved["BROKER"]["user_request"], "task": TaskSpec(**saved["BROKER"]["task"])}
+        if "WORKERS" in saved:
+            state["bids"] = BidBook.from_rows(saved["WORKERS"]["bids"])
+        if "NEGOTIATOR" in saved:
+            state["winning_bid"] = Bid(**saved["NEGOTIATOR"]["winning_bid"])
+        if "CONTRACT" in saved:
+            state["contract"] = Contract(**saved["CONTRACT"]["contract"])
+        if "EXECUTOR" in saved:
+            state["result"] = ExecutionResult(**saved["EXECUTOR"]["result"])
+            failed_fast = saved["EXECUTOR"]["failed_fast"]
+            state["validation"] = ValidationResult(**failed_fast) if failed_fast else None
+        if "VALIDATOR" in saved:
+            state["validation"] = ValidationResult(**saved["VALIDATOR"]["validation"])
+        if "FINAL" in saved:
+            state["final"] = saved["FINAL"]["status"]
+        return state
+
+    def _resume_state(self, task_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """(state to resume from, None) or (None, the event explaining why there is nothing to resume)."""
+        return self._resume_check(task_id, self._restore(task_id))
+
+    def _resume_check(self, task_id: str, state: Optional[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        # Separate from the checkpoint read, so the async engine can do that off the loop
+        # and still check _in_flight right before the transaction claims the task
+        if state is None:
+            return None, {"step": "ERROR", "message": f"No checkpoint for task {task_id}."}
+        if "FINAL" in state["done"]:
+            return None, {"step": "FINAL", "status": state["final"], "message": f"Task {task_id} was already closed."}
+        if task_id in self._in_flight:
+            return None, {"step": "ERROR", "message": f"Task {task_id} is still running."}
+        return state, None
+
+    def _resumed_event(self, task: TaskSpec, done) -> Dict[str, Any]:
+        completed = [stage for stage in CHECKPOINT_STAGES if stage in done]
+        return {"step": "RESUME", "status": "active", "message": f"Resuming task {task.task_id} after {completed[-1]}",
+                "data": {"task_id": task.task_id, "completed": completed}}
+
+    def _orphaned_locks(self, max_age: float) -> List[Tuple[str, Optional[str], bool]]:
+        """
+        (contract_id, task_id, resumable) for escrow locks older than max_age seconds
+        whose transaction is not running here. A lock is resumable when its execution
+        result was checkpointed, so only validation and settlement are left.
+        """
+        now = time.time()
+        orphans = []
+        for contract_id, entry in self.escrow.ledger.locked().items():
+            task_id = entry.get("task_id")
+            # Locks written before locked_at was recorded count as old
+            if task_id in self._in_flight or now - entry.get("locked_at", 0) < max_age:
+                continue
+            state = self._restore(task_id) if task_id else None
+            contract = state.get("contract") if state else None
+            resumable = (contract is not None and contract.contract_id == contract_id
+                         and "EXECUTOR" in state["done"] and "FINAL" not in state["done"])
+            orphans.append((contract_id, task_id, resumable))
+        return orphans
+
+    def _refund_orphan(self, contract_id: str, task_id: Optional[str]) -> Dict[str, Any]:
+        refund_msg = self.escrow.refund(contract_id)
+        if task_id:
+            self._checkpoint(task_id, "FINAL", status="refunded")
+        event = {"step": "ESCROW", "status": "refund", "message": f"Orphaned lock: {refund_msg}", "data": {"contract_id": contract_id}}
+        if self.event_store is not None:
+            self.event_store.append(task_id or contract_id, event, task_id=task_id)
+        return event
+
+    def _sweep_event(self, contract_id: str, task_id: str) -> Dict[str, Any]:
+        return {"step": "SWEEPER", "status": "resume", "message": f"Finishing orphaned contract {contract_id}...",
+                "data": {"contract_id": contract_id, "task_id": task_id}}
+
+    def sweep_escrow(self, max_age: float = 600.0) -> Generator[Dict[str, Any], None, None]:
+        """
+        Settles escrow locks left behind by crashed transactions: locks with a
+        checkpointed execution result are validated and settled via resume, the
+        rest are refunded. max_age keeps locks of transactions that may still be
+        running in another process out of the sweep.
+        """
+        for contract_id, task_id, resumable in self._orphaned_locks(max_age):
+            if resumable:
+                yield self._sweep_event(contract_id, task_id)
+                yield from self.resume(task_id)
+            else:
+                yield self._refund_orphan(contract_id, task_id)
+
+    # --- transactions ---
+
+    def run_stream(self, user_request: str, bid_strategy: Optional[str] = None) -> Generator[Dict[str, Any], None, None]:
+        yield from self._transaction(user_request, bid_strategy)
+
+    def resume(self, task_id: str, bid_strategy: Optional[str] = None) -> Generator[Dict[str, Any], None, None]:
+        """
+        Continues an interrupted transaction at its first unfinished stage. Completed
+        stages are not re-run; their checkpointed output is reused.
+        """
+        state, event = self._resume_state(task_id)
+        if event is not None:
+            yield event
+            return
+        yield from self._transaction(state["user_request"], bid_strategy, state)
+
+    def _transaction(self, user_request: str, bid_strategy: Optional[str] = None, state: Optional[Dict[str, Any]] = None) -> Generator[Dict[str, Any], None, None]:
+        root = self.metrics.start_transaction()
+        try:
+            for event in self._run_stream(user_request, root, bid_strategy, state):
+                self._record(root, event)
+                yield event
+        finally:
+            self._in_flight.discard(root.attributes.get("task_id"))
+            self.metrics.finish(root)
+
+    def _run_stream(self, user_request: str, root: Span, bid_strategy: Optional[str] = None,
+                    state: Optional[Dict[str, Any]] = None) -> Generator[Dict[str, Any], None, None]:
+        # On resume, state holds the restored output of every checkpointed stage
+        state = state or {"done": set()}
+        done = state["done"]
+
         # 1. Broker
-        yield {"step": "BROKER", "status": "active", "message": f"Broker analyzing request: {user_request}"}
-        task = self.broker.create_task(user_request)
-        yield {"step": "BROKER", "status": "done", "message": f"Task Created: {task.task_id}", "data": task.model_dump()}
-        
+        if "BROKER" in done:
+            task = state["task"]
+            self._begin(root, task)
+            yield self._resumed_event(task, done)
+        else:
+            yield {"step": "BROKER", "status": "active", "message": f"Broker analyzing request: {user_request}"}
+            with self.metrics.stage("BROKER", root) as span:
+                task = self.broker.create_task(user_request)
+            self._begin(root, task)
+            data = task.model_dump()
+            self._checkpoint(task.task_id, "BROKER", user_request=user_request, task=data)
+            yield {"step": "BROKER", "status": "done", "message": f"Task Created: {task.task_id}", "data": data, "metrics": span.as_dict()}
+
         # 2. Bidding
-        yield {"step": "WORKERS", "status": "active", "message": "Agents are evaluating the task..."}
-        bids = []
-        for worker in self.workers:
-            yield {"step": "WORKERS", "status": "thinking", "message": f"{worker.agent_id} ({worker.persona}) is formulating a bid..."}
-            bid = worker.generate_bid(task)
-            bids.append(bid)
-            yield {"step": "WORKERS", "status": "bid", "message": f"Bid from {worker.agent_id}: ${bid.price}", "data": bid.model_dump()}
+        if "WORKERS" in done:
+            bids = state["bids"]
+        else:
+            yield {"step": "WORKERS", "status": "active", "message": "Agents are evaluating the task..."}
+            bids = yield from self._collect_bids(task, root, bid_strategy)
+            if bids:
+                self._checkpoint(task.task_id, "WORKERS", bids=bids.rows())
 
         if not bids:
             yield {"step": "ERROR", "message": "No bids received."}
             return
 
         # 3. Negotiation
-        yield {"step": "NEGOTIATOR", "status": "active", "message": "Negotiator scoring bids..."}
-        
-        # Calculate scores for display
-        scored_bids_data = []
-        for b in bids:
-            score = self.negotiator.score_bid(b, task.budget)
-            scored_bids_data.append({"agent": b.agent_id, "score": f"{score:.2f}", "price": b.price})
-        yield {"step": "NEGOTIATOR", "status": "scoring", "message": "Bid Scores Calculated", "data": scored_bids_data}
-        
-        winning_bid = self.negotiator.negotiate(task, bids, self.workers)
-        
-        if winning_bid.price > task.budget:
-             yield {"step": "NEGOTIATOR", "status": "warning", "message": f"Negotiation finalized but over budget: {winning_bid.price} > {task.budget}"}
-        
-        yield {"step": "NEGOTIATOR", "status": "done", "message": f"Winner selected: {winning_bid.agent_id} at ${winning_bid.price}", "data": winning_bid.model_dump()}
+        if "NEGOTIATOR" in done:
+            winning_bid = state["winning_bid"]
+        else:
+            yield {"step": "NEGOTIATOR", "status": "active", "message": "Negotiator scoring bids..."}
+            events, winning_bid = self._negotiate(task, bids, root)
+            self._checkpoint(task.task_id, "NEGOTIATOR", winning_bid=winning_bid.model_dump())
+            yield from events
 
-        # 4. Contract
-        yield {"step": "CONTRACT", "status": "active", "message": "Drafting contract..."}
-        contract = self.contractor.finalize_contract(task, winning_bid)
-        yield {"step": "CONTRACT", "status": "done", "message": f"Contract {contract.contract_id} signed.", "data": contract.model_dump()}
+        # 4. Contract (optionally with the executor already working from the task spec)
+        speculation = None
+        try:
+            if "CONTRACT" in done:
+                contract = state["contract"]
+            else:
+                if self.speculative_execution and "EXECUTOR" not in done:
+                    speculation = self._speculate(task, winning_bid, root)
+                    yield self._speculation_event(winning_bid)
+                yield {"step": "CONTRACT", "status": "active", "message": "Drafting contract..."}
+                with self.metrics.stage("CONTRACT", root) as span:
+                    contract = self._finalize_contract(task, winning_bid, speculation)
+                data = contract.model_dump()
+                self._checkpoint(task.task_id, "CONTRACT", contract=data)
+                yield {"step": "CONTRACT", "status": "done", "message": f"Contract {contract.contract_id} signed.", "data": data, "metrics": span.as_dict()}
 
-        # 5. Escrow Lock
-        yield {"step": "ESCROW", "status": "active", "message": "Locking funds..."}
-        lock_msg = self.escrow.lock(contract.contract_id, contract.payment, task.task_id)
-        yield {"step": "ESCROW", "status": "done", "message": lock_msg}
+            # 5. Escrow Lock (re-locking the same contract on resume is idempotent)
+            if "ESCROW" not in done:
+                yield {"step": "ESCROW", "status": "active", "message": "Locking funds..."}
+                with self.metrics.stage("ESCROW/lock", root) as span:
+                    lock_msg = self.escrow.lock(contract.contract_id, contract.payment, task.task_id)
+                self._checkpoint(task.task_id, "ESCROW", lock=self._lock_data(contract))
+                yield {"step": "ESCROW", "status": "done", "message": lock_msg, "data": self._lock_data(contract), "metrics": span.as_dict()}
 
-        # 6. Execution
-        yield {"step": "EXECUTOR", "status": "active", "message": f"Worker {contract.selected_worker} executing task..."}
-        result = self.executor.execute_task(contract)
-        yield {"step": "EXECUTOR", "status": "done", "message": "Work complete.", "data": result.model_dump()}
+            # 6. Execution
+            if "EXECUTOR" in done:
+                result, validation = state["result"], state["validation"]
+            elif speculation is not None:
+                result, validation = yield from self._execute_speculated(contract, root, speculation)
+            else:
+                result, validation = yield from self._execute(contract, root)
 
-        # 7. Validation
-        yield {"step": "VALIDATOR", "status": "active", "message": "Validating output..."}
-        validation = self.validator.validate_work(contract, result)
-        yield {"step": "VALIDATOR", "status": "done", "message": f"Validation Score: {validation.score}", "data": validation.model_dump()}
+            # 7. Validation (skipped when incremental checks already failed the output)
+            if "VALIDATOR" in done:
+                validation = state["validation"]
+            else:
+                yield {"step": "VALIDATOR", "status": "active", "message": "Validating output..."}
+                if validation is not None:
+                    self._checkpoint(task.task_id, "VALIDATOR", validation=validation.model_dump())
+                    yield self._failed_fast_event(validation)
+                else:
+                    with self.metrics.stage("VALIDATOR", root) as span:
+                        validation = self.validator.validate_work(contract, result)
+                    data = validation.model_dump()
+                    self._checkpoint(task.task_id, "VALIDATOR", validation=data)
+                    yield {"step": "VALIDATOR", "status": "done", "message": f"Validation Score: {validation.score}", "data": data, "metrics": span.as_dict()}
 
-        # 8. Settlement
-        if validation.passed:
-            release_msg = self.escrow.release(contract.contract_id, contract.selected_worker)
-            yield {"step": "ESCROW", "status": "release", "message": release_msg}
-            
-            self.reputation.update(contract.selected_worker, True, validation.score)
-            yield {"step": "REPUTATION", "status": "update", "message": "Reputation increased."}
-            
-            yield {"step": "FINAL", "status": "success", "message": "Transaction Successfully Closed."}
-        else:
-            refund_msg = self.escrow.refund(contract.contract_id)
-            yield {"step": "ESCROW", "status": "refund", "message": refund_msg}
-            
-            self.reputation.update(contract.selected_worker, False, validation.score)
-            yield {"step": "REPUTATION", "status": "update", "message": "Reputation penalized."}
-            
-            yield {"step": "FINAL", "status": "failed", "message": "Transaction Failed."}
+            # 8. Settlement
+            yield from self._settle(contract, validation, root, done)
+        finally:
+            # Also reached when the consumer closes the stream mid-transaction
+            if speculation is not None:
+                speculation.cancel()
@@ -0,0 +1,181 @@
+import asyncio
+from typing import Dict, Any, AsyncGenerator, Awaitable, Callable, Iterable, List, Optional, Tuple
+from src.async_orchestration import AsyncMarketSimulation
+from src.models.schemas import TaskSpec, Bid, Contract
+from src.models.bid_book import BidBook
+from src.speculation import Speculation
+from src.utils.metrics import Span
+
+STAGES = ["BROKER", "WORKERS", "NEGOTIATOR", "CONTRACT", "ESCROW", "EXECUTOR", "VALIDATOR", "SETTLEMENT"]
+
+class _Job:
+    """One transaction moving through the pipeline, with everything later stages need."""
+    def __init__(self, idx: int, user_request: str, root: Span):
+        self.idx = idx
+        self.user_request = user_request
+        self.root = root
+        self.task: Optional[TaskSpec] = None
+        self.bids = BidBook()
+        self.winning_bid: Optional[Bid] = None
+        self.contract: Optional[Contract] = None
+        # Executor run started alongside contract drafting (speculative_execution)
+        self.speculation: Optional[Speculation] = None
+        # "result" and "validation", filled by the execution and validation stages
+        self.outcome: Dict[str, Any] = {}
+
+class PipelinedMarket:
+    """
+    Stage-pipelined marketplace. Every stage is a pool of workers joined to the
+    next stage by a bounded queue, so task N+1 can bid while task N executes and a
+    full queue blocks the stage in front of it (backpressure). Steady-state
+    throughput is set by the slowest stage instead of the sum of all stages.
+
+    stage_workers overrides workers_per_stage for individual stages,
+    e.g. {"EXECUTOR": 4}. Events match AsyncMarketSimulation.run_stream.
+    """
+    def __init__(self, simulation: Optional[AsyncMarketSimulation] = None, workers_per_stage: int = 2,
+                 stage_workers: Optional[Dict[str, int]] = None, queue_size: int = 4):
+        self.simulation = simulation or AsyncMarketSimulation()
+        self.workers = {stage: workers_per_stage for stage in STAGES}
+        self.workers.update(stage_workers or {})
+        self.queue_size = queue_size
+
+    # Stage handlers return True to hand the job on, False to end the transaction.
+    # Escrow, settlement and checkpoints touch the ledger/SQLite, so they run off the event loop.
+
+    async def _broker(self, job: _Job, emit) -> bool:
+        sim = self.simulation
+        await emit({"step": "BROKER", "status": "active", "message": f"Broker analyzing request: {job.user_request}"})
+        with sim.metrics.stage("BROKER", job.root) as span:
+            job.task = await sim.broker.acreate_task(job.user_request)
+        sim._begin(job.root, job.task)
+        data = job.task.model_dump()
+        await sim._acheckpoint(job.task.task_id, "BROKER", user_request=job.user_request, task=data)
+        await emit({"step": "BROKER", "status": "done", "message": f"Task Created: {job.task.task_id}", "data": data, "metrics": span.as_dict()})
+        return True
+
+    async def _bidding(self, job: _Job, emit) -> bool:
+        await emit({"step": "WORKERS", "status": "active", "message": "Agents are evaluating the task..."})
+        async for event in self.simulation._collect_bids(job.task, job.bids, job.root):
+            await emit(event)
+        if not job.bids:
+            await emit({"step": "ERROR", "message": "No bids received."})
+            return False
+        await self.simulation._acheckpoint(job.task.task_id, "WORKERS", bids=job.bids.rows())
+        return True
+
+    async def _negotiation(self, job: _Job, emit) -> bool:
+        await emit({"step": "NEGOTIATOR", "status": "active", "message": "Negotiator scoring bids..."})
+        events, job.winning_bid = await asyncio.to_thread(self.simulation._negotiate, job.task, job.bids, job.root)
+        await self.simulation._acheckpoint(job.task.task_id, "NEGOTIATOR", winning_bid=job.winning_bid.model_dump())
+        for event in events:
+            await emit(event)
+        return True
+
+    async def _contract(self, job: _Job, emit) -> bool:
+        sim = self.simulation
+        if sim.speculative_execution:
+            job.speculation = sim._speculate(job.task, job.winning_bid, job.root)
+            await emit(sim._speculation_event(job.winning_bid))
+        await emit({"step": "CONTRACT", "status": "active", "message": "Drafting contract..."})
+        with sim.metrics.stage("CONTRACT", job.root) as span:
+            job.contract = await sim._finalize_contract(job.task, job.winning_bid, job.speculation)
+        data = job.contract.model_dump()
+        await sim._acheckpoint(job.task.task_id, "CONTRACT", contract=data)
+        await emit({"step": "CONTRACT", "status": "done", "message": f"Contract {job.contract.contract_id} signed.", "data": data, "metrics": span.as_dict()})
+        return True
+
+    async def _escrow(self, job: _Job, emit) -> bool:
+        sim, contract = self.simulation, job.contract
+        await emit({"step": "ESCROW", "status": "active", "message": "Locking funds..."})
+        with sim.metrics.stage("ESCROW/lock", job.root) as span:
+            lock_msg = await asyncio.to_thread(sim.escrow.lock, contract.contract_id, contract.payment, job.task.task_id)
+        await sim._acheckpoint(job.task.task_id, "ESCROW", lock=sim._lock_data(contract))
+        await emit({"step": "ESCROW", "status": "done", "message": lock_msg, "data": sim._lock_data(contract), "metrics": span.as_dict()})
+        return True
+
+    async def _execution(self, job: _Job, emit) -> bool:
+        if job.speculation is not None:
+            events = self.simulation._execute_speculated(job.contract, job.root, job.outcome, job.speculation)
+        else:
+            events = self.simulation._execute(job.contract, job.root, job.outcome)
+        async for event in events:
+            await emit(event)
+        return True
+
+    async def _validation(self, job: _Job, emit) -> bool:
+        async for event in self.simulation._validate(job.contract, job.root, job.outcome):
+            await emit(event)
+        return True
+
+    async def _settlement(self, job: _Job, emit) -> bool:
+        async for event in self.simulation._settle(job.contract, job.outcome["validation"], job.root):
+            await emit(event)
+        return False
+
+    def _handlers(self) -> List[Callable[[_Job, Any], Awaitable[bool]]]:
+        return [self._broker, self._bidding, self._negotiation, self._contract,
+                self._escrow, self._execution, self._validation, self._settlement]
+
+    async def stream(self, user_requests: Iterable[str]) -> AsyncGenerator[Tuple[int, Dict[str, Any]], None]:
+        """Yields (request_index, event) pairs from all transactions as they happen."""
+        metrics = self.simulation.metrics
+        handlers = self._handlers()
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in handlers]
+        out: asyncio.Queue = asyncio.Queue()
+        finished = object()
+
+        async def _finish(job: _Job):
+            self.simulation._in_flight.discard(job.root.attributes.get("task_id"))
+            metrics.finish(job.root)
+            await out.put((job.idx, finished))
+
+        async def _stage_worker(i: int):
+            handler, inbox = handlers[i], queues[i]
+            outbox = queues[i + 1] if i + 1 < len(queues) else None
+            while True:
+                job = await inbox.get()
+
+                async def emit(event, job=job):
+                    await self.simulation._arecord(job.root, event)
+                    await out.put((job.idx, event))
+
+                try:
+                    proceed = await handler(job, emit)
+                except Exception as e:
+                    await emit({"step": "ERROR", "status": "failed", "message": f"Transaction crashed in {STAGES[i]}: {e}"})
+                    proceed = False
+                if proceed and outbox is not None:
+                    # Blocks while the next stage is saturated
+                    await outbox.put(job)
+                else:
+                    await _finish(job)
+
+        async def _feed(requests: List[str]):
+            for idx, user_request in enumerate(requests):
+                await queues[0].put(_Job(idx, user_request, metrics.start_transaction()))
+
+        user_requests = list(user_requests)
+        tasks = [asyncio.ensure_future(_feed(user_requests))]
+        for i, stage in enumerate(STAGES):
+            tasks += [asyncio.ensure_future(_stage_worker(i)) for _ in range(max(1, self.workers[stage]))]
+
+        remaining = len(user_requests)
+        try:
+            while remaining:
+                idx, event = await out.get()
+                if event is finished:
+                    remaining -= 1
+                    continue
+                yield idx, event
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    async def run_all(self, user_requests: Iterable[str]) -> List[List[Dict[str, Any]]]:
+        """Runs every request and returns each transaction's event log, in request order."""
+        user_requests = list(user_requests)
+        logs: List[List[Dict[str, Any]]] = [[] for _ in user_requests]
+        async for idx, event in self.stream(user_requests):
+            logs[idx].append(event)
+        return logs
@@ -0,0 +1,123 @@
+import asyncio
+import math
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from src.async_orchestration import AsyncMarketSimulation, MarketScheduler
+from src.utils.ledger import Ledger, SqliteLedgerStorage, WalLedgerStorage
+from src.utils.metrics import METRICS, MetricsRegistry, add_parse_failures, parse_failure_counts
+
+# Both engines are safe to share between processes: SQLite through its write
+# lock, the WAL through flock plus replay of the other writers' ops
+LEDGER_ENGINES = {"sqlite": SqliteLedgerStorage, "wal": WalLedgerStorage}
+
+def _run_shard(shard: List[Tuple[int, str]], events, simulation_kwargs: Dict[str, Any],
+               concurrency: int, ledger_engine: str) -> Tuple[MetricsRegistry, Dict[tuple, int]]:
+    """
+    Runs one shard of (request_index, request) pairs in a worker process. Events go
+    to the events queue as (request_index, event); returns the shard's metrics and
+    the parse-failure counts it added.
+    """
+    parse_before = parse_failure_counts()
+    metrics = MetricsRegistry()
+    sim = AsyncMarketSimulation(metrics=metrics, ledger=Ledger(LEDGER_ENGINES[ledger_engine]()), **simulation_kwargs)
+    scheduler = MarketScheduler(sim, max_concurrent=concurrency)
+
+    async def _run():
+        async for i, event in scheduler.stream([user_request for _, user_request in shard]):
+            # A Manager queue put is a blocking round trip to the manager process
+            await asyncio.to_thread(events.put, (shard[i][0], event))
+
+    try:
+        asyncio.run(_run())
+    finally:
+        sim.escrow.ledger.flush()
+        if sim.event_store is not None:
+            sim.event_store.close()
+    parse_added = {k: n - parse_before.get(k, 0) for k, n in parse_failure_counts().items() if n != parse_before.get(k, 0)}
+    return metrics, parse_added
+
+class ShardedMarket:
+    """
+    Multi-process marketplace. Requests are cut into shards of chunk_size and
+    handed to a pool of `processes` worker processes; each runs its shard on an
+    AsyncMarketSimulation with up to `concurrency` transactions in flight, so the
+    orchestration, scoring and serialization work uses every core. Idle workers
+    pick up the next shard, which keeps uneven shards balanced.
+
+    Ledger, reputation, checkpoints and the LLM cache live in SQLite (or the
+    flock-guarded ledger WAL) in the working directory, so every process sees one
+    consistent state. Each shard's metrics are merged into `metrics` as it
+    finishes, giving one view across processes.
+
+    simulation_kwargs are sent to the workers and must be picklable;
+    initializer(*initargs) runs once in every worker, e.g. to install a model factory.
+    """
+    def __init__(self, processes: Optional[int] = None, concurrency: int = 4,
+                 simulation_kwargs: Optional[Dict[str, Any]] = None, ledger_engine: str = "sqlite",
+                 chunk_size: Optional[int] = None, metrics: Optional[MetricsRegistry] = None,
+                 initializer: Optional[Callable] = None, initargs: tuple = (), start_method: str = "spawn"):
+        if ledger_engine not in LEDGER_ENGINES:
+            raise ValueError(f"Unknown ledger engine {ledger_engine!r}; expected one of {sorted(LEDGER_ENGINES)}")
+        self.processes = processes or os.cpu_count() or 1
+        self.concurrency = concurrency
+        self.simulation_kwargs = dict(simulation_kwargs or {})
+        self.ledger_engine = ledger_engine
+        self.chunk_size = chunk_size
+        self.metrics = metrics or METRICS
+        self.initializer = initializer
+        self.initargs = initargs
+        # spawn: forking a process that already runs event loops and threads is unsafe
+        self.start_method = start_method
+
+    def _shards(self, user_requests: List[str]) -> List[List[Tuple[int, str]]]:
+        # About four shards per process by default, so stragglers can be balanced out
+        size = self.chunk_size or max(1, math.ceil(len(user_requests) / (4 * self.processes)))
+        indexed = list(enumerate(user_requests))
+        return [indexed[i:i + size] for i in range(0, len(indexed), size)]
+
+    def _merge(self, result: Tuple[MetricsRegistry, Dict[tuple, int]]):
+        metrics, parse_added = result
+        self.metrics.merge(metrics)
+        add_parse_failures(parse_added)
+
+    def stream(self, user_requests: Iterable[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yields (request_index, event) pairs from all processes as they arrive."""
+        user_requests = list(user_requests)
+        if not user_requests:
+            return
+        ctx = multiprocessing.get_context(self.start_method)
+        shards = self._shards(user_requests)
+        with ctx.Manager() as manager, ProcessPoolExecutor(
+            max_workers=min(self.processes, len(shards)), mp_context=ctx,
+            initializer=self.initializer, initargs=self.initargs,
+        ) as pool:
+            events = manager.Queue()
+            pending = {pool.submit(_run_shard, shard, events, self.simulation_kwargs, self.concurrency, self.ledger_engine)
+                       for shard in shards}
+            while pending:
+                try:
+                    yield events.get(timeout=0.05)
+                except queue.Empty:
+                    pass
+                done = {f for f in pending if f.done()}
+                for f in done:
+                    # Re-raises if a worker process crashed
+                    self._merge(f.result())
+                pending -= done
+            # A finished shard has put all of its events already
+            while True:
+                try:
+                    yield events.get_nowait()
+                except queue.Empty:
+                    break
+
+    def run_all(self, user_requests: Iterable[str]) -> List[List[Dict[str, Any]]]:
+        """Runs every request and returns each transaction's event log, in request order."""
+        user_requests = list(user_requests)
+        logs: List[List[Dict[str, Any]]] = [[] for _ in user_requests]
+        for idx, event in self.stream(user_requests):
+            logs[idx].append(event)
+        return logs
@@ -0,0 +1,48 @@
+import re
+import threading
+from typing import Any, Iterable, Set
+from src.models.schemas import Bid, Contract, TaskSpec
+from src.utils.metrics import Span
+
+_TERM = re.compile(r"[a-z][a-z0-9_]{3,}")
+_STOPWORDS = frozenset("""
+    about also based been being both each ensure from have include including into make must only other
+    provide should such that their them then there these they this those using what when where which
+    will with within without write your
+""".split())
+
+def _terms(texts: Iterable[str]) -> Set[str]:
+    # Plural-insensitive, so "tests" in a deliverable matches "test" in the output
+    return {t[:-1] if t.endswith("s") else t for t in _TERM.findall(" ".join(texts).lower())} - _STOPWORDS
+
+def deliverable_overlap(contract: Contract, task: TaskSpec, output: str) -> float:
+    """
+    Share of the content words in the contract deliverables that already appear
+    in the task spec or the speculative output. Low overlap means the contract
+    asks for something the speculative run was never told about.
+    """
+    wanted = _terms(contract.deliverables)
+    if not wanted:
+        return 1.0
+    known = _terms([task.description, *task.acceptance_criteria, output])
+    return len(wanted & known) / len(wanted)
+
+class Speculation:
+    """
+    Executor run for the winning bid, started from the task spec while the
+    contract is still being drafted. The engine that starts it sets `future`
+    (a concurrent Future or an asyncio Task) resolving to the output, or None
+    when cancelled before it finished.
+    """
+    def __init__(self, task: TaskSpec, bid: Bid, span: Span):
+        self.task = task
+        self.bid = bid
+        self.span = span
+        self.cancelled = threading.Event()
+        self.future: Any = None
+
+    def cancel(self):
+        # Threaded runs check the flag between chunks; tasks are cancelled outright
+        self.cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
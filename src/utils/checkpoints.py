@@ -0,0 +1,131 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List
+
+CHECKPOINT_DB_FILE = "checkpoints.sqlite3"
+
+# Stage names in transaction order. Settlement is split so resume() skips the
+# parts already checkpointed; a crash after the settlement commit but before its
+# checkpoints is covered by the stores themselves (the ledger skips settled
+# contracts, ReputationDB skips contract ids it has already counted).
+CHECKPOINT_STAGES = ["BROKER", "WORKERS", "NEGOTIATOR", "CONTRACT", "ESCROW", "EXECUTOR", "VALIDATOR",
+                     "ESCROW/settle", "REPUTATION", "FINAL"]
+
+class CheckpointStore:
+    """
+    Output of every completed transaction stage, keyed by task id, in SQLite (WAL
+    mode) so any process can resume a transaction another one started. Payloads are
+    plain JSON (model_dump() of the stage's Pydantic objects).
+
+    Saving FINAL compacts the transaction to that one row (its outcome), and open
+    transactions are tracked in their own small table, so the store and
+    unfinished() scale with the transactions in progress, not with history.
+    """
+    def __init__(self, path: str = CHECKPOINT_DB_FILE):
+        # Absolute, so connections opened later from other threads hit the same file
+        self.path = os.path.abspath(path)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                task_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                saved_at REAL NOT NULL,
+                PRIMARY KEY (task_id, stage)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS checkpoints_saved_at ON checkpoints (saved_at)")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'open_tasks'").fetchone():
+                conn.execute("""
+                    CREATE TABLE open_tasks (
+                        task_id TEXT PRIMARY KEY,
+                        started_at REAL NOT NULL,
+                        saved_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX open_tasks_saved_at ON open_tasks (saved_at)")
+                # Stores written before the table existed: index their open transactions, compact the closed ones
+                conn.execute("""
+                    INSERT INTO open_tasks (task_id, started_at, saved_at)
+                    SELECT task_id, MIN(saved_at), MAX(saved_at) FROM checkpoints
+                    GROUP BY task_id HAVING SUM(stage = 'FINAL') = 0
+                """)
+                conn.execute("""
+                    DELETE FROM checkpoints WHERE stage != 'FINAL'
+                    AND task_id IN (SELECT task_id FROM checkpoints WHERE stage = 'FINAL')
+                """)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def save(self, task_id: str, stage: str, payload: Dict[str, Any]):
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if stage == "FINAL":
+                # Closed: only the outcome is needed from here on
+                conn.execute("DELETE FROM checkpoints WHERE task_id = ?", (task_id,))
+                conn.execute("DELETE FROM open_tasks WHERE task_id = ?", (task_id,))
+            elif not conn.execute("SELECT 1 FROM checkpoints WHERE task_id = ? AND stage = 'FINAL'", (task_id,)).fetchone():
+                conn.execute("""
+                    INSERT INTO open_tasks (task_id, started_at, saved_at) VALUES (?, ?, ?)
+                    ON CONFLICT(task_id) DO UPDATE SET saved_at = excluded.saved_at
+                """, (task_id, now, now))
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (task_id, stage, payload, saved_at) VALUES (?, ?, ?, ?)",
+                (task_id, stage, json.dumps(payload, separators=(",", ":"), default=str), now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def load(self, task_id: str) -> Dict[str, Dict[str, Any]]:
+        """stage -> payload for every completed stage of task_id ({} if unknown; just FINAL once closed)."""
+        rows = self._conn().execute(
+            "SELECT stage, payload FROM checkpoints WHERE task_id = ? ORDER BY saved_at", (task_id,)
+        ).fetchall()
+        return {stage: json.loads(payload) for stage, payload in rows}
+
+    def unfinished(self, idle_for: float = 0.0) -> List[str]:
+        """Task ids without a FINAL checkpoint whose last stage completed at least idle_for seconds ago."""
+        rows = self._conn().execute(
+            "SELECT task_id FROM open_tasks WHERE saved_at <= ? ORDER BY started_at", (time.time() - idle_for,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def prune(self, older_than: float) -> int:
+        """Drops FINAL markers saved more than older_than seconds ago; returns how many."""
+        cursor = self._conn().execute(
+            "DELETE FROM checkpoints WHERE stage = 'FINAL' AND saved_at < ?", (time.time() - older_than,)
+        )
+        return cursor.rowcount
+
+    def discard(self, task_id: str):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM checkpoints WHERE task_id = ?", (task_id,))
+            conn.execute("DELETE FROM open_tasks WHERE task_id = ?", (task_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
@@ -0,0 +1,94 @@
+import os
+import threading
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+from src.models.schemas import AgentStats
+from src.utils.ledger import Ledger, apply_op
+from src.utils.reputation_db import ReputationDB
+
+PAGE_SIZE = 20
+
+def _file_version(*paths: str) -> tuple:
+    # SQLite in WAL mode commits by appending to the -wal file and checkpoints
+    # into the main file, so between them size and mtime change on every write
+    version = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            version.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            version.append(None)
+    return tuple(version)
+
+def page_count(total: int, size: int = PAGE_SIZE) -> int:
+    return max(1, -(-total // size))
+
+class DashboardData:
+    """
+    Read model behind the Streamlit dashboard, meant to live across reruns
+    (st.cache_resource). refresh() applies only the ledger ops committed since
+    the last call, so locked funds and settlement history are never reread in
+    full; reputation pages are served from a cache that is dropped when the
+    database files change. Pages are newest first for the ledger and best first
+    for the leaderboard. Safe to share between sessions.
+    """
+    def __init__(self, ledger: Optional[Ledger] = None, rep_db: Optional[ReputationDB] = None):
+        self.ledger = ledger or Ledger()
+        self.rep_db = rep_db or ReputationDB()
+        self.locked_funds: Dict[str, dict] = {}
+        self.history: List[dict] = []        # settled entries, oldest first
+        self.cursor = 0
+        self._lock = threading.Lock()
+        self._rep_version = None
+        self._rep_pages: Dict[Tuple[int, int], List[AgentStats]] = {}
+        self._rep_count: Optional[int] = None
+
+    def refresh(self) -> int:
+        """Applies new ledger ops and returns how many there were."""
+        with self._lock:
+            try:
+                ops, self.cursor = self.ledger.ops_since(self.cursor)
+            except NotImplementedError:
+                # Storage without a change feed (legacy JSON file): full reread
+                self.locked_funds = self.ledger.locked()
+                self.history = list(self.ledger.history())
+                return len(self.history)
+            for op in ops:
+                if op["op"] == "reset":
+                    self.locked_funds, self.history = {}, []
+                    continue
+                apply_op(self.locked_funds, op)
+                if op["op"] in ("release", "refund"):
+                    self.history.append(op["entry"])
+            return len(ops)
+
+    def locked_page(self, page: int = 0, size: int = PAGE_SIZE) -> List[Tuple[str, dict]]:
+        with self._lock:
+            return list(islice(reversed(self.locked_funds.items()), page * size, (page + 1) * size))
+
+    def history_page(self, page: int = 0, size: int = PAGE_SIZE) -> List[dict]:
+        with self._lock:
+            end = max(len(self.history) - page * size, 0)
+            return self.history[max(end - size, 0):end][::-1]
+
+    def _check_reputation(self):
+        version = _file_version(self.rep_db.path, f"{self.rep_db.path}-wal")
+        if version != self._rep_version:
+            self._rep_version = version
+            self._rep_pages.clear()
+            self._rep_count = None
+
+    def leaderboard_page(self, page: int = 0, size: int = PAGE_SIZE) -> List[AgentStats]:
+        with self._lock:
+            self._check_reputation()
+            key = (page, size)
+            if key not in self._rep_pages:
+                self._rep_pages[key] = self.rep_db.leaderboard(limit=size, offset=page * size)
+            return self._rep_pages[key]
+
+    def agent_count(self) -> int:
+        with self._lock:
+            self._check_reputation()
+            if self._rep_count is None:
+                self._rep_count = self.rep_db.count()
+            return self._rep_count
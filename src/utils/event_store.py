@@ -0,0 +1,488 @@
+import atexit
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from src.models.schemas import AgentStats
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+EVENT_STORE_DIR = "event_store"
+LOCK_FILE = "LOCK"
+
+_SEGMENT = re.compile(r"^segment-(\d+)\.jsonl$")
+_SNAPSHOT = re.compile(r"^snapshot-(\d+)\.json$")
+
+# Streamed executor chunks are repeated in full by the closing EXECUTOR event
+SKIPPED_STATUSES = {"partial"}
+
+class LedgerView:
+    """Open escrows and settlement totals, rebuilt from ESCROW events."""
+    name = "ledger"
+
+    def __init__(self):
+        self.locked_funds: Dict[str, dict] = {}
+        self.totals = {"locked": 0.0, "released": 0.0, "refunded": 0.0}
+
+    def apply(self, record: dict):
+        if record.get("step") != "ESCROW" or not record.get("data"):
+            return
+        data, status = record["data"], record.get("status")
+        if status == "done":
+            self.locked_funds[data["contract_id"]] = {"amount": data["amount"], "task_id": data["task_id"], "status": "LOCKED"}
+            self.totals["locked"] += data["amount"]
+        elif status in ("release", "refund"):
+            # Same as Ledger: settling a contract that is not locked is a no-op
+            entry = self.locked_funds.pop(data["contract_id"], None)
+            if entry is not None:
+                self.totals["released" if status == "release" else "refunded"] += entry["amount"]
+
+    def state(self) -> dict:
+        return {"locked_funds": self.locked_funds, "totals": self.totals}
+
+    def restore(self, state: dict):
+        self.locked_funds = state["locked_funds"]
+        self.totals = state["totals"]
+
+    def rebuild(self, ledger) -> List[str]:
+        """
+        Locks every open escrow the event log knows about but ledger is missing.
+        Returns the contracts ledger has locked that the log considers settled or
+        never saw, for an operator to look at; they are left untouched.
+        """
+        locked = ledger.locked()
+        for contract_id, entry in self.locked_funds.items():
+            if contract_id not in locked:
+                ledger.lock_funds(contract_id, entry["amount"], entry["task_id"])
+        ledger.flush()
+        return [contract_id for contract_id in locked if contract_id not in self.locked_funds]
+
+class ReputationView:
+    """Per-agent counters (the ones ReputationDB keeps), rebuilt from REPUTATION events."""
+    name = "reputation"
+
+    def __init__(self):
+        # agent_id -> [tasks_completed, successes, score_sum]
+        self.counters: Dict[str, List[float]] = {}
+
+    def apply(self, record: dict):
+        if record.get("step") != "REPUTATION" or not record.get("data"):
+            return
+        data = record["data"]
+        c = self.counters.setdefault(data["agent_id"], [0, 0, 0.0])
+        c[0] += 1
+        c[1] += int(data["success"])
+        c[2] += data["score"]
+
+    def stats(self, agent_id: str) -> AgentStats:
+        c = self.counters.get(agent_id)
+        if not c:
+            return AgentStats(agent_id=agent_id)
+        return AgentStats(agent_id=agent_id, tasks_completed=c[0], success_rate=c[1] / c[0], avg_score=c[2] / c[0])
+
+    def state(self) -> dict:
+        return {"counters": self.counters}
+
+    def restore(self, state: dict):
+        self.counters = state["counters"]
+
+    def rebuild(self, db):
+        """Overwrites db's counters for every agent seen in the log."""
+        db.load_counters((agent_id, c[0], c[1], c[2]) for agent_id, c in self.counters.items())
+
+TRANSACTIONS_DB = "transactions.sqlite3"
+
+# Summary fields set by particular events; absent from a summary until they are
+_OPTIONAL_FIELDS = ("worker", "price", "contract_id", "score")
+_SUMMARY_COLUMNS = "tx, task_id, first_seq, last_seq, step, outcome, " + ", ".join(_OPTIONAL_FIELDS)
+
+class TransactionView:
+    """
+    One summary row per transaction, for audit queries without a log scan. Rows
+    live in an indexed SQLite table next to the segments rather than in memory
+    and snapshots; the table records the last sequence number it covers, so
+    replay after a crash (or a deleted database) only fills in what is missing.
+    """
+    name = "transactions"
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self._local = threading.local()
+        self.seq = 0                   # last sequence number in the table
+        conn = self._conn()
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS transactions (
+                tx TEXT PRIMARY KEY,
+                task_id TEXT,
+                first_seq INTEGER NOT NULL,
+                last_seq INTEGER NOT NULL,
+                step TEXT,
+                outcome TEXT,
+                worker TEXT,
+                price REAL,
+                contract_id TEXT,
+                score REAL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS transactions_task ON transactions (task_id, first_seq)")
+        conn.execute("CREATE INDEX IF NOT EXISTS transactions_outcome ON transactions (outcome, worker)")
+        conn.execute("CREATE INDEX IF NOT EXISTS transactions_worker ON transactions (worker)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _stored_seq(self) -> int:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'seq'").fetchone()
+        return row[0] if row else 0
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """One write transaction around a run of apply() calls; the caller holds the store lock."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have indexed records since our last batch
+            self.seq = self._stored_seq()
+            yield
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('seq', ?)", (self.seq,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def apply(self, record: dict):
+        if record["seq"] <= self.seq:
+            return
+        self.seq = record["seq"]
+        conn = self._conn()
+        tx = record["tx"]
+        summary = self._get(conn, tx)
+        if summary is None:
+            summary = {"tx": tx, "task_id": None, "first_seq": record["seq"], "outcome": None}
+        summary["last_seq"] = record["seq"]
+        summary["step"] = record["step"]
+        if record.get("task_id") and not summary["task_id"]:
+            summary["task_id"] = record["task_id"]
+
+        data = record.get("data") or {}
+        if record["step"] == "NEGOTIATOR" and record.get("status") == "done":
+            summary["worker"], summary["price"] = data.get("agent_id"), data.get("price")
+        elif record["step"] == "CONTRACT" and record.get("status") == "done":
+            summary["contract_id"] = data.get("contract_id")
+        elif record["step"] == "VALIDATOR" and record.get("status") == "done":
+            summary["score"] = data.get("score")
+        elif record["step"] == "FINAL":
+            summary["outcome"] = record.get("status")
+        elif record["step"] == "ERROR":
+            summary["outcome"] = "error"
+
+        conn.execute(
+            f"INSERT OR REPLACE INTO transactions ({_SUMMARY_COLUMNS}) VALUES ({', '.join('?' * 10)})",
+            tuple(summary.get(k) for k in ("tx", "task_id", "first_seq", "last_seq", "step", "outcome") + _OPTIONAL_FIELDS),
+        )
+
+    @staticmethod
+    def _summary(row: tuple) -> dict:
+        summary = dict(zip(("tx", "task_id", "first_seq", "last_seq", "step", "outcome"), row[:6]))
+        summary.update((k, v) for k, v in zip(_OPTIONAL_FIELDS, row[6:]) if v is not None)
+        return summary
+
+    def _get(self, conn: sqlite3.Connection, tx: str) -> Optional[dict]:
+        row = conn.execute(f"SELECT {_SUMMARY_COLUMNS} FROM transactions WHERE tx = ?", (tx,)).fetchone()
+        return self._summary(row) if row else None
+
+    def get(self, tx: Optional[str]) -> Optional[dict]:
+        return self._get(self._conn(), tx) if tx else None
+
+    def by_task(self, task_id: str) -> Optional[dict]:
+        """The latest transaction for task_id."""
+        row = self._conn().execute(
+            f"SELECT {_SUMMARY_COLUMNS} FROM transactions WHERE task_id = ? ORDER BY first_seq DESC LIMIT 1", (task_id,)
+        ).fetchone()
+        return self._summary(row) if row else None
+
+    def query(self, outcome: Optional[str] = None, worker: Optional[str] = None,
+              limit: Optional[int] = None) -> List[dict]:
+        where, params = [], []
+        if outcome is not None:
+            where.append("outcome = ?")
+            params.append(outcome)
+        if worker is not None:
+            where.append("worker = ?")
+            params.append(worker)
+        sql = f"SELECT {_SUMMARY_COLUMNS} FROM transactions"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY first_seq"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [self._summary(row) for row in self._conn().execute(sql, params)]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+class EventStore:
+    """
+    Durable, append-only log of every run_stream event, stored as JSONL segments of
+    at most segment_bytes each. Records carry a global sequence number and the
+    transaction (root span trace id) they belong to. fsync is batched like the
+    ledger WAL.
+
+    Materialized views (ledger, reputation) are updated on append and snapshotted
+    every snapshot_every records, so opening the store loads the newest snapshot and
+    only replays the segments written after it. Transaction summaries grow with
+    every run, so they go to an indexed SQLite table instead (see TransactionView).
+    """
+    def __init__(self, directory: str = EVENT_STORE_DIR, segment_bytes: int = 16 * 1024 * 1024,
+                 snapshot_every: int = 10000, keep_snapshots: int = 2,
+                 fsync_every: int = 64, fsync_interval: float = 1.0):
+        self.directory = os.path.abspath(directory)
+        self.segment_bytes = segment_bytes
+        self.snapshot_every = snapshot_every
+        self.keep_snapshots = keep_snapshots
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.ledger = LedgerView()
+        self.reputation = ReputationView()
+        self.transactions = TransactionView(os.path.join(self.directory, TRANSACTIONS_DB))
+        # Snapshotted views; the transaction table persists itself
+        self.views = [self.ledger, self.reputation]
+
+        self.seq = 0                   # last sequence number applied to the views
+        self._segment: Optional[str] = None  # path of the segment being appended to
+        self._offset = 0               # bytes of complete records in that segment
+        self._file = None
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+        self._since_snapshot = 0
+        self._lock = threading.RLock()
+        self._lock_file = open(os.path.join(self.directory, LOCK_FILE), "a")
+        atexit.register(self.flush)
+        self._load()
+
+    # --- files ---
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        found = [(int(m.group(1)), name) for name in os.listdir(self.directory) for m in [_SEGMENT.match(name)] if m]
+        return [(first, os.path.join(self.directory, name)) for first, name in sorted(found)]
+
+    def _snapshots(self) -> List[Tuple[int, str]]:
+        found = [(int(m.group(1)), name) for name in os.listdir(self.directory) for m in [_SNAPSHOT.match(name)] if m]
+        return [(seq, os.path.join(self.directory, name)) for seq, name in sorted(found)]
+
+    @contextmanager
+    def _exclusive(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    # --- recovery ---
+
+    def _load(self):
+        for seq, path in reversed(self._snapshots()):
+            try:
+                with open(path, "r") as f:
+                    snapshot = json.load(f)
+            except ValueError:
+                continue  # torn snapshot; fall back to an older one
+            for view in self.views:
+                if view.name in snapshot["views"]:
+                    view.restore(snapshot["views"][view.name])
+            self.seq = snapshot["seq"]
+            break
+
+        with self._exclusive(), self.transactions.batch():
+            self._since_snapshot = self._replay()
+            self._drop_torn_tail()
+
+    def _scan(self, from_seq: int) -> Iterator[Tuple[dict, str, int]]:
+        """(record, segment, end offset) for every complete record with seq >= from_seq."""
+        segments = self._segments()
+        for i, (first, path) in enumerate(segments):
+            # Skip segments that end before from_seq
+            if i + 1 < len(segments) and segments[i + 1][0] <= from_seq:
+                continue
+            offset = 0
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # partial record still being written (or torn by a crash)
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    offset += len(line)
+                    if record["seq"] >= from_seq:
+                        yield record, path, offset
+
+    def _replay(self) -> int:
+        """Applies records past self.seq and returns how many were applied."""
+        count = 0
+        # The transaction table may be behind the snapshot (e.g. deleted); it skips what it has
+        for record, path, offset in self._scan(min(self.seq, self.transactions.seq) + 1):
+            count += self._apply(record)
+            self._segment, self._offset = path, offset
+        if self._segment is None:
+            segments = self._segments()
+            if segments:
+                # Every record is covered by the snapshot; find where the last segment ends
+                self._segment, self._offset = segments[-1][1], 0
+                for _, path, offset in self._scan(self.seq):
+                    self._segment, self._offset = path, offset
+        return count
+
+    def _catch_up(self):
+        # Another process may have appended (or rotated) since our last write
+        segments = self._segments()
+        if not segments:
+            return
+        if segments[-1][1] != self._segment or os.path.getsize(self._segment) != self._offset:
+            self._since_snapshot += self._replay()
+
+    def _drop_torn_tail(self):
+        # Crash recovery: a writer died mid-append. Only called under _exclusive().
+        if self._segment and os.path.exists(self._segment) and os.path.getsize(self._segment) > self._offset:
+            with open(self._segment, "r+b") as f:
+                f.truncate(self._offset)
+
+    def _apply(self, record: dict) -> bool:
+        """Applies record to the views that have not seen it; True if it was new to the snapshotted ones."""
+        self.transactions.apply(record)
+        if record["seq"] <= self.seq:
+            return False
+        for view in self.views:
+            view.apply(record)
+        self.seq = record["seq"]
+        return True
+
+    # --- writing ---
+
+    def _open(self):
+        if self._segment is None or self._offset >= self.segment_bytes:
+            self.flush()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._segment = os.path.join(self.directory, f"segment-{self.seq + 1:016d}.jsonl")
+            self._offset = 0
+        if self._file is None or self._file.name != self._segment:
+            if self._file is not None:
+                self._file.close()
+            self._file = open(self._segment, "ab")
+        return self._file
+
+    def append(self, tx: str, event: Dict[str, Any], task_id: Optional[str] = None) -> Optional[dict]:
+        """Appends one run_stream event; returns the stored record (None if skipped)."""
+        if event.get("status") in SKIPPED_STATUSES:
+            return None
+        with self._exclusive(), self.transactions.batch():
+            self._catch_up()
+            self._drop_torn_tail()
+            record = {"seq": self.seq + 1, "ts": round(time.time(), 3), "tx": tx, "task_id": task_id}
+            # Stage metrics already go to the span exporters
+            record.update((k, event[k]) for k in ("step", "status", "message", "data") if k in event)
+            line = json.dumps(record, separators=(",", ":"), default=str).encode() + b"\n"
+
+            f = self._open()
+            f.write(line)
+            f.flush()
+            self._offset += len(line)
+            self._apply(record)
+            self._unsynced += 1
+            self._since_snapshot += 1
+
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_fsync >= self.fsync_interval:
+                self.flush()
+            if self._since_snapshot >= self.snapshot_every:
+                self.snapshot()
+            return record
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None and self._unsynced:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._last_fsync = time.monotonic()
+
+    def snapshot(self):
+        """Writes every view's state at the current sequence number and prunes old snapshots."""
+        with self._lock:
+            self.flush()
+            path = os.path.join(self.directory, f"snapshot-{self.seq:016d}.json")
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"seq": self.seq, "views": {view.name: view.state() for view in self.views}}, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            self._since_snapshot = 0
+            for _, old in self._snapshots()[:-self.keep_snapshots]:
+                os.remove(old)
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self.transactions.close()
+
+    # --- audit queries ---
+
+    def read(self, from_seq: int = 1, to_seq: Optional[int] = None) -> Iterator[dict]:
+        """Records in sequence order, skipping segments outside the range."""
+        self.flush()
+        for record, _, _ in self._scan(from_seq):
+            if to_seq is not None and record["seq"] > to_seq:
+                return
+            yield record
+
+    def events(self, task_id: Optional[str] = None, tx: Optional[str] = None) -> List[dict]:
+        """Every stored event of one transaction, looked up by task id or trace id."""
+        summary = self.transactions.get(tx) if tx else self.transaction(task_id)
+        if summary is None:
+            return []
+        return [r for r in self.read(summary["first_seq"], summary["last_seq"]) if r["tx"] == summary["tx"]]
+
+    def transaction(self, task_id: str) -> Optional[dict]:
+        return self.transactions.by_task(task_id)
+
+    def query(self, outcome: Optional[str] = None, worker: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
+        """Transaction summaries, oldest first, filtered by outcome ("success", "failed" or "error") and/or winning worker."""
+        return self.transactions.query(outcome, worker, limit)
+
+    # --- materialized views ---
+
+    def rebuild_ledger(self, ledger) -> List[str]:
+        return self.ledger.rebuild(ledger)
+
+    def rebuild_reputation(self, db):
+        self.reputation.rebuild(db)
@@ -1,49 +1,605 @@
+import atexit
+import io
 import json
 import os
-from typing import Dict
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
 
 LEDGER_FILE = "escrow_ledger.json"
+LEDGER_WAL_FILE = "escrow_ledger.wal"
+LEDGER_SNAPSHOT_FILE = "escrow_ledger.snapshot.json"
+LEDGER_DB_FILE = "escrow_ledger.sqlite3"
 
-class Ledger:
+def apply_op(locked_funds: Dict[str, dict], op: dict):
+    # Ops are self-describing: "lock" carries the new entry, "release"/"refund" the settled one.
+    # Other records (WAL segment headers, ops_since resets) carry no ledger state
+    if op["op"] == "lock":
+        locked_funds[op["contract_id"]] = op["entry"]
+    elif op["op"] in ("release", "refund"):
+        locked_funds.pop(op["contract_id"], None)
+
+class LedgerStorage:
+    """
+    Storage engine behind Ledger. Owns the locked_funds state and persists the
+    lock/release/refund ops applied to it.
+    """
     def __init__(self):
+        self.locked_funds: Dict[str, dict] = {}
+
+    def load(self):
+        raise NotImplementedError
+
+    def sync(self):
+        """Applies ops appended by other writers since the last load/sync."""
+
+    def append(self, ops: List[dict]):
+        raise NotImplementedError
+
+    def history(self) -> Iterator[dict]:
+        raise NotImplementedError
+
+    def ops_since(self, cursor: int = 0) -> Tuple[List[dict], int]:
+        """
+        Committed ops after cursor (0: from the start) and the cursor to pass next
+        time. Lets readers such as the dashboard follow the ledger without taking
+        the write lock or rereading it. A {"op": "reset"} op means the reader fell
+        behind a WAL rotation: drop the state built so far, the ops that follow
+        rebuild it.
+        """
+        raise NotImplementedError
+
+    @contextmanager
+    def exclusive(self):
+        """Cross-process write lock held around sync + append."""
+        yield
+
+    def flush(self):
+        pass
+
+class JsonFileLedgerStorage(LedgerStorage):
+    """Legacy engine: the whole ledger is rewritten to one JSON file on every op."""
+    def __init__(self, path: str = LEDGER_FILE):
+        super().__init__()
+        self.path = path
+        self.data = {"locked_funds": self.locked_funds, "history": []}
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self.locked_funds.clear()
+            self.locked_funds.update(data.get("locked_funds", {}))
+            self.data["history"] = data.get("history", [])
+
+    def sync(self):
+        self.load()
+
+    def append(self, ops: List[dict]):
+        for op in ops:
+            apply_op(self.locked_funds, op)
+            if op["op"] != "lock":
+                self.data["history"].append(op["entry"])
+        with open(self.path, "w") as f:
+            json.dump(self.data, f, indent=2)
+
+    def history(self) -> Iterator[dict]:
+        return iter(self.data["history"])
+
+def _encode(op: dict) -> bytes:
+    return json.dumps(op, separators=(",", ":")).encode() + b"\n"
+
+def _segment_header(generation: int, base: int, history_offset: int) -> dict:
+    return {"op": "segment", "generation": generation, "base": base, "history_offset": history_offset}
+
+def _read_ops(f) -> Iterator[Tuple[dict, int]]:
+    """(op, record length) for each complete record from the file position on."""
+    for line in f:
+        if not line.endswith(b"\n"):
+            break  # partial record still being written (or torn by a crash)
+        try:
+            op = json.loads(line)
+        except ValueError:
+            break
+        yield op, len(line)
+
+class WalLedgerStorage(LedgerStorage):
+    """
+    Append-only JSONL write-ahead log. Each op is one line; fsync is batched every
+    fsync_every ops or fsync_interval seconds. Every compact_every ops the WAL is
+    rotated: the segment's settlements are appended to the history archive, the
+    locked funds are snapshotted and a fresh segment replaces the WAL. Recovery
+    loads the snapshot and replays the current segment, so neither restart time
+    nor WAL size grows with history. The previous segment is kept next to the WAL
+    (".prev"), so ops_since readers less than a segment behind read on from it.
+
+    Each segment starts with a header line holding its generation, its position
+    in the op stream across all segments (the ops_since cursor) and the archive
+    size when it began; legacy WALs without a header are generation 0.
+    """
+    def __init__(self, wal_path: str = LEDGER_WAL_FILE, snapshot_path: str = LEDGER_SNAPSHOT_FILE,
+                 fsync_every: int = 64, fsync_interval: float = 1.0, compact_every: int = 1000,
+                 legacy_path: Optional[str] = LEDGER_FILE, history_path: Optional[str] = None):
+        super().__init__()
+        self.wal_path = os.path.abspath(wal_path)
+        self.snapshot_path = os.path.abspath(snapshot_path)
+        # escrow_ledger.wal -> escrow_ledger.history.jsonl
+        self.history_path = os.path.abspath(history_path or f"{os.path.splitext(wal_path)[0]}.history.jsonl")
+        # flock target; the WAL itself is replaced on rotation
+        self.lock_path = f"{self.wal_path}.lock"
+        self.prev_path = f"{self.wal_path}.prev"
+        self.legacy_path = legacy_path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+
+        self.segment = _segment_header(0, 0, 0)
+        self.offset = 0           # byte offset into the current segment reflected in locked_funds
+        self._unsynced = 0        # ops written but not yet fsynced
+        self._last_fsync = time.monotonic()
+        self._since_snapshot = 0
+        self._wal = None
+        self._lock_file = None
+        self._lock_depth = 0
+        atexit.register(self.flush)
+
+    def _open(self):
+        if self._wal is None:
+            self._wal = open(self.wal_path, "ab")
+        return self._wal
+
+    def _close_wal(self):
+        if self._wal is not None:
+            self.flush()
+            self._wal.close()
+            self._wal = None
+
+    def _current_header(self) -> Optional[dict]:
+        if not os.path.exists(self.wal_path):
+            return None
+        with open(self.wal_path, "rb") as f:
+            return self._read_header(f)
+
+    @staticmethod
+    def _read_header(f) -> dict:
+        line = f.readline()
+        if line.endswith(b"\n") and line.startswith(b'{"op":"segment"'):
+            return json.loads(line)
+        return _segment_header(0, 0, 0)
+
+    def _read_snapshot(self) -> Optional[dict]:
+        if not os.path.exists(self.snapshot_path):
+            return None
+        with open(self.snapshot_path, "r") as f:
+            return json.load(f)
+
+    def load(self):
+        self.locked_funds.clear()
+        self.segment = _segment_header(0, 0, 0)
+        self.offset = 0
+        self._since_snapshot = 0
+        if not os.path.exists(self.wal_path) and not os.path.exists(self.snapshot_path):
+            self._import_legacy()
+            return
+        with self.exclusive():
+            self._load_locked()
+
+    def _load_locked(self):
+        self.locked_funds.clear()
+        self._close_wal()
+        snapshot = self._read_snapshot()
+        header = self._current_header()
+        if snapshot is not None and (header is None or header["generation"] < snapshot.get("generation", 0)):
+            # A rotation stopped after its snapshot, before the new segment replaced
+            # the WAL: the snapshot covers every op, so start its segment now
+            header = _segment_header(snapshot.get("generation", 0), snapshot.get("base", 0), snapshot.get("history_offset", 0))
+            self._start_segment(header)
+            snapshot = dict(snapshot, wal_offset=len(_encode(header)))
+        self.segment = header or _segment_header(0, 0, 0)
+        self.offset = 0
+        if snapshot is not None:
+            self.locked_funds.update(snapshot["locked_funds"])
+            self.offset = snapshot["wal_offset"]
+        self._since_snapshot = self._replay()
+        self._drop_torn_tail()
+
+    def _drop_torn_tail(self):
+        # Crash recovery: a writer died mid-append. Only called under exclusive(),
+        # where no other writer can be in the middle of a record.
+        if os.path.exists(self.wal_path) and os.path.getsize(self.wal_path) > self.offset:
+            with open(self.wal_path, "r+b") as f:
+                f.truncate(self.offset)
+
+    def _replay(self) -> int:
+        """Applies complete WAL records past self.offset and returns how many were applied."""
+        if not os.path.exists(self.wal_path):
+            return 0
+        count = 0
+        with open(self.wal_path, "rb") as f:
+            f.seek(self.offset)
+            for op, size in _read_ops(f):
+                apply_op(self.locked_funds, op)
+                self.offset += size
+                count += 1
+        return count
+
+    def _import_legacy(self):
+        # One-off migration of an escrow_ledger.json written by JsonFileLedgerStorage
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        legacy = JsonFileLedgerStorage(self.legacy_path)
+        legacy.load()
+        ops = []
+        for entry in legacy.data["history"]:
+            op = "release" if entry.get("status") == "RELEASED" else "refund"
+            ops.append({"op": op, "contract_id": None, "entry": entry})
+        for contract_id, entry in legacy.locked_funds.items():
+            ops.append({"op": "lock", "contract_id": contract_id, "entry": entry})
+        if ops:
+            with self.exclusive():
+                self.append(ops)
+            self.flush()
+
+    def sync(self):
+        header = self._current_header()
+        if header is not None and header["generation"] != self.segment["generation"]:
+            # Another writer rotated the WAL; start over from its snapshot
+            self._load_locked()
+        else:
+            self._since_snapshot += self._replay()
+
+    def append(self, ops: List[dict]):
+        self._drop_torn_tail()
+        payload = b"".join(_encode(op) for op in ops)
+        wal = self._open()
+        wal.write(payload)
+        wal.flush()
+        for op in ops:
+            apply_op(self.locked_funds, op)
+        self.offset += len(payload)
+        self._unsynced += len(ops)
+        self._since_snapshot += len(ops)
+
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_fsync >= self.fsync_interval:
+            self.flush()
+        if self._since_snapshot >= self.compact_every:
+            self.compact()
+
+    def flush(self):
+        if self._wal is not None and self._unsynced:
+            os.fsync(self._wal.fileno())
+        self._unsynced = 0
+        self._last_fsync = time.monotonic()
+
+    def _start_segment(self, header: dict):
+        tmp_path = f"{self.wal_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_encode(header))
+            f.flush()
+            os.fsync(f.fileno())
+        self._close_wal()
+        if os.path.exists(self.wal_path):
+            # A second name for the outgoing segment; the WAL path itself is swapped atomically
+            if os.path.exists(self.prev_path):
+                os.unlink(self.prev_path)
+            os.link(self.wal_path, self.prev_path)
+        os.replace(tmp_path, self.wal_path)
+
+    def compact(self):
+        """
+        Rotates the WAL: archives the current segment's settlements, snapshots the
+        locked funds and replaces the WAL with an empty segment. Each step is safe
+        to crash after; load() finishes a rotation whose snapshot was written.
+        """
+        with self.exclusive():
+            self.sync()
+            self.flush()
+            settled = b""
+            if os.path.exists(self.wal_path):
+                with open(self.wal_path, "rb") as f:
+                    settled = b"".join(_encode(op) for op, _ in _read_ops(f) if op["op"] in ("release", "refund"))
+            with open(self.history_path, "ab") as f:
+                # Drops what an earlier, interrupted rotation of this segment archived
+                f.truncate(self.segment["history_offset"])
+                f.write(settled)
+                f.flush()
+                os.fsync(f.fileno())
+                history_offset = f.tell()
+
+            header = _segment_header(self.segment["generation"] + 1, self.segment["base"] + self.offset, history_offset)
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({
+                    "locked_funds": self.locked_funds, "wal_offset": len(_encode(header)), "generation": header["generation"],
+                    "base": header["base"], "history_offset": history_offset,
+                }, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+
+            self._start_segment(header)
+            self.segment = header
+            self.offset = len(_encode(header))
+            self._since_snapshot = 0
+
+    def _archived(self, history_offset: int) -> Iterator[dict]:
+        if not os.path.exists(self.history_path):
+            return
+        with open(self.history_path, "rb") as f:
+            # Past history_offset are records of a rotation still in progress
+            for op, _ in _read_ops(io.BytesIO(f.read(history_offset))):
+                yield op
+
+    def history(self) -> Iterator[dict]:
+        if not os.path.exists(self.wal_path):
+            return
+        # The open handle keeps reading this segment even if it is rotated meanwhile
+        with open(self.wal_path, "rb") as f:
+            header = self._read_header(f)
+            f.seek(0)
+            for op in self._archived(header["history_offset"]):
+                yield op["entry"]
+            for op, _ in _read_ops(f):
+                if op["op"] in ("release", "refund"):
+                    yield op["entry"]
+
+    def ops_since(self, cursor: int = 0) -> Tuple[List[dict], int]:
+        # cursor is a position in the op stream across segments, so only the new tail is read
+        if not os.path.exists(self.wal_path):
+            return [], cursor
+        with open(self.wal_path, "rb") as f:
+            header = self._read_header(f)
+            if cursor >= header["base"]:
+                f.seek(cursor - header["base"])
+                return self._segment_ops(f, cursor)
+            prev = self._prev_ops(header, cursor)
+            if prev is not None:
+                # f is past this segment's header
+                tail, cursor = self._segment_ops(f, header["base"] + f.tell())
+                return prev + tail, cursor
+
+            # The ops after cursor were rotated out. Readers start over from a reset:
+            # the archived settlements, then the snapshot's locks, then the segment
+            snapshot = self._read_snapshot() or {}
+            ops = [{"op": "reset"}]
+            if snapshot.get("generation", 0) > header["generation"]:
+                # Rotated again since the header was read; the snapshot alone is current
+                ops += self._archived(snapshot["history_offset"])
+                ops += [{"op": "lock", "contract_id": c, "entry": e} for c, e in snapshot["locked_funds"].items()]
+                return ops, snapshot["base"] + snapshot["wal_offset"]
+            ops += self._archived(header["history_offset"])
+            ops += [{"op": "lock", "contract_id": c, "entry": e} for c, e in snapshot.get("locked_funds", {}).items()]
+            f.seek(snapshot.get("wal_offset", 0))
+            tail, cursor = self._segment_ops(f, header["base"] + f.tell())
+            return ops + tail, cursor
+
+    def _prev_ops(self, header: dict, cursor: int) -> Optional[List[dict]]:
+        """Rest of the previous segment from cursor, or None if cursor is not in it."""
+        try:
+            f = open(self.prev_path, "rb")
+        except FileNotFoundError:
+            return None
+        with f:
+            prev = self._read_header(f)
+            if prev["generation"] != header["generation"] - 1 or cursor < prev["base"]:
+                return None
+            f.seek(cursor - prev["base"])
+            return self._segment_ops(f, cursor)[0]
+
+    @staticmethod
+    def _segment_ops(f, cursor: int) -> Tuple[List[dict], int]:
+        ops = []
+        for op, size in _read_ops(f):
+            if op["op"] != "segment":
+                ops.append(op)
+            cursor += size
+        return ops, cursor
+
+    @contextmanager
+    def exclusive(self):
+        # Re-entrant, so compact() works on its own as well as from append()
+        if self._lock_depth or fcntl is None:
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+            return
+        if self._lock_file is None:
+            self._lock_file = open(self.lock_path, "ab")
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        self._lock_depth = 1
+        try:
+            yield
+        finally:
+            self._lock_depth = 0
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+class SqliteLedgerStorage(LedgerStorage):
+    """
+    Ledger ops in one SQLite database (WAL mode) shared by every process on the
+    host. exclusive() is a BEGIN IMMEDIATE transaction, so sync + append from
+    different processes serialize on SQLite's write lock. open_locks mirrors
+    locked_funds, so load() does not replay history, and sync() only applies ops
+    newer than the last one seen.
+    """
+    def __init__(self, path: str = LEDGER_DB_FILE):
+        super().__init__()
+        # Absolute, so connections opened later from other threads hit the same file
+        self.path = os.path.abspath(path)
+        self.last_id = 0
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS ledger_ops (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                op TEXT NOT NULL,
+                contract_id TEXT,
+                entry TEXT NOT NULL
+            )
+        """)
+        conn.execute("CREATE TABLE IF NOT EXISTS open_locks (contract_id TEXT PRIMARY KEY, entry TEXT NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self):
+        conn = self._conn()
+        self.locked_funds.clear()
+        # One read transaction, so the open locks and last_id agree
+        conn.execute("BEGIN")
+        try:
+            for contract_id, entry in conn.execute("SELECT contract_id, entry FROM open_locks"):
+                self.locked_funds[contract_id] = json.loads(entry)
+            self.last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM ledger_ops").fetchone()[0]
+        finally:
+            conn.execute("COMMIT")
+
+    def sync(self):
+        rows = self._conn().execute(
+            "SELECT id, op, contract_id, entry FROM ledger_ops WHERE id > ? ORDER BY id", (self.last_id,)
+        ).fetchall()
+        for op_id, op, contract_id, entry in rows:
+            apply_op(self.locked_funds, {"op": op, "contract_id": contract_id, "entry": json.loads(entry)})
+            self.last_id = op_id
+
+    def append(self, ops: List[dict]):
+        conn = self._conn()
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        try:
+            for op in ops:
+                entry = json.dumps(op["entry"], separators=(",", ":"))
+                cursor = conn.execute("INSERT INTO ledger_ops (op, contract_id, entry) VALUES (?, ?, ?)",
+                                      (op["op"], op["contract_id"], entry))
+                if op["op"] == "lock":
+                    conn.execute("INSERT OR REPLACE INTO open_locks (contract_id, entry) VALUES (?, ?)", (op["contract_id"], entry))
+                else:
+                    conn.execute("DELETE FROM open_locks WHERE contract_id = ?", (op["contract_id"],))
+                apply_op(self.locked_funds, op)
+                self.last_id = cursor.lastrowid
+        except BaseException:
+            if own_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        if own_transaction:
+            conn.execute("COMMIT")
+
+    def history(self) -> Iterator[dict]:
+        for (entry,) in self._conn().execute("SELECT entry FROM ledger_ops WHERE op != 'lock' ORDER BY id"):
+            yield json.loads(entry)
+
+    def ops_since(self, cursor: int = 0) -> Tuple[List[dict], int]:
+        # cursor is the last op id seen
+        ops = []
+        for op_id, op, contract_id, entry in self._conn().execute(
+            "SELECT id, op, contract_id, entry FROM ledger_ops WHERE id > ? ORDER BY id", (cursor,)
+        ):
+            ops.append({"op": op, "contract_id": contract_id, "entry": json.loads(entry)})
+            cursor = op_id
+        return ops, cursor
+
+    @contextmanager
+    def exclusive(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            # Ops applied in memory were rolled back on disk; reread the committed state
+            self.load()
+            raise
+        conn.execute("COMMIT")
+
+class Ledger:
+    def __init__(self, storage: Optional[LedgerStorage] = None):
+        self.storage = storage or WalLedgerStorage()
+        self._lock = threading.RLock()
         self._load()
 
     def _load(self):
-        if os.path.exists(LEDGER_FILE):
-            with open(LEDGER_FILE, "r") as f:
-                self.data = json.load(f)
-        else:
-            self.data = {"locked_funds": {}, "history": []}
+        self.storage.load()
+        self.data = {"locked_funds": self.storage.locked_funds}
 
-    def _save(self):
-        with open(LEDGER_FILE, "w") as f:
-            json.dump(self.data, f, indent=2)
+    def history(self) -> Iterator[dict]:
+        return self.storage.history()
+
+    def ops_since(self, cursor: int = 0) -> Tuple[List[dict], int]:
+        return self.storage.ops_since(cursor)
+
+    def flush(self):
+        with self._lock:
+            self.storage.flush()
+
+    def locked(self) -> Dict[str, dict]:
+        """Up-to-date copy of the locked funds, including locks taken by other processes."""
+        with self._lock, self.storage.exclusive():
+            self.storage.sync()
+            return dict(self.data["locked_funds"])
 
     def lock_funds(self, contract_id: str, amount: float, task_id: str):
-        self.data["locked_funds"][contract_id] = {
-            "amount": amount,
-            "task_id": task_id,
-            "status": "LOCKED"
-        }
-        self._save()
+        with self._lock, self.storage.exclusive():
+            self.storage.sync()
+            self.storage.append([{
+                "op": "lock",
+                "contract_id": contract_id,
+                "entry": {"amount": amount, "task_id": task_id, "status": "LOCKED", "locked_at": time.time()},
+            }])
 
-    def release_funds(self, contract_id: str, recipient_id: str):
-        if contract_id in self.data["locked_funds"]:
-            entry = self.data["locked_funds"][contract_id]
-            entry["status"] = "RELEASED"
-            entry["recipient"] = recipient_id
-            self.data["history"].append(entry)
-            del self.data["locked_funds"][contract_id]
-            self._save()
+    def _settle(self, op: str, contract_id: str, **fields) -> bool:
+        with self._lock, self.storage.exclusive():
+            self.storage.sync()
+            if contract_id not in self.data["locked_funds"]:
+                return False
+            entry = dict(self.data["locked_funds"][contract_id], **fields)
+            self.storage.append([{"op": op, "contract_id": contract_id, "entry": entry}])
             return True
-        return False
+
+    def settle_many(self, outcomes: Iterable[Tuple[str, Optional[str]]]) -> List[bool]:
+        """
+        Settles (contract_id, recipient_id) pairs in one storage write: a recipient
+        releases the lock to it, None refunds it. Returns, per pair, whether the
+        contract was still locked.
+        """
+        with self._lock, self.storage.exclusive():
+            self.storage.sync()
+            locked = self.data["locked_funds"]
+            ops, settled, seen = [], [], set()
+            for contract_id, recipient_id in outcomes:
+                # A contract listed twice is only settled once
+                if contract_id not in locked or contract_id in seen:
+                    settled.append(False)
+                    continue
+                seen.add(contract_id)
+                if recipient_id is None:
+                    entry = dict(locked[contract_id], status="REFUNDED")
+                    ops.append({"op": "refund", "contract_id": contract_id, "entry": entry})
+                else:
+                    entry = dict(locked[contract_id], status="RELEASED", recipient=recipient_id)
+                    ops.append({"op": "release", "contract_id": contract_id, "entry": entry})
+                settled.append(True)
+            if ops:
+                self.storage.append(ops)
+            return settled
+
+    def release_funds(self, contract_id: str, recipient_id: str):
+        return self._settle("release", contract_id, status="RELEASED", recipient=recipient_id)
 
     def refund_funds(self, contract_id: str):
-         if contract_id in self.data["locked_funds"]:
-            entry = self.data["locked_funds"][contract_id]
-            entry["status"] = "REFUNDED"
-            self.data["history"].append(entry)
-            del self.data["locked_funds"][contract_id]
-            self._save()
-            return True
-         return False
+        return self._settle("refund", contract_id, status="REFUNDED")
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+import numpy as np
+
+CACHE_DB_FILE = "llm_cache.sqlite3"
+
+Embedder = Callable[[str], Sequence[float]]
+
+def normalize_prompt(prompt: str) -> str:
+    # Prompts are f-strings with incidental indentation; whitespace never changes the meaning
+    return " ".join(prompt.split())
+
+def namespace_key(model_id: str, instructions: Any, output_schema: Any) -> str:
+    """Hash of everything besides the prompt that determines an agent's response."""
+    schema = None
+    if output_schema is not None:
+        schema = [output_schema.__name__, output_schema.model_json_schema()]
+    blob = json.dumps([model_id, instructions, schema], sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+def ollama_embedder(model: str = "nomic-embed-text", host: Optional[str] = None) -> Embedder:
+    import ollama
+    client = ollama.Client(host=host)
+
+    def _embed(text: str) -> Sequence[float]:
+        return client.embed(model=model, input=text)["embeddings"][0]
+    return _embed
+
+class ResponseCache:
+    """
+    Two-tier cache for agent responses: an in-memory LRU in front of a SQLite
+    store, both expiring entries after ttl seconds. Entries are keyed on the
+    agent namespace (model id, instructions, output schema) plus the normalized
+    prompt. With an embedder, a miss falls back to the most similar cached prompt
+    in the same namespace if its cosine similarity reaches similarity_threshold.
+    """
+    def __init__(self, path: Optional[str] = CACHE_DB_FILE, max_entries: int = 1024, ttl: Optional[float] = 24 * 3600,
+                 embedder: Optional[Embedder] = None, similarity_threshold: float = 0.97):
+        # Absolute, so connections opened later from other threads hit the same file
+        self.path = os.path.abspath(path) if path else path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+
+        self._memory: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        # namespace -> key -> (unit embedding, expires), for the similarity fallback
+        self._vectors: Dict[str, Dict[str, Tuple[np.ndarray, Optional[float]]]] = {}
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        if self.path:
+            self._conn().execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    embedding BLOB,
+                    expires REAL
+                )
+            """)
+            self._conn().execute("CREATE INDEX IF NOT EXISTS idx_responses_namespace ON responses (namespace)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _expiry(self) -> Optional[float]:
+        return time.time() + self.ttl if self.ttl is not None else None
+
+    @staticmethod
+    def key(namespace: str, prompt: str) -> str:
+        return hashlib.sha256(f"{namespace}\0{normalize_prompt(prompt)}".encode()).hexdigest()
+
+    def get(self, namespace: str, prompt: str) -> Optional[dict]:
+        key = self.key(namespace, prompt)
+        payload = self._get(key)
+        if payload is None and self.embedder is not None:
+            payload = self._get_similar(namespace, prompt)
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return payload
+
+    def _get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires, payload = entry
+                if expires is None or expires > now:
+                    self._memory.move_to_end(key)
+                    return payload
+                del self._memory[key]
+
+        if not self.path:
+            return None
+        row = self._conn().execute("SELECT payload, expires FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] is not None and row[1] <= now:
+            self._conn().execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+        payload = json.loads(row[0])
+        self._remember(key, row[1], payload)
+        return payload
+
+    def _get_similar(self, namespace: str, prompt: str) -> Optional[dict]:
+        vectors = self._namespace_vectors(namespace)
+        now = time.time()
+        with self._lock:
+            # Expired entries are dropped here, so the index does not outgrow the live cache
+            for key in [k for k, (_, expires) in vectors.items() if expires is not None and expires <= now]:
+                del vectors[key]
+            if not vectors:
+                return None
+            keys = list(vectors)
+            matrix = np.stack([vectors[k][0] for k in keys])
+        query = _unit(self.embedder(normalize_prompt(prompt)))
+        sims = matrix @ query
+        best = int(np.argmax(sims))
+        if sims[best] < self.similarity_threshold:
+            return None
+        payload = self._get(keys[best])
+        if payload is None:
+            # Gone from both tiers (cleared or expired elsewhere)
+            with self._lock:
+                vectors.pop(keys[best], None)
+        return payload
+
+    def _namespace_vectors(self, namespace: str) -> Dict[str, Tuple[np.ndarray, Optional[float]]]:
+        with self._lock:
+            if namespace in self._vectors:
+                return self._vectors[namespace]
+        vectors = {}
+        if self.path:
+            rows = self._conn().execute(
+                "SELECT key, embedding, expires FROM responses "
+                "WHERE namespace = ? AND embedding IS NOT NULL AND (expires IS NULL OR expires > ?)",
+                (namespace, time.time()),
+            ).fetchall()
+            vectors = {k: (np.frombuffer(blob, dtype=np.float32), expires) for k, blob, expires in rows}
+        with self._lock:
+            return self._vectors.setdefault(namespace, vectors)
+
+    def put(self, namespace: str, prompt: str, payload: dict):
+        key = self.key(namespace, prompt)
+        expires = self._expiry()
+        vector = None
+        if self.embedder is not None:
+            vector = _unit(self.embedder(normalize_prompt(prompt)))
+            vectors = self._namespace_vectors(namespace)
+            with self._lock:
+                vectors[key] = (vector, expires)
+        self._remember(key, expires, payload)
+        if self.path:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO responses (key, namespace, payload, embedding, expires) VALUES (?, ?, ?, ?, ?)",
+                (key, namespace, json.dumps(payload), vector.tobytes() if vector is not None else None, expires),
+            )
+
+    def _remember(self, key: str, expires: Optional[float], payload: dict):
+        with self._lock:
+            self._memory[key] = (expires, payload)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._vectors.clear()
+        if self.path:
+            self._conn().execute("DELETE FROM responses")
+
+def _unit(vector: Sequence[float]) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+_default_cache: Optional[ResponseCache] = None
+_default_lock = threading.Lock()
+
+def reset_default_cache():
+    """Forgets the process-wide cache; the next get_default_cache() opens a new one."""
+    global _default_cache
+    with _default_lock:
+        _default_cache = None
+
+def get_default_cache() -> ResponseCache:
+    """Process-wide cache shared by all agents that don't bring their own."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
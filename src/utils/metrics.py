@@ -0,0 +1,339 @@
+import bisect
+import contextvars
+import json
+import secrets
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Estimated prompt tokens
+PROMPT_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+SPANS_FILE = "spans.jsonl"
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("agentbazaar_span", default=None)
+
+class Span:
+    """One timed unit of work (a transaction or one of its stages), OpenTelemetry style."""
+    def __init__(self, name: str, trace_id: Optional[str] = None, parent: Optional["Span"] = None, **attributes):
+        self.name = name
+        self.trace_id = trace_id or (parent.trace_id if parent else secrets.token_hex(16))
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._t0 = time.perf_counter()
+        self.wall_s = 0.0
+        self.ttfb_s: Optional[float] = None
+        self.llm_s = 0.0
+        self.llm_calls = 0
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.parse_failures = 0
+        self.prompt_size = 0           # estimated tokens of the prompts sent
+        self.prompt_tokens_saved = 0   # estimated tokens removed by compaction
+        self._lock = threading.Lock()
+
+    def record_llm(self, seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0, cache_hit: bool = False):
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_s += seconds
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cache_hits += int(cache_hit)
+
+    def mark_first_byte(self):
+        """Records time-to-first-byte for streamed stages; later calls are ignored."""
+        if self.ttfb_s is None:
+            self.ttfb_s = time.perf_counter() - self._t0
+
+    def end(self):
+        if self.end_ns is None:
+            self.wall_s = time.perf_counter() - self._t0
+            self.end_ns = time.time_ns()
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Compact form attached to run_stream events."""
+        d = {
+            "wall_ms": round(1e3 * self.wall_s, 2),
+            "llm_ms": round(1e3 * self.llm_s, 2),
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cache_hit": self.llm_calls > 0 and self.cache_hits == self.llm_calls,
+        }
+        if self.ttfb_s is not None:
+            d["ttfb_ms"] = round(1e3 * self.ttfb_s, 2)
+        if self.parse_failures:
+            d["parse_failures"] = self.parse_failures
+        if self.prompt_size:
+            d["prompt_size"] = self.prompt_size
+        if self.prompt_tokens_saved:
+            d["prompt_tokens_saved"] = self.prompt_tokens_saved
+        return d
+
+    def to_otel(self) -> Dict[str, Any]:
+        attributes = dict(self.attributes)
+        attributes.update({f"agentbazaar.{k}": v for k, v in self.as_dict().items()})
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": attributes,
+        }
+
+def record_llm_call(seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0, cache_hit: bool = False):
+    """Called by agents for every LLM call; attributed to the innermost active stage."""
+    span = _current_span.get()
+    if span is not None:
+        span.record_llm(seconds, prompt_tokens, completion_tokens, cache_hit)
+
+def record_prompt(tokens: int, saved: int = 0):
+    """Estimated size of a prompt about to be sent, or tokens compaction removed from one."""
+    span = _current_span.get()
+    if span is not None:
+        with span._lock:
+            span.prompt_size += tokens
+            span.prompt_tokens_saved += saved
+
+# (agent, model_id, outcome) -> count, process-wide. Outcomes: "repaired" (fixed
+# locally), "invalid" (unusable reply, re-prompted or given up on), "failed" (gave up)
+PARSE_FAILURES: Dict[Tuple[str, str, str], int] = defaultdict(int)
+_parse_lock = threading.Lock()
+
+def record_parse_failure(agent: str, model_id: str, outcome: str):
+    """Called by agents when a structured reply needed repair or was unusable."""
+    with _parse_lock:
+        PARSE_FAILURES[(agent, model_id, outcome)] += 1
+    span = _current_span.get()
+    if span is not None and outcome == "invalid":
+        with span._lock:
+            span.parse_failures += 1
+
+def parse_failure_counts() -> Dict[Tuple[str, str, str], int]:
+    with _parse_lock:
+        return dict(PARSE_FAILURES)
+
+def add_parse_failures(counts: Dict[Tuple[str, str, str], int]):
+    """Adds counts collected elsewhere, e.g. in a worker process."""
+    with _parse_lock:
+        for key, n in counts.items():
+            PARSE_FAILURES[key] += n
+
+class RollingHistogram:
+    """Cumulative Prometheus buckets plus a window of recent samples for quantiles."""
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, window: int = 1024):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent: deque = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantile(self, q: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def merge(self, other: "RollingHistogram"):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sum += other.sum
+        self.count += other.count
+        self.recent.extend(other.recent)
+
+class JsonlSpanExporter:
+    """Appends finished spans as OTLP-like JSON lines to a local file."""
+    def __init__(self, path: str = SPANS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        lines = "".join(json.dumps(s.to_otel()) + "\n" for s in spans)
+        with self._lock, open(self.path, "a") as f:
+            f.write(lines)
+
+class InMemorySpanExporter:
+    def __init__(self):
+        self.spans: List[Dict[str, Any]] = []
+
+    def export(self, spans: List[Span]):
+        self.spans.extend(s.to_otel() for s in spans)
+
+class MetricsRegistry:
+    """
+    Aggregates finished stage spans into rolling histograms (wall and LLM time per
+    stage) and token/cache counters, and forwards them to span exporters.
+    """
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, window: int = 1024, exporters: Optional[List[Any]] = None):
+        self.buckets = tuple(buckets)
+        self.window = window
+        self.exporters = list(exporters or [])
+        self.wall: Dict[str, RollingHistogram] = defaultdict(self._histogram)
+        self.llm: Dict[str, RollingHistogram] = defaultdict(self._histogram)
+        self.ttfb: Dict[str, RollingHistogram] = defaultdict(self._histogram)
+        self.prompt: Dict[str, RollingHistogram] = defaultdict(lambda: RollingHistogram(PROMPT_BUCKETS, self.window))
+        self.counters: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def _histogram(self) -> RollingHistogram:
+        return RollingHistogram(self.buckets, self.window)
+
+    def start_transaction(self, **attributes) -> Span:
+        return Span("TRANSACTION", **attributes)
+
+    @contextmanager
+    def stage(self, name: str, parent: Optional[Span] = None, **attributes) -> Iterator[Span]:
+        span = Span(name, parent=parent, **attributes)
+        try:
+            with self.active(span):
+                yield span
+        finally:
+            self.finish(span)
+
+    @contextmanager
+    def active(self, span: Span) -> Iterator[Span]:
+        """
+        Attributes LLM calls made inside the block to span without ending it. Used by
+        streamed stages, which yield events between chunks and finish the span themselves.
+        """
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attributes["error"] = repr(e)
+            raise
+        finally:
+            _current_span.reset(token)
+
+    def finish(self, span: Span):
+        span.end()
+        with self._lock:
+            self.wall[span.name].observe(span.wall_s)
+            if span.llm_calls:
+                self.llm[span.name].observe(span.llm_s)
+            if span.ttfb_s is not None:
+                self.ttfb[span.name].observe(span.ttfb_s)
+            if span.prompt_size:
+                self.prompt[span.name].observe(span.prompt_size)
+            c = self.counters[span.name]
+            c["spans"] += 1
+            c["llm_calls"] += span.llm_calls
+            c["cache_hits"] += span.cache_hits
+            c["prompt_tokens"] += span.prompt_tokens
+            c["completion_tokens"] += span.completion_tokens
+            c["parse_failures"] += span.parse_failures
+            c["prompt_size"] += span.prompt_size
+            c["prompt_tokens_saved"] += span.prompt_tokens_saved
+        for exporter in self.exporters:
+            exporter.export([span])
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Picklable, so worker processes can send their registry back to be merged;
+        # exporters stay with the process that configured them
+        with self._lock:
+            return {
+                "buckets": self.buckets, "window": self.window,
+                "wall": dict(self.wall), "llm": dict(self.llm), "ttfb": dict(self.ttfb), "prompt": dict(self.prompt),
+                "counters": {name: dict(c) for name, c in self.counters.items()},
+            }
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__init__(state["buckets"], state["window"])
+        self.wall.update(state["wall"])
+        self.llm.update(state["llm"])
+        self.ttfb.update(state["ttfb"])
+        self.prompt.update(state.get("prompt", {}))
+        for name, c in state["counters"].items():
+            self.counters[name].update(c)
+
+    def merge(self, other: "MetricsRegistry"):
+        with self._lock:
+            for name, h in other.wall.items():
+                self.wall[name].merge(h)
+            for name, h in other.llm.items():
+                self.llm[name].merge(h)
+            for name, h in other.ttfb.items():
+                self.ttfb[name].merge(h)
+            for name, h in other.prompt.items():
+                self.prompt[name].merge(h)
+            for name, c in other.counters.items():
+                for k, v in c.items():
+                    self.counters[name][k] += v
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for metric, hists, help_text in (
+                ("agentbazaar_stage_wall_seconds", self.wall, "Wall time per marketplace stage"),
+                ("agentbazaar_stage_llm_seconds", self.llm, "LLM time per marketplace stage"),
+                ("agentbazaar_stage_ttfb_seconds", self.ttfb, "Time to first streamed chunk per stage"),
+                ("agentbazaar_stage_prompt_tokens", self.prompt, "Estimated prompt tokens sent per stage"),
+            ):
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} histogram")
+                for stage, h in sorted(hists.items()):
+                    cumulative = 0
+                    for bound, n in zip(h.buckets, h.counts):
+                        cumulative += n
+                        lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                    lines.append(f'{metric}_sum{{stage="{stage}"}} {h.sum}')
+                    lines.append(f'{metric}_count{{stage="{stage}"}} {h.count}')
+                lines.append(f"# HELP {metric}_recent Quantiles over the last {self.window} samples")
+                lines.append(f"# TYPE {metric}_recent gauge")
+                for stage, h in sorted(hists.items()):
+                    for q in self.QUANTILES:
+                        lines.append(f'{metric}_recent{{stage="{stage}",quantile="{q}"}} {h.quantile(q)}')
+
+            for key in ("llm_calls", "cache_hits", "prompt_tokens", "completion_tokens", "prompt_tokens_saved"):
+                metric = f"agentbazaar_stage_{key}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for stage, c in sorted(self.counters.items()):
+                    lines.append(f'{metric}{{stage="{stage}"}} {c[key]}')
+
+        metric = "agentbazaar_parse_failures_total"
+        lines.append(f"# HELP {metric} Structured replies that needed repair or were unusable, per agent and model")
+        lines.append(f"# TYPE {metric} counter")
+        with _parse_lock:
+            for (agent, model_id, outcome), n in sorted(PARSE_FAILURES.items()):
+                lines.append(f'{metric}{{agent="{agent}",model="{model_id}",outcome="{outcome}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9108, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serves /metrics in Prometheus text format from a daemon thread."""
+        registry = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), _Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+# Process-wide registry used by MarketSimulation unless one is passed in
+METRICS = MetricsRegistry()
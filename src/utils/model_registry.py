@@ -0,0 +1,63 @@
+import threading
+from typing import Callable, Dict, Optional, Tuple
+from agno.models.base import Model
+from agno.models.ollama import Ollama
+from ollama import Client
+from src.utils.model_router import ModelRouter, close_client
+
+# One ollama.Client (and therefore one httpx connection pool) per (host, model)
+_clients: Dict[Tuple[Optional[str], str], Client] = {}
+_lock = threading.Lock()
+
+# Optional override, e.g. an offline stand-in model for benchmarks and tests
+_model_factory: Optional[Callable[[str, Optional[str]], Model]] = None
+
+# Optional role -> backend pool routing across several Ollama servers
+_router: Optional[ModelRouter] = None
+
+def set_model_factory(factory: Optional[Callable[[str, Optional[str]], Model]]):
+    """Routes get_model through factory(model_id, host); None restores Ollama."""
+    global _model_factory
+    _model_factory = factory
+
+def set_router(router: Optional[ModelRouter]):
+    """Routes agents without an explicit host through router; None restores direct Ollama."""
+    global _router
+    if _router is not None and _router is not router:
+        _router.close()
+    _router = router
+
+def get_router() -> Optional[ModelRouter]:
+    return _router
+
+def get_client(model_id: str, host: Optional[str] = None) -> Client:
+    key = (host, model_id)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = Client(host=host)
+        return client
+
+def get_model(model_id: str, host: Optional[str] = None, role: Optional[str] = None) -> Model:
+    """
+    Returns an Agno Ollama model whose sync client is shared by every agent on the
+    same (host, model). Async clients stay per model: httpx.AsyncClient is tied to
+    the event loop it first ran on, and the UI and the scheduler use different loops.
+    With a router installed, agents without an explicit host go through the pool
+    (and model) routed to their role.
+    """
+    if _model_factory is not None:
+        return _model_factory(model_id, host)
+    if _router is not None and host is None:
+        model = _router.model(role, model_id)
+        if model is not None:
+            return model
+    return Ollama(id=model_id, host=host, client=get_client(model_id, host))
+
+def close_all():
+    if _router is not None:
+        _router.close()
+    with _lock:
+        for client in _clients.values():
+            close_client(client)
+        _clients.clear()
@@ -0,0 +1,392 @@
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+import httpx
+from agno.models.base import Model
+from agno.models.ollama import Ollama
+from ollama import Client
+
+ROLES = ("broker", "worker", "negotiator", "contract", "executor", "validator")
+
+# Placeholder base URL for routed clients; every request is re-targeted to a backend
+ROUTER_HOST = "http://model-router"
+HEALTH_PATH = "/api/tags"
+# Upstream overload/unavailability: retried on another backend and counted as failures
+RETRY_STATUSES = {502, 503, 504}
+
+class NoBackendAvailable(httpx.TransportError):
+    pass
+
+def close_client(client: Client):
+    """Closes client's connection pool; older ollama releases without close() leave it to the GC."""
+    close = getattr(client, "close", None)
+    if close is not None:
+        close()
+
+class Backend:
+    """One inference server, with its in-flight count, health and circuit-breaker state."""
+    def __init__(self, url: str, max_concurrency: int = 4):
+        self.url = url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.outstanding = 0
+        self.healthy = True
+        self.failures = 0                     # consecutive
+        self.open_until: Optional[float] = None
+        self.trial_in_flight = False          # half-open probe
+        self.served = 0
+        self.errors = 0
+
+    def circuit(self, now: float) -> str:
+        if self.open_until is None:
+            return "closed"
+        return "open" if now < self.open_until else "half_open"
+
+    def as_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "url": self.url, "outstanding": self.outstanding, "max_concurrency": self.max_concurrency,
+            "healthy": self.healthy, "circuit": self.circuit(now), "served": self.served, "errors": self.errors,
+        }
+
+class BackendPool:
+    """
+    Least-outstanding-requests balancing over a set of backends. Each backend takes at
+    most max_concurrency requests at once; callers wait for a free slot up to
+    acquire_timeout. failure_threshold consecutive failures open a backend's circuit
+    for reset_timeout seconds, after which a single probe request may close it again.
+    Backends failing the periodic health check are skipped until they pass.
+    """
+    def __init__(self, backends: Iterable[Backend], failure_threshold: int = 3, reset_timeout: float = 10.0,
+                 acquire_timeout: float = 60.0, health_path: str = HEALTH_PATH):
+        self.backends: List[Backend] = list(backends)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.acquire_timeout = acquire_timeout
+        self.health_path = health_path
+        self._cond = threading.Condition()
+        self._health_stop: Optional[threading.Event] = None
+
+    def _pick(self, exclude: Set[str], now: float) -> Optional[Backend]:
+        best = None
+        for b in self.backends:
+            if b.url in exclude or not b.healthy or b.outstanding >= b.max_concurrency:
+                continue
+            state = b.circuit(now)
+            if state == "open" or (state == "half_open" and b.trial_in_flight):
+                continue
+            # Least outstanding relative to capacity; fewest served breaks ties
+            if best is None or (b.outstanding / b.max_concurrency, b.served) < (best.outstanding / best.max_concurrency, best.served):
+                best = b
+        if best is not None:
+            if best.circuit(now) == "half_open":
+                best.trial_in_flight = True
+            best.outstanding += 1
+        return best
+
+    def _waitable(self, exclude: Set[str], now: float) -> bool:
+        # At capacity but otherwise usable; open circuits and failed health checks fail fast
+        return any(
+            b.url not in exclude and b.healthy and b.circuit(now) != "open"
+            for b in self.backends
+        )
+
+    def try_acquire(self, exclude: Set[str] = frozenset()) -> Optional[Backend]:
+        with self._cond:
+            backend = self._pick(exclude, time.monotonic())
+            if backend is None and not self._waitable(exclude, time.monotonic()):
+                raise NoBackendAvailable("No healthy backend with a closed circuit")
+            return backend
+
+    def acquire(self, exclude: Set[str] = frozenset()) -> Backend:
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                backend = self._pick(exclude, now)
+                if backend is not None:
+                    return backend
+                if not self._waitable(exclude, now):
+                    raise NoBackendAvailable("No healthy backend with a closed circuit")
+                if now >= deadline:
+                    raise NoBackendAvailable(f"No backend slot freed up within {self.acquire_timeout}s")
+                # Half-open circuits become eligible without a release, so wake up periodically
+                self._cond.wait(min(deadline - now, 0.5))
+
+    async def aacquire(self, exclude: Set[str] = frozenset(), poll: float = 0.005) -> Backend:
+        # Polls instead of blocking the event loop on the condition variable
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            backend = self.try_acquire(exclude)
+            if backend is not None:
+                return backend
+            if time.monotonic() >= deadline:
+                raise NoBackendAvailable(f"No backend slot freed up within {self.acquire_timeout}s")
+            await asyncio.sleep(poll)
+            poll = min(poll * 2, 0.1)
+
+    def release(self, backend: Backend, ok: bool):
+        with self._cond:
+            backend.outstanding -= 1
+            backend.served += 1
+            if ok:
+                backend.failures = 0
+                backend.open_until = None
+            else:
+                backend.errors += 1
+                backend.failures += 1
+                if backend.trial_in_flight or backend.failures >= self.failure_threshold:
+                    backend.open_until = time.monotonic() + self.reset_timeout
+            backend.trial_in_flight = False
+            self._cond.notify_all()
+
+    def check_health(self, timeout: float = 2.0):
+        """Probes every backend once and updates its healthy flag."""
+        for b in self.backends:
+            try:
+                healthy = httpx.get(b.url + self.health_path, timeout=timeout).status_code < 500
+            except httpx.HTTPError:
+                healthy = False
+            with self._cond:
+                b.healthy = healthy
+                self._cond.notify_all()
+
+    def start_health_checks(self, interval: float = 5.0, timeout: float = 2.0):
+        if self._health_stop is not None:
+            return
+        self._health_stop = stop = threading.Event()
+
+        def _loop():
+            while not stop.is_set():
+                self.check_health(timeout)
+                stop.wait(interval)
+        threading.Thread(target=_loop, daemon=True).start()
+
+    def stop_health_checks(self):
+        if self._health_stop is not None:
+            self._health_stop.set()
+            self._health_stop = None
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            now = time.monotonic()
+            return [b.as_dict(now) for b in self.backends]
+
+def _retarget(request: httpx.Request, backend: Backend):
+    url = httpx.URL(backend.url)
+    request.url = request.url.copy_with(scheme=url.scheme, host=url.host, port=url.port)
+    request.headers["Host"] = request.url.netloc.decode("ascii")
+
+class _ReleasingStream(httpx.SyncByteStream):
+    def __init__(self, stream, on_close: Callable[[bool], None]):
+        self._stream = stream
+        self._on_close = on_close
+        self._ok = True
+        self._closed = False
+
+    def __iter__(self):
+        try:
+            yield from self._stream
+        except Exception:
+            self._ok = False
+            raise
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            try:
+                self._stream.close()
+            finally:
+                self._on_close(self._ok)
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, on_close: Callable[[bool], None]):
+        self._stream = stream
+        self._on_close = on_close
+        self._ok = True
+        self._closed = False
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._stream:
+                yield chunk
+        except Exception:
+            self._ok = False
+            raise
+
+    async def aclose(self):
+        if not self._closed:
+            self._closed = True
+            try:
+                await self._stream.aclose()
+            finally:
+                self._on_close(self._ok)
+
+class RoutingTransport(httpx.BaseTransport):
+    """
+    httpx transport that sends each request to the pool's least-loaded backend and
+    retries connection errors and 5xx overload answers on another one. The backend
+    slot is held until the response body is closed, so streamed generations count
+    as outstanding for their whole length.
+    """
+    def __init__(self, pool: BackendPool):
+        self.pool = pool
+        self._transports: Dict[str, httpx.HTTPTransport] = {}
+        self._lock = threading.Lock()
+
+    def _transport(self, backend: Backend) -> httpx.HTTPTransport:
+        with self._lock:
+            transport = self._transports.get(backend.url)
+            if transport is None:
+                transport = self._transports[backend.url] = httpx.HTTPTransport()
+            return transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        tried: Set[str] = set()
+        while True:
+            backend = self.pool.acquire(exclude=tried)
+            tried.add(backend.url)
+            last = len(tried) >= len(self.pool.backends)
+            _retarget(request, backend)
+            try:
+                response = self._transport(backend).handle_request(request)
+            except httpx.TransportError:
+                self.pool.release(backend, ok=False)
+                if last:
+                    raise
+                continue
+            ok = response.status_code not in RETRY_STATUSES
+            if not ok and not last:
+                response.close()
+                self.pool.release(backend, ok=False)
+                continue
+            return httpx.Response(
+                status_code=response.status_code, headers=response.headers, extensions=response.extensions,
+                stream=_ReleasingStream(response.stream, lambda stream_ok, b=backend: self.pool.release(b, ok and stream_ok)),
+            )
+
+    def close(self):
+        with self._lock:
+            for transport in self._transports.values():
+                transport.close()
+            self._transports.clear()
+
+class AsyncRoutingTransport(httpx.AsyncBaseTransport):
+    """Async RoutingTransport. Holds its own connections, so create one per event loop."""
+    def __init__(self, pool: BackendPool):
+        self.pool = pool
+        self._transports: Dict[str, httpx.AsyncHTTPTransport] = {}
+
+    def _transport(self, backend: Backend) -> httpx.AsyncHTTPTransport:
+        transport = self._transports.get(backend.url)
+        if transport is None:
+            transport = self._transports[backend.url] = httpx.AsyncHTTPTransport()
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        tried: Set[str] = set()
+        while True:
+            backend = await self.pool.aacquire(exclude=tried)
+            tried.add(backend.url)
+            last = len(tried) >= len(self.pool.backends)
+            _retarget(request, backend)
+            try:
+                response = await self._transport(backend).handle_async_request(request)
+            except httpx.TransportError:
+                self.pool.release(backend, ok=False)
+                if last:
+                    raise
+                continue
+            ok = response.status_code not in RETRY_STATUSES
+            if not ok and not last:
+                await response.aclose()
+                self.pool.release(backend, ok=False)
+                continue
+            return httpx.Response(
+                status_code=response.status_code, headers=response.headers, extensions=response.extensions,
+                stream=_AsyncReleasingStream(response.stream, lambda stream_ok, b=backend: self.pool.release(b, ok and stream_ok)),
+            )
+
+    async def aclose(self):
+        for transport in self._transports.values():
+            await transport.aclose()
+        self._transports.clear()
+
+class Route:
+    def __init__(self, pool: BackendPool, model_id: Optional[str] = None):
+        self.pool = pool
+        self.model_id = model_id  # None keeps the agent's own model id
+
+class ModelRouter:
+    """
+    Maps agent roles (see ROLES) to a backend pool and optionally a different model,
+    e.g. a small model for the broker and workers. Pools can be shared between roles,
+    so load accounting covers every stage that hits the same servers. Roles without
+    a route fall back to `default`, then to the agent's own host.
+    """
+    def __init__(self, routes: Optional[Dict[str, Route]] = None, default: Optional[Route] = None):
+        self.routes = dict(routes or {})
+        self.default = default
+        self._clients: Dict[int, Client] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ModelRouter":
+        """
+        {"pools": {"gpu": {"backends": [{"url": "http://gpu1:11434", "max_concurrency": 4}, ...],
+                           "failure_threshold": 3, "reset_timeout": 10}},
+         "roles": {"broker": {"pool": "gpu", "model": "llama3.2:1b"}, ...},
+         "default": {"pool": "gpu"}}
+        """
+        pools = {}
+        for name, spec in config.get("pools", {}).items():
+            spec = dict(spec)
+            backends = [Backend(**b) if isinstance(b, dict) else Backend(b) for b in spec.pop("backends")]
+            pools[name] = BackendPool(backends, **spec)
+
+        def _route(spec):
+            return Route(pools[spec["pool"]], spec.get("model")) if spec else None
+
+        routes = {role: _route(spec) for role, spec in config.get("roles", {}).items()}
+        return cls(routes, default=_route(config.get("default")))
+
+    def route(self, role: Optional[str]) -> Optional[Route]:
+        return self.routes.get(role) or self.default
+
+    def pools(self) -> List[BackendPool]:
+        seen = {}
+        for route in [*self.routes.values(), self.default]:
+            if route is not None:
+                seen[id(route.pool)] = route.pool
+        return list(seen.values())
+
+    def _client(self, pool: BackendPool) -> Client:
+        # One sync client (and connection pool) per backend pool, shared by all roles on it
+        with self._lock:
+            client = self._clients.get(id(pool))
+            if client is None:
+                client = self._clients[id(pool)] = Client(host=ROUTER_HOST, transport=RoutingTransport(pool))
+            return client
+
+    def model(self, role: Optional[str], model_id: str) -> Optional[Model]:
+        route = self.route(role)
+        if route is None:
+            return None
+        return Ollama(
+            id=route.model_id or model_id,
+            host=ROUTER_HOST,
+            client=self._client(route.pool),
+            # Agno builds the async client lazily from these params, per model instance
+            client_params={"transport": AsyncRoutingTransport(route.pool)},
+        )
+
+    def start_health_checks(self, interval: float = 5.0):
+        for pool in self.pools():
+            pool.start_health_checks(interval)
+
+    def close(self):
+        for pool in self.pools():
+            pool.stop_health_checks()
+        with self._lock:
+            for client in self._clients.values():
+                close_client(client)
+            self._clients.clear()
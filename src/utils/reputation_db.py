@@ -1,47 +1,167 @@
 import json
 import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
 from src.models.schemas import AgentStats
 
-REP_FILE = "reputation_db.json"
+REP_FILE = "reputation_db.json"  # legacy store, imported on first open
+REP_DB_FILE = "reputation_db.sqlite3"
+
+_STATS_COLUMNS = "agent_id, tasks_completed, success_rate, avg_score, disputes"
+
+# Right-hand sides see the pre-update row, so the rates are derived from the new counters
+_UPDATE_SQL = """
+    INSERT INTO agent_stats (agent_id, tasks_completed, successes, score_sum, success_rate, avg_score)
+    VALUES (?, 1, ?, ?, ?, ?)
+    ON CONFLICT(agent_id) DO UPDATE SET
+        tasks_completed = tasks_completed + 1,
+        successes = successes + excluded.successes,
+        score_sum = score_sum + excluded.score_sum,
+        success_rate = CAST(successes + excluded.successes AS REAL) / (tasks_completed + 1),
+        avg_score = (score_sum + excluded.score_sum) / (tasks_completed + 1)
+"""
 
 class ReputationDB:
-    def __init__(self):
-        self._load()
+    """
+    Agent reputation stored in SQLite (WAL mode), so any number of processes and
+    ReputationDB instances read the same up-to-date counters. Raw counters
+    (successes, score_sum) are kept next to the derived rates and every update is
+    a single atomic UPSERT, so parallel transactions never lose an update.
+    """
+    def __init__(self, path: str = REP_DB_FILE, legacy_path: Optional[str] = REP_FILE):
+        # Absolute, so connections opened later from other threads hit the same file
+        self.path = os.path.abspath(path)
+        self._local = threading.local()
+        self._init_schema(legacy_path)
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
 
-    def _load(self):
-        if os.path.exists(REP_FILE):
-            with open(REP_FILE, "r") as f:
-                self.data = json.load(f)
-        else:
-            self.data = {}
+    def _init_schema(self, legacy_path: Optional[str]):
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS agent_stats (
+                agent_id TEXT PRIMARY KEY,
+                tasks_completed INTEGER NOT NULL DEFAULT 0,
+                successes INTEGER NOT NULL DEFAULT 0,
+                score_sum REAL NOT NULL DEFAULT 0,
+                success_rate REAL NOT NULL DEFAULT 0,
+                avg_score REAL NOT NULL DEFAULT 0,
+                disputes INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_agent_stats_avg_score ON agent_stats (avg_score DESC)")
+        # Outcomes already counted, so a settlement replayed after a crash is not counted twice
+        conn.execute("CREATE TABLE IF NOT EXISTS applied_outcomes (outcome_id TEXT PRIMARY KEY)")
+        if legacy_path and os.path.exists(legacy_path):
+            self._import_legacy(legacy_path)
 
-    def _save(self):
-        with open(REP_FILE, "w") as f:
-            json.dump(self.data, f, indent=2)
+    def _import_legacy(self, legacy_path: str):
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM agent_stats LIMIT 1").fetchone():
+            return
+        with open(legacy_path, "r") as f:
+            data = json.load(f)
+        rows = []
+        for agent_id, s in data.items():
+            tasks = s.get("tasks_completed", 0)
+            rows.append((
+                agent_id, tasks, round(s.get("success_rate", 0.0) * tasks), s.get("avg_score", 0.0) * tasks,
+                s.get("success_rate", 0.0), s.get("avg_score", 0.0), s.get("disputes", 0),
+            ))
+        conn.executemany(
+            "INSERT OR IGNORE INTO agent_stats (agent_id, tasks_completed, successes, score_sum, success_rate, avg_score, disputes) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
 
     def get_stats(self, agent_id: str) -> AgentStats:
-        data = self.data.get(agent_id, {})
-        return AgentStats(**data) if data else AgentStats(agent_id=agent_id)
+        row = self._conn().execute(
+            f"SELECT {_STATS_COLUMNS} FROM agent_stats WHERE agent_id = ?", (agent_id,)
+        ).fetchone()
+        return _to_stats(row) if row else AgentStats(agent_id=agent_id)
 
     def update_stats(self, agent_id: str, success: bool, score: float):
-        stats = self.get_stats(agent_id)
-        stats.tasks_completed += 1
-        
-        # Simple moving average update
-        total_score = (stats.avg_score * (stats.tasks_completed - 1)) + score
-        stats.avg_score = total_score / stats.tasks_completed
-        
-        if success:
-            # Re-calculate success rate
-            # Need to track total successes strictly? Let's just approximate for MVP or store basic counters
-            # Let's fix the model to store success count to be accurate
-            pass 
-        
-        # Heuristic update for success rate
-        prev_successes = stats.success_rate * (stats.tasks_completed - 1)
-        if success:
-            prev_successes += 1
-        stats.success_rate = prev_successes / stats.tasks_completed
-
-        self.data[agent_id] = stats.model_dump()
-        self._save()
+        self._conn().execute(_UPDATE_SQL, (agent_id, int(success), score, float(success), score))
+
+    def update_many(self, outcomes: Iterable[tuple]) -> int:
+        """
+        Applies (agent_id, success, score[, outcome_id]) outcomes in one write
+        transaction: all or none are stored, and repeated agents accumulate in order.
+        An outcome_id (the contract id) is recorded in the same transaction and
+        outcomes whose id was already applied are skipped. Returns how many were applied.
+        """
+        rows = [tuple(outcome) + (None,) * (4 - len(outcome)) for outcome in outcomes]
+        if not rows:
+            return 0
+        applied = 0
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for agent_id, success, score, outcome_id in rows:
+                if outcome_id is not None and conn.execute(
+                    "INSERT OR IGNORE INTO applied_outcomes (outcome_id) VALUES (?)", (outcome_id,)
+                ).rowcount == 0:
+                    continue
+                conn.execute(_UPDATE_SQL, (agent_id, int(success), score, float(success), score))
+                applied += 1
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return applied
+
+    def load_counters(self, rows: Iterable[tuple]):
+        """Replaces the counters of the given agents with (agent_id, tasks_completed, successes, score_sum) rows."""
+        self._conn().executemany("""
+            INSERT INTO agent_stats (agent_id, tasks_completed, successes, score_sum, success_rate, avg_score)
+            VALUES (?1, ?2, ?3, ?4, CAST(?3 AS REAL) / MAX(?2, 1), ?4 / MAX(?2, 1))
+            ON CONFLICT(agent_id) DO UPDATE SET
+                tasks_completed = excluded.tasks_completed,
+                successes = excluded.successes,
+                score_sum = excluded.score_sum,
+                success_rate = excluded.success_rate,
+                avg_score = excluded.avg_score
+        """, rows)
+
+    def avg_scores(self, agent_ids: Iterable[str]) -> Dict[str, float]:
+        """Batch lookup of avg_score for agents with at least one completed task."""
+        ids = list(dict.fromkeys(agent_ids))
+        result = {}
+        conn = self._conn()
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            result.update(conn.execute(
+                f"SELECT agent_id, avg_score FROM agent_stats WHERE tasks_completed > 0 AND agent_id IN ({placeholders})",
+                chunk,
+            ).fetchall())
+        return result
+
+    def leaderboard(self, limit: int = 20, offset: int = 0) -> List[AgentStats]:
+        rows = self._conn().execute(
+            f"SELECT {_STATS_COLUMNS} FROM agent_stats ORDER BY avg_score DESC LIMIT ? OFFSET ?", (limit, offset)
+        ).fetchall()
+        return [_to_stats(row) for row in rows]
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM agent_stats").fetchone()[0]
+
+def _to_stats(row) -> AgentStats:
+    agent_id, tasks_completed, success_rate, avg_score, disputes = row
+    return AgentStats(
+        agent_id=agent_id,
+        tasks_completed=tasks_completed,
+        success_rate=success_rate,
+        avg_score=avg_score,
+        disputes=disputes,
+    )
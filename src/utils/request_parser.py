@@ -0,0 +1,115 @@
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# "Label: value" lines of templated request forms
+_FIELD = re.compile(r"^\s*(task|title|description|budget|price|deadline|due|timeline|skills?|required skills|tags)\s*[:=]\s*(.*)$", re.IGNORECASE)
+_CRITERIA_HEADING = re.compile(r"^\s*(acceptance criteria|acceptance tests|criteria|requirements|must)\s*:?\s*$", re.IGNORECASE)
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+(.+)$")
+_MONEY = re.compile(r"\$\s*(\d[\d,]*(?:\.\d+)?)\s*(k\b)?|(\d[\d,]*(?:\.\d+)?)\s*(k\b)?\s*(?:usd|dollars)\b", re.IGNORECASE)
+_DURATION = re.compile(r"\b(\d+)\s*(hours?|hrs?|days?|weeks?|months?)\b", re.IGNORECASE)
+_DATE = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+_RELATIVE = re.compile(r"\b(today|tomorrow|end of (?:day|week|month)|next (?:week|month))\b", re.IGNORECASE)
+
+@dataclass
+class ParsedRequest:
+    """Fields that could be read off a request without an LLM; None/empty when unsure."""
+    description: Optional[str] = None
+    budget: Optional[float] = None
+    deadline: Optional[str] = None
+    acceptance_criteria: List[str] = field(default_factory=list)
+    required_skills: List[str] = field(default_factory=list)
+
+    @property
+    def missing(self) -> List[str]:
+        return [name for name, value in (
+            ("description", self.description),
+            ("budget", self.budget),
+            ("deadline", self.deadline),
+            ("acceptance_criteria", self.acceptance_criteria),
+        ) if not value]
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+def _money(text: str) -> List[float]:
+    amounts = []
+    for m in _MONEY.finditer(text):
+        number, k = (m.group(1), m.group(2)) if m.group(1) else (m.group(3), m.group(4))
+        amounts.append(float(number.replace(",", "")) * (1000 if k else 1))
+    return amounts
+
+def _deadline(text: str) -> Optional[str]:
+    for pattern in (_DATE, _DURATION, _RELATIVE):
+        m = pattern.search(text)
+        if m:
+            return m.group(0).strip()
+    return None
+
+_DAYS_PER_UNIT = {"hour": 1 / 24, "hr": 1 / 24, "day": 1, "week": 7, "month": 30}
+
+def deadline_days(deadline: str) -> Optional[float]:
+    """Length of a relative deadline such as "3 days" or "2 weeks", in days."""
+    m = _DURATION.search(deadline or "")
+    if not m:
+        return None
+    unit = m.group(2).lower().rstrip("s")
+    return int(m.group(1)) * _DAYS_PER_UNIT.get(unit, 1)
+
+def parse_request(text: str) -> ParsedRequest:
+    """
+    Rule-based extraction for templated requests ("Budget: $150", "Deadline: 5 days",
+    bullet-listed criteria under an "Acceptance criteria:" heading). Bullets outside
+    such a section are part of the description ("Write a script that: - reads X").
+    Ambiguous fields (e.g. two different dollar amounts and
+    no "Budget:" label) are left empty for the LLM to fill in. The deadline is only
+    taken from a labelled line: durations in prose ("logs older than 30 days",
+    "a 7 day itinerary") are as often part of the task as the time allowed for it.
+    """
+    parsed = ParsedRequest()
+    labelled_budget = labelled_deadline = None
+    free_text: List[str] = []
+    bullets: List[str] = []
+    in_criteria = False
+
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        if _CRITERIA_HEADING.match(line):
+            in_criteria = True
+            continue
+        bullet = _BULLET.match(line)
+        if bullet:
+            (bullets if in_criteria else free_text).append(bullet.group(1).strip())
+            continue
+        # Any other line closes the criteria section
+        in_criteria = False
+        m = _FIELD.match(line)
+        if m:
+            label, value = m.group(1).lower(), m.group(2).strip()
+            if label in ("task", "title", "description"):
+                parsed.description = value or None
+            elif label in ("budget", "price"):
+                amounts = _money(value) or _money(f"${value}")
+                labelled_budget = amounts[0] if amounts else None
+            elif label in ("deadline", "due", "timeline"):
+                labelled_deadline = _deadline(value) or value or None
+            else:
+                parsed.required_skills = [s.strip().lower() for s in re.split(r"[,;/]", value) if s.strip()]
+            continue
+        free_text.append(line.strip())
+
+    prose = " ".join(free_text)
+    if labelled_budget is not None:
+        parsed.budget = labelled_budget
+    else:
+        amounts = set(_money(prose))
+        if len(amounts) == 1:
+            parsed.budget = amounts.pop()
+    parsed.deadline = labelled_deadline
+
+    if prose:
+        parsed.description = f"{parsed.description} {prose}" if parsed.description else prose
+    parsed.acceptance_criteria = bullets
+    return parsed
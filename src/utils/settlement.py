@@ -0,0 +1,116 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+from src.utils.ledger import Ledger
+from src.utils.reputation_db import ReputationDB
+
+# (contract_id, recipient_id, agent_id, success, score, outcome_id); see SettlementQueue.submit
+Outcome = Tuple[Optional[str], Optional[str], Optional[str], bool, float, Optional[str]]
+
+class ReputationUpdateError(Exception):
+    """
+    Raised from an outcome's Future when its payout or refund was committed but the
+    reputation update was not; settled is what the Future would have resolved to.
+    """
+    def __init__(self, settled: Optional[bool], cause: BaseException):
+        super().__init__(f"reputation update failed: {cause}")
+        self.settled = settled
+        self.__cause__ = cause
+
+class SettlementQueue:
+    """
+    Group commit for transaction outcomes. submit() queues one outcome and returns
+    a Future; a flusher thread waits up to `window` seconds after picking up the
+    first queued outcome (or until max_batch are queued), then settles the whole
+    batch with one Ledger.settle_many and one ReputationDB.update_many. Outcomes
+    submitted while a batch is being written go into the next one, so concurrent
+    transactions share writes even with window=0. The thread exits when the queue
+    runs dry.
+
+    The two stores commit separately. A failed reputation write is retried up to
+    REPUTATION_RETRIES times (update_many is all or nothing); if it still fails,
+    outcomes with an agent get a ReputationUpdateError carrying their ledger result.
+    """
+    REPUTATION_RETRIES = 2
+    REPUTATION_BACKOFF_S = 0.05
+
+    def __init__(self, ledger: Ledger, rep_db: ReputationDB, window: float = 0.0, max_batch: int = 256):
+        self.ledger = ledger
+        self.rep_db = rep_db
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0          # writes made, for monitoring
+        self.outcomes = 0
+        self._pending: List[Tuple[Outcome, Future]] = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, contract_id: Optional[str], recipient_id: Optional[str], agent_id: Optional[str],
+               success: bool, score: float, outcome_id: Optional[str] = None) -> Future:
+        """
+        Queues one outcome. recipient_id None refunds the contract, contract_id None
+        skips the ledger and agent_id None skips the reputation update. With an
+        outcome_id the reputation update is applied at most once (see
+        ReputationDB.update_many). The Future resolves to whether the contract was
+        still locked (None without a contract).
+        """
+        future = Future()
+        with self._cond:
+            self._pending.append(((contract_id, recipient_id, agent_id, success, score, outcome_id), future))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._flusher, name="settlement", daemon=True)
+                self._thread.start()
+            elif len(self._pending) >= self.max_batch:
+                self._cond.notify()
+        return future
+
+    def _flusher(self):
+        while True:
+            with self._cond:
+                if not self._pending:
+                    self._thread = None
+                    return
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+            self._apply(batch)
+
+    def _update_reputation(self, rows: List[Tuple[str, bool, float, Optional[str]]]) -> Optional[Exception]:
+        """Writes rows, retrying with backoff; returns the last error if every attempt failed."""
+        for attempt in range(self.REPUTATION_RETRIES + 1):
+            try:
+                self.rep_db.update_many(rows)
+                return None
+            except Exception as e:
+                error = e
+                if attempt < self.REPUTATION_RETRIES:
+                    time.sleep(self.REPUTATION_BACKOFF_S * 2 ** attempt)
+        return error
+
+    def _apply(self, batch: List[Tuple[Outcome, Future]]):
+        outcomes = [outcome for outcome, _ in batch]
+        try:
+            settled = iter(self.ledger.settle_many([(c, r) for c, r, _, _, _, _ in outcomes if c is not None]))
+        except BaseException as e:
+            # Nothing was written
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        results = [next(settled) if contract_id is not None else None for contract_id, _, _, _, _, _ in outcomes]
+
+        # The ledger batch is committed whatever happens here; resuming a transaction
+        # whose reputation update failed finds its contract settled
+        error = self._update_reputation([(a, s, score, oid) for _, _, a, s, score, oid in outcomes if a is not None])
+        self.batches += 1
+        self.outcomes += len(batch)
+        for (outcome, future), result in zip(batch, results):
+            if error is not None and outcome[2] is not None:
+                future.set_exception(ReputationUpdateError(result, error))
+            else:
+                future.set_result(result)
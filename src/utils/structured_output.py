@@ -0,0 +1,110 @@
+import ast
+import json
+import re
+from typing import Any, Optional, Tuple, Type
+from pydantic import BaseModel, ValidationError
+
+_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_CLOSERS = {"{": "}", "[": "]"}
+
+class StructuredOutputError(ValueError):
+    """An agent's reply could not be turned into its output_schema, even after retries."""
+    def __init__(self, agent: str, model_id: str, attempts: int, error: str):
+        super().__init__(f"{agent} ({model_id}) returned no valid structured output after {attempts} attempt(s): {error}")
+        self.agent = agent
+        self.model_id = model_id
+        self.attempts = attempts
+        self.error = error
+
+def _balance(text: str) -> str:
+    """Cuts text after its first complete JSON object, or closes what is left open."""
+    stack = []
+    in_string = escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+        elif stack and ch == stack[-1]:
+            stack.pop()
+            if not stack:
+                return text[:i + 1]
+    # Truncated reply (e.g. max tokens hit mid-object)
+    return text + ('"' if in_string else "") + "".join(reversed(stack))
+
+def repair_json(text: str) -> Optional[Any]:
+    """
+    Cheap local fixes for the usual ways models break JSON: markdown fences, prose
+    around the object, trailing commas, Python literals/single quotes and
+    truncation. Returns the parsed value, or None if nothing worked.
+    """
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start = text.find("{")
+    if start < 0:
+        return None
+    candidate = _TRAILING_COMMA.sub(r"\1", _balance(text[start:]))
+    try:
+        return json.loads(candidate)
+    except ValueError:
+        pass
+    try:
+        # {'a': True, 'b': None}
+        value = ast.literal_eval(candidate)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
+    return value if isinstance(value, dict) else None
+
+def _validate(schema: Type[BaseModel], value: Any) -> Tuple[Optional[BaseModel], Optional[str]]:
+    try:
+        return schema.model_validate(value), None
+    except ValidationError as e:
+        # Some models wrap the object: {"TaskSpec": {...}}
+        if isinstance(value, dict) and len(value) == 1:
+            inner = next(iter(value.values()))
+            if isinstance(inner, dict):
+                try:
+                    return schema.model_validate(inner), None
+                except ValidationError:
+                    pass
+        return None, str(e)
+
+def coerce_output(content: Any, schema: Type[BaseModel]) -> Tuple[Optional[BaseModel], Optional[str], bool]:
+    """
+    (model, None, repaired) when content can be turned into schema, else
+    (None, error, False). repaired is True when a local fix was needed.
+    """
+    if isinstance(content, schema):
+        return content, None, False
+    if isinstance(content, BaseModel):
+        content = content.model_dump()
+    if isinstance(content, dict):
+        model, error = _validate(schema, content)
+        return model, error, model is not None
+    if not isinstance(content, str) or not content.strip():
+        return None, f"expected a {schema.__name__} JSON object, got {type(content).__name__}", False
+    value = repair_json(content)
+    if value is None:
+        return None, "reply is not a JSON object", False
+    model, error = _validate(schema, value)
+    return model, error, model is not None
+
+def repair_prompt(prompt: str, schema: Type[BaseModel], reply: Any, error: str, max_reply_chars: int = 2000) -> str:
+    """The original prompt plus the rejected reply and why it was rejected."""
+    reply = reply if isinstance(reply, str) else repr(reply)
+    return (
+        f"{prompt}\n\n"
+        f"Your previous reply could not be used as a {schema.__name__}:\n{error[:1000]}\n\n"
+        f"Previous reply:\n{reply[:max_reply_chars]}\n\n"
+        f"Reply again with only a valid {schema.__name__} JSON object with the fields: "
+        f"{', '.join(schema.model_fields)}."
+    )
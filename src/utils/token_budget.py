@@ -0,0 +1,154 @@
+import re
+from typing import Dict, Iterable, List, Optional
+from src.utils.metrics import record_prompt
+
+# Rough size for budgeting without a tokenizer; Llama-family models average a
+# little under four characters per token on English prose and code
+CHARS_PER_TOKEN = 4
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def _segments(text: str) -> List[str]:
+    """Lines, or sentences when the text is one long line."""
+    lines = text.split("\n")
+    if len(lines) == 1:
+        return _SENTENCE.split(text)
+    return lines
+
+def _omitted(n: int) -> str:
+    return f"[... {n} line{'s' if n != 1 else ''} omitted ...]"
+
+def dedupe_sentences(text: str) -> str:
+    """
+    Drops sentences repeated verbatim (ignoring case and spacing), e.g. a spec
+    pasted twice. The whitespace between the kept sentences is left as written.
+    """
+    # [sentence, separator, sentence, separator, ...]
+    parts = re.split(f"({_SENTENCE.pattern})", text.strip())
+    seen = set()
+    kept = [parts[0]]
+    seen.add(" ".join(parts[0].lower().split()))
+    carried = ""
+    for sep, sentence in zip(parts[1::2], parts[2::2]):
+        key = " ".join(sentence.lower().split())
+        if key and key in seen:
+            # Keep a line or paragraph break that sat before the dropped sentence
+            if sep.count("\n") > carried.count("\n"):
+                carried = sep
+            continue
+        seen.add(key)
+        kept.append(carried if carried.count("\n") > sep.count("\n") else sep)
+        kept.append(sentence)
+        carried = ""
+    # Untouched formatting when nothing repeats
+    return "".join(kept) if len(kept) < len(parts) else text
+
+def trim_extractive(text: str, max_tokens: int, keep: Iterable[str] = ()) -> str:
+    """
+    Cuts text to about max_tokens by whole lines (sentences for single-line text).
+    The opening and closing lines and every line mentioning one of the keep terms
+    are taken first, then the rest from the top; gaps are marked in place.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    segments = _segments(text)
+    sep = "\n" if "\n" in text else " "
+    if len(segments) == 1:
+        half = max_chars // 2
+        return f"{text[:half]}\n{_omitted(1)}\n{text[-half:]}"
+
+    terms = [t.lower() for t in keep if t]
+    priority = [0, len(segments) - 1]
+    priority += [i for i, s in enumerate(segments) if terms and any(t in s.lower() for t in terms)]
+    priority += range(len(segments))
+
+    chosen = set()
+    used = 0
+    for i in priority:
+        if i in chosen:
+            continue
+        # Room for the segment plus a gap marker
+        cost = len(segments[i]) + len(sep) + 30
+        if used + cost > max_chars:
+            continue
+        chosen.add(i)
+        used += cost
+
+    out = []
+    gap = 0
+    for i, segment in enumerate(segments):
+        if i in chosen:
+            if gap:
+                out.append(_omitted(gap))
+                gap = 0
+            out.append(segment)
+        else:
+            gap += 1
+    if gap:
+        out.append(_omitted(gap))
+    return sep.join(out)
+
+def split_chunks(text: str, max_tokens: int) -> List[str]:
+    """Consecutive chunks of about max_tokens, cut at line boundaries where possible."""
+    max_chars = max(max_tokens * CHARS_PER_TOKEN, 1)
+    chunks: List[str] = []
+    current = ""
+    for line in text.split("\n"):
+        while len(line) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:max_chars])
+            line = line[max_chars:]
+        if current and len(current) + 1 + len(line) > max_chars:
+            chunks.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks
+
+class TokenBudget:
+    """
+    Prompt-size limits per model-router role, in estimated tokens. fit() shrinks
+    the variable part of a prompt (task description, work output) to what is left
+    after the fixed part, and records the tokens it removed on the active stage.
+    Roles without a limit are never compacted.
+    """
+    DEFAULT_LIMITS = {"validator": 3000, "contract": 1000, "worker": 1000}
+    # Never squeeze the variable part below this, however large the fixed part is
+    MIN_TOKENS = 256
+
+    def __init__(self, limits: Optional[Dict[str, Optional[int]]] = None):
+        self.limits = dict(self.DEFAULT_LIMITS)
+        self.limits.update(limits or {})
+
+    def available(self, role: str, reserved: str = "") -> Optional[int]:
+        """Tokens left for variable text after the fixed prompt text reserved (None: unlimited)."""
+        limit = self.limits.get(role)
+        if limit is None:
+            return None
+        return max(limit - estimate_tokens(reserved), self.MIN_TOKENS)
+
+    def fit(self, role: str, text: str, reserved: str = "", keep: Iterable[str] = ()) -> str:
+        available = self.available(role, reserved)
+        if available is None or estimate_tokens(text) <= available:
+            return text
+        compacted = trim_extractive(text, available, keep)
+        record_prompt(0, saved=estimate_tokens(text) - estimate_tokens(compacted))
+        return compacted
+
+_default_budget = TokenBudget()
+
+def get_default_budget() -> TokenBudget:
+    return _default_budget
+
+def set_default_budget(budget: TokenBudget):
+    """Limits used by agents created afterwards."""
+    global _default_budget
+    _default_budget = budget
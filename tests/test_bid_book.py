@@ -0,0 +1,62 @@
+import sys
+import os
+import tempfile
+import unittest
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.agents.negotiator import NegotiatorAgent
+from src.models.bid_book import BidBook
+from src.models.schemas import Bid
+from src.utils.reputation_db import ReputationDB
+
+def _bid(i, price, confidence):
+    return Bid(bid_id=f"b{i}", task_id="t1", agent_id=f"w{i}", price=price, timeline="2 days", confidence=confidence, plan=f"plan {i}")
+
+class TestBidBook(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.negotiator = NegotiatorAgent(rep_db=ReputationDB(os.path.join(self.tmp.name, "rep.sqlite3"), legacy_path=None))
+
+    def test_rows_match_model_dump_and_round_trip(self):
+        bids = [_bid(0, 40.0, 0.9), _bid(1, 30.0, 0.5)]
+        book = BidBook.from_bids(bids)
+        self.assertEqual(book.rows(), [b.model_dump() for b in bids])
+        self.assertIs(book.bid(1), bids[1])
+
+        restored = BidBook.from_rows(book.rows())
+        self.assertEqual(restored.task_id, "t1")
+        self.assertEqual([b.model_dump() for b in restored], book.rows())
+
+    def test_task_id_is_a_column(self):
+        book = BidBook()
+        book.add_row(_bid(0, 40.0, 0.9).model_dump())
+        book.append(_bid(1, 30.0, 0.5).model_copy(update={"task_id": "t2"}))
+        book.add("w2", 20.0, "1 day", 0.7, "plan")
+        self.assertEqual(book.task_id, "t1")
+        self.assertEqual([r["task_id"] for r in book.rows()], ["t1", "t2", "t1"])
+        self.assertEqual([b.task_id for b in book], ["t1", "t2", "t1"])
+
+    def test_rows_are_materialized_lazily(self):
+        book = BidBook("t1")
+        for i in range(1000):
+            book.add(f"w{i}", 10.0 + i % 50, "1 day", (i % 10) / 10, "plan")
+        scored = self.negotiator.score_bids(book, 40.0)
+        self.assertEqual(len(scored.display()), 1000)
+        self.assertTrue(all(m is None for m in book._models))
+
+        _, best = scored.best()
+        self.assertIsInstance(best, Bid)
+        self.assertEqual(sum(m is not None for m in book._models), 1)
+
+    def test_book_and_list_score_the_same(self):
+        bids = [_bid(i, 20.0 + 7 * i, 0.3 + 0.1 * i) for i in range(5)]
+        from_list = self.negotiator.score_bids(bids, 45.0)
+        from_book = self.negotiator.score_bids(BidBook.from_bids(bids), 45.0)
+        self.assertEqual(from_list.scores.tolist(), from_book.scores.tolist())
+        self.assertEqual([b.bid_id for b in from_list.bids], [b.bid_id for b in from_book.bids])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import sys
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+from bench.fake_model import install_fake_model, uninstall_fake_model
+from src.agents.worker import WorkerAgent, PlanWriterAgent, heuristic_terms, price_band_from_persona
+from src.models.schemas import Bid, TaskSpec
+from src.orchestration import MarketSimulation
+
+def make_task(criteria=1, deadline="10 days"):
+    return TaskSpec(task_id="t1", description="Write a parser", acceptance_criteria=["c"] * criteria,
+                    budget=100.0, deadline=deadline)
+
+class TestHeuristicTerms(unittest.TestCase):
+    def test_price_stays_in_band_and_follows_reputation(self):
+        low_rep, _, low_conf = heuristic_terms(make_task(), (0.5, 0.7), 0)
+        high_rep, _, high_conf = heuristic_terms(make_task(), (0.5, 0.7), 100)
+        self.assertTrue(50 <= low_rep < high_rep <= 70)
+        self.assertLess(low_conf, high_conf)
+
+    def test_premium_band_takes_longer(self):
+        _, cheap, _ = heuristic_terms(make_task(), (0.5, 0.7), 50)
+        _, premium, _ = heuristic_terms(make_task(), (0.9, 1.1), 50)
+        self.assertLess(int(cheap.split()[0]), int(premium.split()[0]))
+
+    def test_price_band_from_persona(self):
+        self.assertEqual(price_band_from_persona("You charge 90-110% of budget."), (0.9, 1.1))
+
+class TestBidStrategies(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        install_fake_model()
+
+    def tearDown(self):
+        uninstall_fake_model()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_heuristic_bid_skips_llm(self):
+        worker = WorkerAgent("w1", "You charge 50-70% of budget.", bid_strategy="heuristic")
+        bid = worker.generate_bid(make_task(), reputation=80)
+        self.assertEqual((bid.agent_id, bid.task_id), ("w1", "t1"))
+        self.assertTrue(50 <= bid.price <= 70)
+        self.assertIsNone(worker._agent)
+
+    def test_hybrid_bid_asks_llm_for_plan_only(self):
+        worker = WorkerAgent("w1", "You charge 50-70% of budget.", bid_strategy="hybrid", use_cache=False)
+        bid = worker.generate_bid(make_task())
+        self.assertIsNone(worker._agent)
+        self.assertIsNotNone(PlanWriterAgent.shared(model_id=worker.model_id, host=None)._agent)
+        self.assertTrue(bid.plan)
+
+    def test_unknown_strategy_rejected(self):
+        with self.assertRaises(ValueError):
+            WorkerAgent("w1", "p", bid_strategy="guess")
+
+    def test_per_request_override(self):
+        sim = MarketSimulation()
+        events = list(sim.run_stream("Write a haiku. Budget $40.", bid_strategy="heuristic"))
+        bids = [e for e in events if e["step"] == "WORKERS" and e["status"] == "bid"]
+        self.assertEqual(len(bids), 3)
+        self.assertTrue(all(e["metrics"]["llm_calls"] == 0 for e in bids))
+
+    def test_heuristic_bids_are_collected_as_columns(self):
+        sim = MarketSimulation()
+        task = make_task()
+        built = []
+        construct = Bid.model_construct
+
+        def _count(**fields):
+            built.append(fields["agent_id"])
+            return construct(**fields)
+
+        with mock.patch.object(Bid, "model_construct", side_effect=_count):
+            gen = sim._collect_bids(task, sim.metrics.start_transaction(), "heuristic")
+            try:
+                while True:
+                    next(gen)
+            except StopIteration as stop:
+                bids = stop.value
+        self.assertEqual(len(bids), 3)
+        self.assertEqual(built, [])
+        self.assertTrue(all(m is None for m in bids._models))
+        self.assertEqual({r["task_id"] for r in bids.rows()}, {"t1"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import sys
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+from bench.fake_model import install_fake_model, uninstall_fake_model
+from src.models.schemas import TaskSpec
+from src.orchestration import MarketSimulation
+
+class _StubWorker:
+    """Bids after `delay` seconds, or raises when `fails`."""
+    def __init__(self, agent_id, delay=0.0, fails=False, release=None):
+        self.agent_id = agent_id
+        self.persona = agent_id
+        self.bid_strategy = "heuristic"
+        self.delay = delay
+        self.fails = fails
+        self.release = release
+
+    def bid_row(self, task, strategy=None, reputation=None):
+        if self.delay:
+            self.release.wait(self.delay)
+        if self.fails:
+            raise RuntimeError("model unavailable")
+        return {"bid_id": f"b-{self.agent_id}", "task_id": task.task_id, "agent_id": self.agent_id,
+                "price": 50.0, "timeline": "1 day", "confidence": 0.8, "plan": "plan"}
+
+class TestCollectBids(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        install_fake_model()
+        # Lets the slow worker's thread finish once the test is done with it
+        self.release = threading.Event()
+        self.task = TaskSpec(task_id="t1", description="Write a parser", acceptance_criteria=["c"], budget=100.0, deadline="3 days")
+
+    def tearDown(self):
+        self.release.set()
+        uninstall_fake_model()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def _collect(self, sim, workers):
+        sim._select_workers = lambda task: (workers, {"step": "WORKERS", "status": "selected", "message": ""})
+        gen = sim._collect_bids(self.task, sim.metrics.start_transaction())
+        events = []
+        started = time.monotonic()
+        try:
+            while True:
+                events.append(next(gen))
+        except StopIteration as stop:
+            return stop.value, events, time.monotonic() - started
+
+    def _workers(self):
+        return [_StubWorker("slow", delay=5.0, release=self.release), _StubWorker("failing", fails=True), _StubWorker("fast")]
+
+    def _status(self, events, status):
+        return [e for e in events if e["step"] == "WORKERS" and e["status"] == status]
+
+    def test_slow_bid_times_out_and_failure_is_reported(self):
+        bids, events, elapsed = self._collect(MarketSimulation(bid_timeout=0.3), self._workers())
+        self.assertEqual(bids.agent_ids, ["fast"])
+        self.assertLess(elapsed, 2.0)
+        self.assertEqual(len(self._status(events, "timeout")), 1)
+        self.assertIn("slow", self._status(events, "timeout")[0]["message"])
+        errors = self._status(events, "error")
+        self.assertEqual(len(errors), 1)
+        self.assertIn("failing failed to bid: model unavailable", errors[0]["message"])
+
+    def test_deadline_drops_late_bids(self):
+        bids, events, elapsed = self._collect(MarketSimulation(bid_deadline=0.3), self._workers())
+        self.assertEqual(bids.agent_ids, ["fast"])
+        self.assertLess(elapsed, 2.0)
+        self.assertIn("1 bid(s) skipped", self._status(events, "deadline")[0]["message"])
+
+        # The slow bid lands after the deadline and is not added
+        self.release.set()
+        time.sleep(0.1)
+        self.assertEqual(len(bids), 1)
+
+    def test_quorum_returns_early(self):
+        bids, events, elapsed = self._collect(MarketSimulation(bid_quorum=1), self._workers())
+        self.assertEqual(bids.agent_ids, ["fast"])
+        self.assertLess(elapsed, 2.0)
+        self.assertEqual(len(self._status(events, "quorum")), 1)
+        self.assertEqual([e["data"]["agent_id"] for e in self._status(events, "bid")], ["fast"])
+
+if __name__ == '__main__':
+    unittest.main()
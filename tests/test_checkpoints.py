@@ -0,0 +1,79 @@
+import sys
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.checkpoints import CheckpointStore
+
+class TestCheckpointStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "checkpoints.sqlite3")
+
+    def _rows(self, table):
+        with sqlite3.connect(self.path) as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def test_final_compacts_the_transaction(self):
+        store = CheckpointStore(self.path)
+        for task_id in ("t1", "t2", "t3"):
+            store.save(task_id, "BROKER", {"task": task_id})
+            store.save(task_id, "WORKERS", {"bids": []})
+        store.save("t2", "FINAL", {"status": "success"})
+
+        self.assertEqual(store.load("t2"), {"FINAL": {"status": "success"}})
+        self.assertEqual(set(store.load("t1")), {"BROKER", "WORKERS"})
+        self.assertEqual(store.unfinished(), ["t1", "t3"])
+        self.assertEqual(self._rows("checkpoints"), 5)
+        self.assertEqual(self._rows("open_tasks"), 2)
+
+        # A late stage write does not reopen a closed transaction
+        store.save("t2", "REPUTATION", {})
+        self.assertEqual(store.unfinished(), ["t1", "t3"])
+
+        store.discard("t1")
+        self.assertEqual(store.load("t1"), {})
+        self.assertEqual(store.unfinished(), ["t3"])
+
+    def test_unfinished_idle_for_and_prune(self):
+        store = CheckpointStore(self.path)
+        now = time.time()
+        with mock.patch("src.utils.checkpoints.time.time", return_value=now - 100):
+            store.save("old", "BROKER", {})
+            store.save("closed", "FINAL", {"status": "failed"})
+        store.save("new", "BROKER", {})
+        self.assertEqual(store.unfinished(idle_for=50), ["old"])
+        self.assertEqual(store.unfinished(), ["old", "new"])
+
+        self.assertEqual(store.prune(older_than=50), 1)
+        self.assertEqual(store.load("closed"), {})
+        self.assertEqual(store.prune(older_than=50), 0)
+
+    def test_existing_store_is_migrated(self):
+        # A store written before open_tasks existed
+        with sqlite3.connect(self.path) as conn:
+            conn.execute("""
+                CREATE TABLE checkpoints (task_id TEXT NOT NULL, stage TEXT NOT NULL, payload TEXT NOT NULL,
+                                          saved_at REAL NOT NULL, PRIMARY KEY (task_id, stage))
+            """)
+            conn.executemany("INSERT INTO checkpoints VALUES (?, ?, '{}', ?)", [
+                ("open", "BROKER", 1.0), ("open", "ESCROW", 2.0),
+                ("done", "BROKER", 1.5), ("done", "FINAL", 3.0),
+            ])
+        store = CheckpointStore(self.path)
+        self.assertEqual(store.unfinished(), ["open"])
+        self.assertEqual(set(store.load("done")), {"FINAL"})
+        self.assertEqual(set(store.load("open")), {"BROKER", "ESCROW"})
+        # Reopening does not migrate again
+        CheckpointStore(self.path).save("open", "FINAL", {"status": "success"})
+        self.assertEqual(store.unfinished(), [])
+
+if __name__ == '__main__':
+    unittest.main()
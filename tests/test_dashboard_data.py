@@ -0,0 +1,98 @@
+import sys
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.dashboard_data import DashboardData, page_count
+from src.utils.ledger import JsonFileLedgerStorage, Ledger, SqliteLedgerStorage, WalLedgerStorage
+from src.utils.reputation_db import ReputationDB
+
+class TestDashboardData(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.rep_db = ReputationDB(os.path.join(self.tmp.name, "rep.sqlite3"), legacy_path=None)
+
+    def _path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def _wal_ledger(self):
+        return Ledger(WalLedgerStorage(self._path("ledger.wal"), self._path("ledger.snapshot.json"), legacy_path=None))
+
+    def test_refresh_reads_only_new_ops(self):
+        for ledger in (self._wal_ledger(), Ledger(SqliteLedgerStorage(self._path("ledger.sqlite3")))):
+            data = DashboardData(ledger, self.rep_db)
+            ledger.lock_funds("c1", 50.0, "t1")
+            ledger.lock_funds("c2", 70.0, "t2")
+            self.assertEqual(data.refresh(), 2)
+            self.assertEqual(set(data.locked_funds), {"c1", "c2"})
+
+            # A second writer (e.g. the simulation) shows up as a delta
+            ledger.release_funds("c1", "worker_a")
+            self.assertEqual(data.refresh(), 1)
+            self.assertEqual(set(data.locked_funds), {"c2"})
+            self.assertEqual([e["status"] for e in data.history], ["RELEASED"])
+            self.assertEqual(data.refresh(), 0)
+
+    def test_follows_wal_rotation(self):
+        ledger = Ledger(WalLedgerStorage(self._path("ledger.wal"), self._path("ledger.snapshot.json"),
+                                         legacy_path=None, compact_every=5))
+        data = DashboardData(ledger, self.rep_db)
+        for i in range(30):
+            ledger.lock_funds(f"c{i}", float(i), f"t{i}")
+            if i % 3 == 0:
+                ledger.refund_funds(f"c{i}")
+            # Falls a few segments behind now and then
+            if i % 7 == 0:
+                data.refresh()
+        data.refresh()
+        self.assertEqual(data.locked_funds, ledger.locked())
+        self.assertEqual(data.history, list(ledger.history()))
+
+    def test_pages_are_newest_first(self):
+        ledger = self._wal_ledger()
+        for i in range(45):
+            ledger.lock_funds(f"c{i}", float(i), f"t{i}")
+        for i in range(25):
+            ledger.refund_funds(f"c{i}")
+        data = DashboardData(ledger, self.rep_db)
+        data.refresh()
+        self.assertEqual([cid for cid, _ in data.locked_page(0)], [f"c{i}" for i in range(44, 24, -1)])
+        self.assertEqual(data.locked_page(1), [])
+        self.assertEqual([e["amount"] for e in data.history_page(0)], [float(i) for i in range(24, 4, -1)])
+        self.assertEqual([e["amount"] for e in data.history_page(1)], [4.0, 3.0, 2.0, 1.0, 0.0])
+        self.assertEqual(page_count(45), 3)
+        self.assertEqual(page_count(0), 1)
+
+    def test_leaderboard_cached_until_database_changes(self):
+        self.rep_db.load_counters([(f"w{i}", 10, i, i * 10.0) for i in range(30)])
+        data = DashboardData(self._wal_ledger(), self.rep_db)
+        with mock.patch.object(self.rep_db, "leaderboard", wraps=self.rep_db.leaderboard) as leaderboard:
+            first = data.leaderboard_page(0)
+            self.assertEqual(first[0].agent_id, "w29")
+            self.assertEqual([s.agent_id for s in data.leaderboard_page(1)][-1], "w0")
+            data.leaderboard_page(0)
+            self.assertEqual(leaderboard.call_count, 2)
+            self.assertEqual(data.agent_count(), 30)
+
+            # Another connection writes, as the simulation process would
+            ReputationDB(self.rep_db.path, legacy_path=None).update_stats("w0", True, 100)
+            data.leaderboard_page(0)
+            self.assertEqual(leaderboard.call_count, 3)
+
+    def test_legacy_storage_is_reread(self):
+        ledger = Ledger(JsonFileLedgerStorage(self._path("ledger.json")))
+        ledger.lock_funds("c1", 50.0, "t1")
+        ledger.refund_funds("c1")
+        ledger.lock_funds("c2", 70.0, "t2")
+        data = DashboardData(ledger, self.rep_db)
+        data.refresh()
+        self.assertEqual(set(data.locked_funds), {"c2"})
+        self.assertEqual(len(data.history), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import sys
+import os
+import json
+import tempfile
+import unittest
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+from bench.fake_model import install_fake_model, uninstall_fake_model
+from src.orchestration import MarketSimulation
+from src.utils.event_store import EventStore
+from src.utils.ledger import Ledger, WalLedgerStorage
+from src.utils.reputation_db import ReputationDB
+
+def _lock(contract_id, amount, task_id):
+    return {"step": "ESCROW", "status": "done", "message": "locked",
+            "data": {"contract_id": contract_id, "amount": amount, "task_id": task_id}}
+
+class TestEventStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.dir = os.path.join(self.tmp.name, "events")
+
+    def _store(self, **kwargs):
+        store = EventStore(self.dir, **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def test_views_survive_restart_with_snapshot_and_torn_tail(self):
+        store = self._store(snapshot_every=3, segment_bytes=200)
+        store.append("tx1", _lock("c1", 50.0, "t1"), task_id="t1")
+        store.append("tx2", _lock("c2", 70.0, "t2"), task_id="t2")
+        store.append("tx1", {"step": "ESCROW", "status": "release", "message": "ok", "data": {"contract_id": "c1"}}, task_id="t1")
+        store.append("tx1", {"step": "REPUTATION", "status": "update", "message": "up",
+                             "data": {"agent_id": "w1", "success": True, "score": 90}}, task_id="t1")
+        store.append("tx1", {"step": "FINAL", "status": "success", "message": "done"}, task_id="t1")
+        store.append("tx1", {"step": "EXECUTOR", "status": "partial", "message": "...", "data": {"chunk": "x"}})
+        store.close()
+
+        segments = sorted(n for n in os.listdir(self.dir) if n.startswith("segment-"))
+        self.assertGreater(len(segments), 1)
+        self.assertTrue(any(n.startswith("snapshot-") for n in os.listdir(self.dir)))
+        # Simulate a crash mid-append
+        with open(os.path.join(self.dir, segments[-1]), "ab") as f:
+            f.write(b'{"seq":6,"tx":"tx')
+
+        reloaded = self._store()
+        self.assertEqual(reloaded.seq, 5)
+        self.assertEqual(list(reloaded.ledger.locked_funds), ["c2"])
+        self.assertEqual(reloaded.ledger.totals["released"], 50.0)
+        self.assertEqual(reloaded.reputation.stats("w1").avg_score, 90)
+        self.assertEqual(reloaded.transaction("t1")["outcome"], "success")
+        self.assertEqual([r["step"] for r in reloaded.events(task_id="t1")], ["ESCROW", "ESCROW", "REPUTATION", "FINAL"])
+
+        record = reloaded.append("tx2", {"step": "ERROR", "status": "failed", "message": "boom"}, task_id="t2")
+        self.assertEqual(record["seq"], 6)
+        self.assertEqual([s["task_id"] for s in reloaded.query(outcome="error")], ["t2"])
+
+    def test_transaction_summaries_live_in_sqlite_not_snapshots(self):
+        store = self._store(snapshot_every=10)
+        for i in range(30):
+            store.append(f"tx{i}", {"step": "NEGOTIATOR", "status": "done", "message": "",
+                                    "data": {"agent_id": f"w{i % 3}", "price": float(i)}}, task_id=f"t{i}")
+            store.append(f"tx{i}", {"step": "FINAL", "status": "success" if i % 2 else "failed", "message": ""}, task_id=f"t{i}")
+        snapshots = sorted(n for n in os.listdir(self.dir) if n.startswith("snapshot-"))
+        with open(os.path.join(self.dir, snapshots[-1])) as f:
+            self.assertEqual(set(json.load(f)["views"]), {"ledger", "reputation"})
+        self.assertEqual(len(store.query(outcome="failed", worker="w0")), 5)
+        self.assertEqual([s["task_id"] for s in store.query(worker="w1", limit=2)], ["t1", "t4"])
+        self.assertEqual(store.transaction("t7")["price"], 7.0)
+        store.close()
+
+        # A second instance on the same directory does not index records twice
+        other = self._store()
+        other.append("tx30", {"step": "FINAL", "status": "success", "message": ""}, task_id="t30")
+        other.close()
+
+        # A lost table is rebuilt from the log on open
+        os.remove(os.path.join(self.dir, "transactions.sqlite3"))
+        reloaded = self._store()
+        self.assertEqual(reloaded.transactions.seq, 61)
+        self.assertEqual(len(reloaded.query()), 31)
+        self.assertEqual(reloaded.transaction("t7"), {"tx": "tx7", "task_id": "t7", "first_seq": 15, "last_seq": 16,
+                                                      "step": "FINAL", "outcome": "success", "worker": "w1", "price": 7.0})
+        self.assertEqual([r["step"] for r in reloaded.events(tx="tx7")], ["NEGOTIATOR", "FINAL"])
+
+    def test_rebuild_ledger_and_reputation(self):
+        store = self._store()
+        store.append("tx1", _lock("c1", 50.0, "t1"))
+        store.append("tx1", {"step": "REPUTATION", "status": "update", "message": "",
+                             "data": {"agent_id": "w1", "success": False, "score": 30}})
+        store.append("tx2", {"step": "REPUTATION", "status": "update", "message": "",
+                             "data": {"agent_id": "w1", "success": True, "score": 90}})
+
+        ledger = Ledger(WalLedgerStorage(os.path.join(self.tmp.name, "l.wal"), os.path.join(self.tmp.name, "l.snap.json"), legacy_path=None))
+        ledger.lock_funds("stray", 5.0, "t9")
+        self.assertEqual(store.rebuild_ledger(ledger), ["stray"])
+        self.assertEqual(ledger.data["locked_funds"]["c1"]["amount"], 50.0)
+
+        db = ReputationDB(os.path.join(self.tmp.name, "rep.sqlite3"), legacy_path=None)
+        db.update_stats("w1", True, 10)
+        store.rebuild_reputation(db)
+        stats = db.get_stats("w1")
+        self.assertEqual(stats.tasks_completed, 2)
+        self.assertAlmostEqual(stats.success_rate, 0.5)
+        self.assertAlmostEqual(stats.avg_score, 60.0)
+
+class TestEventSourcedSimulation(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        install_fake_model(pass_rate=1.0)
+
+    def tearDown(self):
+        uninstall_fake_model()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_run_stream_is_recorded(self):
+        store = EventStore()
+        sim = MarketSimulation(event_store=store, stream_execution=True)
+        events = list(sim.run_stream("Write a very short poem about coding. Budget $40."))
+        task_id = events[1]["data"]["task_id"]
+        store.close()
+
+        reloaded = EventStore()
+        stored = reloaded.events(task_id=task_id)
+        self.assertEqual(len(stored), len([e for e in events if e["status"] != "partial"]))
+        self.assertEqual(stored[-1]["step"], "FINAL")
+        summary = reloaded.transaction(task_id)
+        self.assertEqual(summary["outcome"], "success")
+        self.assertEqual(reloaded.ledger.locked_funds, {})
+        self.assertEqual(reloaded.reputation.stats(summary["worker"]).tasks_completed, 1)
+        reloaded.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import sys
+import os
+import unittest
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.agents.validator import IncrementalValidator
+from src.models.schemas import Contract
+
+def make_contract(tests=None):
+    return Contract(
+        contract_id="c1", task_id="t1", selected_worker="w1",
+        deliverables=["Implementation"], tests=tests or ["Runs without errors"],
+        payment=10.0, penalty_rules=[],
+    )
+
+class TestIncrementalValidator(unittest.TestCase):
+    def test_clean_output_passes(self):
+        checker = IncrementalValidator(make_contract())
+        for chunk in ["def add(a, b):\n", "    return a + b\n", "print(add(1, 2))\n"]:
+            self.assertIsNone(checker.feed(chunk))
+        self.assertIsNone(checker.finish())
+        self.assertEqual(checker.output, "def add(a, b):\n    return a + b\nprint(add(1, 2))\n")
+
+    def test_refusal_fails_early(self):
+        checker = IncrementalValidator(make_contract())
+        self.assertIsNotNone(checker.feed("I'm sorry, but I can't help"))
+        failure = checker.failure()
+        self.assertFalse(failure.passed)
+        self.assertEqual(failure.task_id, "t1")
+
+    def test_looping_output_fails_early(self):
+        checker = IncrementalValidator(make_contract(), repeat_limit=3)
+        issues = [checker.feed("the same line again\n") for _ in range(5)]
+        self.assertEqual(issues[:3], [None, None, None])
+        self.assertIn("looping", issues[3])
+
+    def test_repetition_split_across_chunks(self):
+        checker = IncrementalValidator(make_contract(), repeat_limit=2)
+        self.assertIsNone(checker.feed("the same li"))
+        self.assertIsNone(checker.feed("ne again\nthe same line again\nthe same"))
+        self.assertIsNotNone(checker.feed(" line again\n"))
+
+    def test_length_limit(self):
+        checker = IncrementalValidator(make_contract(), max_chars=10)
+        self.assertIsNone(checker.feed("12345"))
+        self.assertIsNotNone(checker.feed("678901"))
+
+    def test_required_terms_checked_at_finish(self):
+        checker = IncrementalValidator(make_contract(["`is_prime` returns True for 7"]))
+        checker.feed("def check(n):\n    return n > 1\n")
+        self.assertIn("is_prime", checker.finish())
+
+        checker = IncrementalValidator(make_contract(["`is_prime` returns True for 7"]))
+        checker.feed("def is_prime(n):\n    ...\n")
+        self.assertIsNone(checker.finish())
+
+    def test_empty_output_fails(self):
+        self.assertIsNotNone(IncrementalValidator(make_contract()).finish())
+
+if __name__ == '__main__':
+    unittest.main()
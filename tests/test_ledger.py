@@ -0,0 +1,148 @@
+import sys
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.ledger import Ledger, WalLedgerStorage, apply_op
+
+class TestWalLedger(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _storage(self, **kwargs):
+        return WalLedgerStorage(
+            wal_path=os.path.join(self.tmp.name, "ledger.wal"),
+            snapshot_path=os.path.join(self.tmp.name, "ledger.snapshot.json"),
+            legacy_path=os.path.join(self.tmp.name, "ledger.json"),
+            **kwargs,
+        )
+
+    def test_replay_after_restart(self):
+        ledger = Ledger(self._storage())
+        ledger.lock_funds("c1", 50.0, "t1")
+        ledger.lock_funds("c2", 70.0, "t2")
+        self.assertTrue(ledger.release_funds("c1", "worker_a"))
+        self.assertFalse(ledger.refund_funds("c1"))
+        ledger.flush()
+
+        reloaded = Ledger(self._storage())
+        self.assertEqual(list(reloaded.data["locked_funds"]), ["c2"])
+        history = list(reloaded.history())
+        self.assertEqual(history[0]["status"], "RELEASED")
+        self.assertEqual(history[0]["recipient"], "worker_a")
+
+    def test_compaction_snapshot_and_torn_record(self):
+        ledger = Ledger(self._storage(compact_every=3))
+        for i in range(4):
+            ledger.lock_funds(f"c{i}", 10.0, f"t{i}")
+        ledger.refund_funds("c0")
+        ledger.flush()
+
+        with open(os.path.join(self.tmp.name, "ledger.snapshot.json")) as f:
+            self.assertEqual(len(json.load(f)["locked_funds"]), 3)
+
+        # Simulate a crash in the middle of an append
+        with open(os.path.join(self.tmp.name, "ledger.wal"), "ab") as f:
+            f.write(b'{"op":"lock","contract_id":"c9"')
+
+        reloaded = Ledger(self._storage())
+        self.assertEqual(sorted(reloaded.data["locked_funds"]), ["c1", "c2", "c3"])
+        reloaded.lock_funds("c4", 10.0, "t4")
+        self.assertIn("c4", Ledger(self._storage()).data["locked_funds"])
+
+    def test_rotation_bounds_wal_and_keeps_history(self):
+        ledger = Ledger(self._storage(compact_every=10))
+        for i in range(100):
+            ledger.lock_funds(f"c{i}", 10.0, f"t{i}")
+            self.assertTrue(ledger.release_funds(f"c{i}", "w") if i % 2 else ledger.refund_funds(f"c{i}"))
+        ledger.lock_funds("open", 5.0, "t")
+        ledger.flush()
+
+        wal_path = os.path.join(self.tmp.name, "ledger.wal")
+        with open(wal_path, "rb") as f:
+            self.assertLessEqual(len(f.readlines()), 11)   # header + less than one segment of ops
+        history = list(ledger.history())
+        self.assertEqual(len(history), 100)
+        self.assertEqual(history[1]["status"], "RELEASED")
+
+        reloaded = Ledger(self._storage())
+        self.assertEqual(list(reloaded.data["locked_funds"]), ["open"])
+        self.assertEqual(len(list(reloaded.history())), 100)
+
+    def test_followers_across_rotation(self):
+        ledger = Ledger(self._storage(compact_every=4))
+        ledger.lock_funds("c1", 10.0, "t1")
+        ops, cursor = ledger.ops_since()
+        self.assertEqual([op["op"] for op in ops], ["lock"])
+
+        # Rotated, but the reader is less than a segment behind: no reset
+        for i in range(2, 5):
+            ledger.lock_funds(f"c{i}", 10.0, f"t{i}")
+        ops, cursor = ledger.ops_since(cursor)
+        self.assertEqual([op["contract_id"] for op in ops], ["c2", "c3", "c4"])
+
+        # Behind a rotation: a reset, then enough to rebuild the state
+        ledger.refund_funds("c1")
+        for i in range(5, 12):
+            ledger.lock_funds(f"c{i}", 10.0, f"t{i}")
+        ops, cursor = ledger.ops_since(cursor)
+        self.assertEqual(ops[0]["op"], "reset")
+        locked, history = {}, []
+        for op in ops[1:]:
+            apply_op(locked, op)
+            if op["op"] in ("release", "refund"):
+                history.append(op["entry"])
+        self.assertEqual(locked, ledger.locked())
+        self.assertEqual(history, list(ledger.history()))
+        self.assertEqual(ledger.ops_since(cursor)[0], [])
+
+    def test_other_writer_follows_rotation(self):
+        a = Ledger(self._storage(compact_every=3))
+        b = Ledger(self._storage(compact_every=3))
+        for i in range(5):
+            a.lock_funds(f"c{i}", 10.0, f"t{i}")
+        self.assertTrue(b.release_funds("c4", "w"))
+        self.assertFalse(a.refund_funds("c4"))
+        self.assertEqual(sorted(b.locked()), ["c0", "c1", "c2", "c3"])
+
+    def test_interrupted_rotation_is_finished_on_load(self):
+        ledger = Ledger(self._storage(compact_every=1000))
+        ledger.lock_funds("c1", 10.0, "t1")
+        ledger.lock_funds("c2", 10.0, "t2")
+        ledger.refund_funds("c1")
+        # Crash after the archive and snapshot, before the new segment replaces the WAL
+        with mock.patch.object(WalLedgerStorage, "_start_segment", side_effect=OSError("crash")):
+            with self.assertRaises(OSError):
+                ledger.storage.compact()
+
+        reloaded = Ledger(self._storage())
+        self.assertEqual(list(reloaded.data["locked_funds"]), ["c2"])
+        self.assertEqual([e["status"] for e in reloaded.history()], ["REFUNDED"])
+        reloaded.storage.compact()
+        self.assertEqual([e["status"] for e in reloaded.history()], ["REFUNDED"])
+
+    def test_writers_see_each_other(self):
+        a = Ledger(self._storage())
+        b = Ledger(self._storage())
+        a.lock_funds("c1", 10.0, "t1")
+        self.assertTrue(b.release_funds("c1", "worker_a"))
+        self.assertFalse(a.refund_funds("c1"))
+
+    def test_legacy_import(self):
+        with open(os.path.join(self.tmp.name, "ledger.json"), "w") as f:
+            json.dump({
+                "locked_funds": {"c1": {"amount": 5.0, "task_id": "t1", "status": "LOCKED"}},
+                "history": [{"amount": 3.0, "task_id": "t0", "status": "REFUNDED"}],
+            }, f)
+        ledger = Ledger(self._storage())
+        self.assertIn("c1", ledger.data["locked_funds"])
+        self.assertEqual(len(list(ledger.history())), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import sys
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+from bench.fake_model import install_fake_model, uninstall_fake_model
+from src.agents.contract_finalizer import ContractFinalizerAgent
+from src.agents.executor import ExecutorAgent
+from src.agents.worker import WorkerAgent
+from src.models.schemas import Bid, Contract, TaskSpec
+from src.utils.llm_cache import ResponseCache
+
+def _embedder(text):
+    # Two-dimensional toy embedding: prompts about cats point one way, the rest the other
+    return [1.0, 0.0] if "cat" in text else [0.0, 1.0]
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "cache.sqlite3")
+
+    def test_lru_evicts_oldest_from_memory_only(self):
+        cache = ResponseCache(self.path, max_entries=2)
+        cache.put("ns", "a", {"content": 1})
+        cache.put("ns", "b", {"content": 2})
+        cache.get("ns", "a")                  # a is now the most recent
+        cache.put("ns", "c", {"content": 3})
+        self.assertEqual(list(cache._memory), [cache.key("ns", "a"), cache.key("ns", "c")])
+        # The disk tier still has b and promotes it back into memory
+        self.assertEqual(cache.get("ns", "b"), {"content": 2})
+        self.assertIn(cache.key("ns", "b"), cache._memory)
+
+    def test_memory_only_cache_forgets_evicted(self):
+        cache = ResponseCache(None, max_entries=1)
+        cache.put("ns", "a", {"content": 1})
+        cache.put("ns", "b", {"content": 2})
+        self.assertIsNone(cache.get("ns", "a"))
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_ttl_expiry(self):
+        cache = ResponseCache(self.path, ttl=60)
+        now = time.time()
+        with mock.patch("src.utils.llm_cache.time.time", return_value=now):
+            cache.put("ns", "a", {"content": 1})
+        with mock.patch("src.utils.llm_cache.time.time", return_value=now + 30):
+            self.assertEqual(cache.get("ns", "a"), {"content": 1})
+        with mock.patch("src.utils.llm_cache.time.time", return_value=now + 61):
+            self.assertIsNone(cache.get("ns", "a"))
+        # Expired rows are deleted from disk on read
+        self.assertIsNone(ResponseCache(self.path).get("ns", "a"))
+
+    def test_disk_tier_survives_restart_and_normalizes_whitespace(self):
+        ResponseCache(self.path).put("ns", "hello   world\n", {"content": "hi"})
+        cache = ResponseCache(self.path)
+        self.assertEqual(cache.get("ns", "hello world"), {"content": "hi"})
+        self.assertIsNone(cache.get("other", "hello world"))
+
+    def test_similarity_lookup(self):
+        cache = ResponseCache(self.path, embedder=_embedder)
+        cache.put("ns", "draw a cat", {"content": "cat"})
+        self.assertEqual(cache.get("ns", "draw a cat please"), {"content": "cat"})
+        self.assertIsNone(cache.get("ns", "draw a dog"))
+        self.assertIsNone(cache.get("other", "draw a cat please"))
+        # The vectors are reloaded from disk by a new instance
+        self.assertEqual(ResponseCache(self.path, embedder=_embedder).get("ns", "cat photo"), {"content": "cat"})
+
+    def test_expired_vectors_are_pruned(self):
+        cache = ResponseCache(self.path, ttl=60, embedder=_embedder)
+        now = time.time()
+        with mock.patch("src.utils.llm_cache.time.time", return_value=now):
+            cache.put("ns", "draw a cat", {"content": "cat"})
+            cache.put("ns", "draw a cat", {"content": "cat"})   # replaced, not indexed twice
+            self.assertEqual(len(cache._vectors["ns"]), 1)
+        with mock.patch("src.utils.llm_cache.time.time", return_value=now + 61):
+            self.assertIsNone(cache.get("ns", "cat photo"))
+        self.assertEqual(cache._vectors["ns"], {})
+
+class TestAgentCaching(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        install_fake_model()
+        self.cache = ResponseCache(None)
+
+    def tearDown(self):
+        uninstall_fake_model()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def _task(self, task_id):
+        return TaskSpec(task_id=task_id, description="Write a prime checker", acceptance_criteria=["Has tests"],
+                        budget=100.0, deadline="3 days")
+
+    def test_repeat_template_hits_cache_across_task_ids(self):
+        finalizer = ContractFinalizerAgent(cache=self.cache)
+        worker = WorkerAgent("worker_1", "Fast/Cheap", cache=self.cache)
+        bid = Bid(bid_id="b", task_id="t1", agent_id="worker_1", price=80.0, timeline="2 days", confidence=0.8, plan="p")
+        first = finalizer.finalize_contract(self._task("t1"), bid)
+        first_bid = worker.generate_bid(self._task("t1"), strategy="llm")
+        self.assertEqual(self.cache.hits, 0)
+
+        second = finalizer.finalize_contract(self._task("t2"), bid)
+        second_bid = worker.generate_bid(self._task("t2"), strategy="llm")
+        self.assertEqual(self.cache.hits, 2)
+        self.assertEqual((first.task_id, second.task_id), ("t1", "t2"))
+        self.assertNotEqual(first.contract_id, second.contract_id)
+        self.assertEqual(second.deliverables, first.deliverables)
+        self.assertEqual((first_bid.task_id, second_bid.task_id), ("t1", "t2"))
+        self.assertEqual(second_bid.price, first_bid.price)
+
+    def test_executor_opts_out_by_default(self):
+        executor = ExecutorAgent(cache=self.cache)
+        self.assertIsNone(executor.cache)
+        contract = Contract(contract_id="c", task_id="t", selected_worker="w", deliverables=["code"], tests=["runs"],
+                            payment=10.0, penalty_rules=[])
+        executor.execute_task(contract)
+        executor.execute_task(contract)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 0))
+        self.assertIs(ExecutorAgent(cache=self.cache, use_cache=True).cache, self.cache)
+
+if __name__ == '__main__':
+    unittest.main()
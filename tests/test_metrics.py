@@ -0,0 +1,146 @@
+import sys
+import os
+import math
+import re
+import unittest
+from collections import defaultdict
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.metrics import MetricsRegistry, RollingHistogram, record_llm_call
+
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+_LABEL = re.compile(r'(\w+)="([^"]*)"')
+
+def _parse(text):
+    """
+    Minimal reader for the Prometheus text format: returns {family: type},
+    {family: help} and [(name, labels, value)] samples, failing on any line it
+    does not understand.
+    """
+    types, helps, samples = {}, {}, []
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            name, _, help_text = line[len("# HELP "):].partition(" ")
+            helps[name] = help_text
+        elif line.startswith("# TYPE "):
+            name, kind = line[len("# TYPE "):].split(" ")
+            assert name not in types, f"duplicate TYPE for {name}"
+            types[name] = kind
+        else:
+            match = _SAMPLE.match(line)
+            assert match, f"unparseable line: {line!r}"
+            name, labels, value = match.groups()
+            samples.append((name, dict(_LABEL.findall(labels or "")), float(value)))
+    return types, helps, samples
+
+def _family(name, types):
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and types.get(name[:-len(suffix)]) == "histogram":
+            return name[:-len(suffix)]
+    return name
+
+def _histograms(text):
+    """{(metric, stage): {"buckets": [(le, n)], "sum": s, "count": c}} after checking the families."""
+    types, helps, samples = _parse(text)
+    result = defaultdict(lambda: {"buckets": []})
+    for name, labels, value in samples:
+        family = _family(name, types)
+        assert family in types, f"{name} has no TYPE line"
+        if types[family] != "histogram":
+            continue
+        assert family in helps, f"{family} has no HELP line"
+        h = result[(family, labels["stage"])]
+        if name.endswith("_bucket"):
+            h["buckets"].append((float(labels["le"]), value))
+        else:
+            h[name[len(family) + 1:]] = value
+    return dict(result)
+
+class TestRollingHistogram(unittest.TestCase):
+    def test_buckets_are_upper_inclusive(self):
+        h = RollingHistogram(buckets=(1.0, 2.0), window=2)
+        for value in (0.5, 1.0, 1.5, 3.0):
+            h.observe(value)
+        self.assertEqual(h.counts, [2, 1, 1])
+        self.assertEqual((h.count, h.sum), (4, 6.0))
+        # Quantiles only see the window
+        self.assertEqual(list(h.recent), [1.5, 3.0])
+        self.assertEqual(h.quantile(0.0), 1.5)
+        self.assertEqual(h.quantile(0.99), 3.0)
+        self.assertEqual(RollingHistogram().quantile(0.5), 0.0)
+
+    def test_merge_adds_counts_and_keeps_window(self):
+        a, b = RollingHistogram(buckets=(1.0,), window=3), RollingHistogram(buckets=(1.0,), window=3)
+        for value in (0.5, 2.0):
+            a.observe(value)
+        for value in (0.25, 0.75, 4.0):
+            b.observe(value)
+        a.merge(b)
+        self.assertEqual(a.counts, [3, 2])
+        self.assertEqual((a.count, a.sum), (5, 7.5))
+        self.assertEqual(list(a.recent), [0.25, 0.75, 4.0])
+
+class TestPrometheusExposition(unittest.TestCase):
+    def _registry(self, llm_seconds):
+        registry = MetricsRegistry(buckets=(0.1, 0.5, 1.0))
+        for seconds in llm_seconds:
+            with registry.stage("BIDDING"):
+                record_llm_call(seconds, prompt_tokens=10, completion_tokens=4)
+        return registry
+
+    def _check_histogram(self, h):
+        buckets = h["buckets"]
+        bounds = [le for le, _ in buckets]
+        counts = [n for _, n in buckets]
+        self.assertEqual(bounds, sorted(bounds))
+        self.assertTrue(math.isinf(bounds[-1]))
+        self.assertEqual(counts, sorted(counts), "buckets must be cumulative")
+        self.assertEqual(counts[-1], h["count"])
+
+    def test_exposition_is_well_formed(self):
+        registry = self._registry([0.05, 0.3, 0.3, 2.0])
+        text = registry.to_prometheus()
+        self.assertTrue(text.endswith("\n"))
+        histograms = _histograms(text)
+
+        for h in histograms.values():
+            self._check_histogram(h)
+        llm = histograms[("agentbazaar_stage_llm_seconds", "BIDDING")]
+        self.assertEqual(llm["buckets"], [(0.1, 1), (0.5, 3), (1.0, 3), (math.inf, 4)])
+        self.assertEqual(llm["count"], 4)
+        self.assertAlmostEqual(llm["sum"], 2.65)
+        self.assertEqual(histograms[("agentbazaar_stage_wall_seconds", "BIDDING")]["count"], 4)
+
+        _, _, samples = _parse(text)
+        counters = {name: value for name, labels, value in samples if labels.get("stage") == "BIDDING"}
+        self.assertEqual(counters["agentbazaar_stage_llm_calls_total"], 4)
+        self.assertEqual(counters["agentbazaar_stage_prompt_tokens_total"], 40)
+        self.assertEqual(counters["agentbazaar_stage_completion_tokens_total"], 16)
+        quantiles = {labels["quantile"]: value for name, labels, value in samples
+                     if name == "agentbazaar_stage_llm_seconds_recent"}
+        self.assertEqual(quantiles, {"0.5": 0.3, "0.95": 2.0, "0.99": 2.0})
+
+    def test_merge_across_registries(self):
+        merged = self._registry([0.05, 0.3])
+        other = self._registry([0.7, 2.0, 2.0])
+        with other.stage("EXECUTOR"):
+            record_llm_call(0.4)
+        merged.merge(other)
+
+        histograms = _histograms(merged.to_prometheus())
+        for h in histograms.values():
+            self._check_histogram(h)
+        bidding = histograms[("agentbazaar_stage_llm_seconds", "BIDDING")]
+        self.assertEqual(bidding["buckets"], [(0.1, 1), (0.5, 2), (1.0, 3), (math.inf, 5)])
+        self.assertAlmostEqual(bidding["sum"], 5.05)
+        # Stages only the other registry saw are carried over
+        self.assertEqual(histograms[("agentbazaar_stage_llm_seconds", "EXECUTOR")]["count"], 1)
+        self.assertEqual(merged.counters["BIDDING"]["llm_calls"], 5)
+        self.assertEqual(merged.counters["EXECUTOR"]["spans"], 1)
+        # The source registry is left as it was
+        self.assertEqual(other.llm["BIDDING"].count, 3)
+
+if __name__ == '__main__':
+    unittest.main()
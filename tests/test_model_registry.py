@@ -0,0 +1,83 @@
+import sys
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+from bench.fake_model import install_fake_model, uninstall_fake_model
+from src.agents.worker import WorkerAgent
+from src.agents.worker_registry import WorkerRegistry
+from src.models.schemas import TaskSpec, WorkerProfile
+from src.orchestration import MarketSimulation
+from src.utils import model_registry
+
+HOST = "http://ollama-test:11434"
+
+class TestSharedClients(unittest.TestCase):
+    def test_one_client_per_host_and_model(self):
+        with mock.patch.dict(model_registry._clients, clear=True), \
+                mock.patch.object(model_registry, "Client") as client:
+            for _ in range(5):
+                model_registry.get_model("llama3.2:latest", HOST)
+                model_registry.get_model("qwen2.5:7b", HOST)
+            first = model_registry.get_model("llama3.2:latest", HOST)
+            self.assertEqual(client.call_count, 2)
+            self.assertIs(first.client, model_registry.get_client("llama3.2:latest", HOST))
+
+    def test_close_all_uses_the_public_close(self):
+        with mock.patch.dict(model_registry._clients, clear=True):
+            current = model_registry._clients[(HOST, "a")] = mock.Mock(spec=["close"])
+            # An ollama release whose Client has no close()
+            older = model_registry._clients[(HOST, "b")] = mock.Mock(spec=[])
+            model_registry.close_all()
+            current.close.assert_called_once_with()
+            self.assertEqual(model_registry._clients, {})
+            self.assertEqual(older.mock_calls, [])
+
+class TestSharedAgents(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        install_fake_model()
+
+    def tearDown(self):
+        uninstall_fake_model()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_agents_are_built_once_across_simulations(self):
+        with mock.patch.object(WorkerAgent, "__init__", autospec=True, side_effect=WorkerAgent.__init__) as init, \
+                mock.patch.object(WorkerAgent, "_build_agent", autospec=True, side_effect=WorkerAgent._build_agent) as build:
+            sims = [MarketSimulation() for _ in range(3)]
+            workers = [w for sim in sims for w in sim.registry.agents()]
+            for worker in workers:
+                worker.agent
+            team = len(sims[0].registry)
+            self.assertEqual(len(workers), 3 * team)
+            self.assertEqual(init.call_count, team)
+            self.assertEqual(build.call_count, team)
+            # The broker and the other stage agents are shared too
+            self.assertIs(sims[0].broker, sims[2].broker)
+            self.assertIs(sims[0].validator, sims[1].validator)
+
+    def test_reregistered_profile_is_not_served_stale(self):
+        registry = WorkerRegistry([WorkerProfile(agent_id="w", persona="Fast/Cheap", model_id="m1")])
+        old = registry.agents()[0]
+        self.assertIs(registry.agents()[0], old)
+
+        registry.register(WorkerProfile(agent_id="w", persona="Premium", model_id="m2", bid_strategy="heuristic"))
+        new = registry.select(TaskSpec(task_id="t", description="d", acceptance_criteria=["c"], budget=1.0, deadline="1 day"))[0]
+        self.assertIsNot(new, old)
+        self.assertEqual((new.persona, new.model_id, new.bid_strategy), ("Premium", "m2", "heuristic"))
+
+        # Unregistering drops the shared instance instead of keeping it alive
+        registry.unregister("w")
+        self.assertEqual(WorkerAgent.evict_shared(agent_id="w"), 0)
+
+if __name__ == '__main__':
+    unittest.main()
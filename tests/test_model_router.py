@@ -0,0 +1,170 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import socket
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+from agno.agent import Agent
+from ollama import AsyncClient
+from src.agents.broker import BrokerAgent
+from src.utils.model_registry import set_router
+from src.utils.model_router import (
+    ROUTER_HOST, AsyncRoutingTransport, Backend, BackendPool, ModelRouter, NoBackendAvailable, Route,
+)
+
+class FakeOllama:
+    """Minimal /api/chat and /api/tags server that records load."""
+    def __init__(self, name, delay=0.0, status=200):
+        self.name, self.delay, self.status = name, delay, status
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._send(200, {"models": []})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server.lock:
+                    server.requests += 1
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                time.sleep(server.delay)
+                with server.lock:
+                    server.in_flight -= 1
+                if server.status != 200:
+                    return self._send(server.status, {"error": "overloaded"})
+                self._send(200, {"model": body["model"], "created_at": "2024-01-01T00:00:00Z",
+                                 "message": {"role": "assistant", "content": f"hello from {server.name}"},
+                                 "done": True, "done_reason": "stop"})
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def dead_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+class TestModelRouter(unittest.TestCase):
+    def servers(self, *specs):
+        servers = [FakeOllama(f"s{i}", **spec) for i, spec in enumerate(specs)]
+        for s in servers:
+            self.addCleanup(s.close)
+        return servers
+
+    def router(self, pool):
+        router = ModelRouter(default=Route(pool))
+        self.addCleanup(router.close)
+        return router
+
+    def chat(self, client, n, workers=None):
+        def _one(_):
+            return client.chat(model="m", messages=[{"role": "user", "content": "hi"}]).message.content
+        with ThreadPoolExecutor(max_workers=workers or n) as ex:
+            return list(ex.map(_one, range(n)))
+
+    def test_least_outstanding_spreads_load(self):
+        a, b = self.servers({"delay": 0.1}, {"delay": 0.1})
+        pool = BackendPool([Backend(a.url, max_concurrency=8), Backend(b.url, max_concurrency=8)])
+        self.chat(self.router(pool)._client(pool), 8)
+        self.assertEqual(a.requests + b.requests, 8)
+        self.assertGreaterEqual(min(a.requests, b.requests), 3)
+
+    def test_per_backend_concurrency_cap(self):
+        a, b = self.servers({"delay": 0.05}, {"delay": 0.05})
+        pool = BackendPool([Backend(a.url, max_concurrency=1), Backend(b.url, max_concurrency=1)])
+        replies = self.chat(self.router(pool)._client(pool), 6)
+        self.assertEqual(len(replies), 6)
+        self.assertEqual((a.max_in_flight, b.max_in_flight), (1, 1))
+        self.assertTrue(all(s["outstanding"] == 0 for s in pool.snapshot()))
+
+    def test_failover_and_circuit_breaker(self):
+        bad, good = self.servers({"status": 503}, {})
+        pool = BackendPool([Backend(bad.url), Backend(good.url)], failure_threshold=2, reset_timeout=60)
+        replies = self.chat(self.router(pool)._client(pool), 5, workers=1)
+        self.assertEqual(replies, ["hello from s1"] * 5)
+        self.assertEqual(bad.requests, 2)
+        self.assertEqual(pool.snapshot()[0]["circuit"], "open")
+
+    def test_half_open_probe_closes_circuit(self):
+        (server,) = self.servers({})
+        backend = Backend(server.url)
+        pool = BackendPool([backend], failure_threshold=1, reset_timeout=0.05)
+        pool.release(pool.acquire(), ok=False)
+        with self.assertRaises(NoBackendAvailable):
+            pool.acquire()
+        time.sleep(0.06)
+        probe = pool.acquire()
+        self.assertIsNone(pool.try_acquire())  # only one probe while half-open
+        pool.release(probe, ok=True)
+        self.assertEqual(backend.circuit(time.monotonic()), "closed")
+
+    def test_health_check_skips_dead_backend(self):
+        (live,) = self.servers({})
+        pool = BackendPool([Backend(dead_url()), Backend(live.url)])
+        pool.check_health(timeout=0.5)
+        self.assertEqual([s["healthy"] for s in pool.snapshot()], [False, True])
+        self.chat(self.router(pool)._client(pool), 3)
+        self.assertEqual(pool.snapshot()[0]["served"], 0)
+
+    def test_async_transport(self):
+        a, b = self.servers({"delay": 0.05}, {"delay": 0.05})
+        pool = BackendPool([Backend(a.url, max_concurrency=2), Backend(b.url, max_concurrency=2)])
+
+        async def _run():
+            client = AsyncClient(host=ROUTER_HOST, transport=AsyncRoutingTransport(pool))
+            calls = [client.chat(model="m", messages=[{"role": "user", "content": "hi"}]) for _ in range(6)]
+            return await asyncio.gather(*calls)
+
+        self.assertEqual(len(asyncio.run(_run())), 6)
+        self.assertEqual((a.requests, b.requests), (3, 3))
+        self.assertLessEqual(max(a.max_in_flight, b.max_in_flight), 2)
+
+    def test_roles_route_to_pool_and_model(self):
+        (server,) = self.servers({})
+        router = ModelRouter.from_config({
+            "pools": {"local": {"backends": [{"url": server.url, "max_concurrency": 2}]}},
+            "roles": {"broker": {"pool": "local", "model": "llama3.2:1b"}, "executor": {"pool": "local"}},
+        })
+        set_router(router)
+        self.addCleanup(set_router, None)
+
+        broker = BrokerAgent(use_cache=False)
+        self.assertEqual(broker.agent.model.id, "llama3.2:1b")
+        self.assertIsNone(router.route("validator"))
+
+        reply = Agent(model=router.model("executor", "llama3.2:latest")).run("hi")
+        self.assertEqual(reply.content, "hello from s0")
+        self.assertEqual(server.requests, 1)
+
+if __name__ == '__main__':
+    unittest.main()
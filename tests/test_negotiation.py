@@ -0,0 +1,123 @@
+import sys
+import os
+import tempfile
+import unittest
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.agents.negotiator import NegotiatorAgent
+from src.models.schemas import Bid, TaskSpec
+from src.utils.reputation_db import ReputationDB
+
+def _bid(agent_id, price, confidence=0.8):
+    return Bid(bid_id=f"b-{agent_id}", task_id="t1", agent_id=agent_id, price=price,
+               timeline="2 days", confidence=confidence, plan="Do it.")
+
+def _scalar_score(rep_db, bid, task_budget):
+    # The per-bid formula score_bids replaced
+    price_score = min(task_budget / max(bid.price, 1.0), 2.0) / 2.0
+    stats = rep_db.get_stats(bid.agent_id)
+    rep_score = stats.avg_score / 100.0 if stats.tasks_completed > 0 else 0.5
+    return (0.4 * price_score) + (0.3 * rep_score) + (0.3 * bid.confidence)
+
+class TestScoreParity(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.rep_db = ReputationDB(os.path.join(self.tmp.name, "rep.sqlite3"), legacy_path=None)
+        self.negotiator = NegotiatorAgent(rep_db=self.rep_db)
+
+    def test_matches_scalar_formula_and_ranking(self):
+        self.rep_db.update_stats("trusted", True, 95)
+        self.rep_db.update_stats("trusted", True, 85)
+        self.rep_db.update_stats("flaky", False, 10)
+        bids = [
+            _bid("newcomer_a", 60.0, 0.7),
+            _bid("trusted", 120.0, 0.9),
+            _bid("flaky", 30.0, 0.5),
+            _bid("penny", 0.5, 0.2),       # below the 1.0 price floor
+            _bid("newcomer_b", 60.0, 0.7),  # ties newcomer_a
+            _bid("pricey", 400.0, 1.0),
+            _bid("newcomer_c", 60.0, 0.7),  # ties both
+        ]
+        for budget in (100.0, 25.0, 1000.0):
+            scored = self.negotiator.score_bids(bids, budget)
+            reference = [(_scalar_score(self.rep_db, b, budget), b) for b in bids]
+            # list.sort is stable, so ties keep submission order
+            reference.sort(key=lambda x: x[0], reverse=True)
+
+            self.assertEqual([b.agent_id for b in scored.bids], [b.agent_id for _, b in reference])
+            for (score, bid), (expected, _) in zip(scored.ranked(), reference):
+                self.assertAlmostEqual(score, expected, places=12, msg=bid.agent_id)
+            for bid in bids:
+                self.assertAlmostEqual(self.negotiator.score_bid(bid, budget), _scalar_score(self.rep_db, bid, budget), places=12)
+
+        ties = [b.agent_id for b in self.negotiator.score_bids(bids, 100.0).bids if b.agent_id.startswith("newcomer")]
+        self.assertEqual(ties, ["newcomer_a", "newcomer_b", "newcomer_c"])
+
+class TestReverseAuction(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.negotiator = NegotiatorAgent(rep_db=ReputationDB(os.path.join(self.tmp.name, "rep.sqlite3"), legacy_path=None))
+        self.task = TaskSpec(task_id="t1", description="Write a poem", acceptance_criteria=["Rhymes"], budget=100.0, deadline="3 days")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_rivals_bid_down_to_reservation(self):
+        bids = [_bid("cheap", 80.0), _bid("flexible", 90.0)]
+        result = self.negotiator.auction(self.task, bids, reservations={"cheap": 75.0, "flexible": 60.0})
+
+        # flexible can go below cheap's floor, cheap cannot follow
+        self.assertEqual(result.bid.agent_id, "flexible")
+        self.assertLess(result.bid.price, result.asks[0])
+        self.assertGreaterEqual(result.bid.price, 60.0)
+        self.assertGreaterEqual(result.asks[0], 75.0)
+        self.assertLess(result.asks[0], 80.0)
+        self.assertLessEqual(result.rounds, NegotiatorAgent.MAX_ROUNDS)
+        self.assertIn("Negotiated", result.bid.plan)
+        # Submitted bids are never changed
+        self.assertEqual([b.price for b in bids], [80.0, 90.0])
+        self.assertEqual(bids[1].plan, "Do it.")
+
+    def test_reputation_lets_a_pricier_bid_win(self):
+        for _ in range(5):
+            self.negotiator.rep_db.update_stats("trusted", True, 100)
+            self.negotiator.rep_db.update_stats("unknown", False, 0)
+        bids = [_bid("unknown", 70.0), _bid("trusted", 80.0)]
+        result = self.negotiator.auction(self.task, bids, reservations={"unknown": 69.0, "trusted": 78.0})
+        self.assertEqual(result.bid.agent_id, "trusted")
+        self.assertEqual(result.bid.price, 80.0)
+        self.assertIs(result.bid, bids[1])
+
+    def test_single_bid_meets_budget_within_reservation(self):
+        over = _bid("solo", 120.0)
+        self.assertEqual(self.negotiator.negotiate(self.task, [over], reservations={"solo": 95.0}).price, 100.0)
+        self.assertEqual(self.negotiator.negotiate(self.task, [over], reservations={"solo": 110.0}).price, 110.0)
+        self.assertEqual(over.price, 120.0)
+
+    def test_zero_price_weight_skips_rounds(self):
+        negotiator = NegotiatorAgent(rep_db=self.negotiator.rep_db, w_price=0.0, w_rep=0.5, w_conf=0.5)
+        bids = [_bid("cheap", 80.0, confidence=0.6), _bid("sure", 95.0, confidence=0.9)]
+        result = negotiator.auction(self.task, bids, reservations={"cheap": 40.0, "sure": 90.0})
+        self.assertEqual(result.rounds, 0)
+        self.assertIs(result.bid, bids[1])
+        with self.assertRaises(ValueError):
+            NegotiatorAgent(rep_db=self.negotiator.rep_db, w_price=-0.1)
+
+    def test_counter_offer_only_behind_flag(self):
+        calls = []
+        self.negotiator._counter_offer = lambda task, bid, ask: calls.append(ask) or 104.0
+        over = [_bid("solo", 120.0)]
+        self.assertEqual(self.negotiator.negotiate(self.task, over, reservations={"solo": 102.0}).price, 102.0)
+        self.assertEqual(calls, [])
+
+        self.negotiator.llm_counter_offers = True
+        # The worker's reservation still bounds the counter-offer
+        self.assertEqual(self.negotiator.negotiate(self.task, over, reservations={"solo": 110.0}).price, 110.0)
+        self.assertEqual(self.negotiator.negotiate(self.task, over, reservations={"solo": 102.0}).price, 104.0)
+        self.assertEqual(calls, [120.0, 120.0])
+
+if __name__ == '__main__':
+    unittest.main()
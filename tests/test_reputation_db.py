@@ -0,0 +1,57 @@
+import sys
+import os
+import json
+import tempfile
+import threading
+import unittest
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.reputation_db import ReputationDB
+
+class TestReputationDB(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "rep.sqlite3")
+        self.legacy = os.path.join(self.tmp.name, "rep.json")
+
+    def test_update_stats_aggregates(self):
+        db = ReputationDB(self.path, legacy_path=None)
+        db.update_stats("w1", True, 90)
+        db.update_stats("w1", False, 30)
+        stats = db.get_stats("w1")
+        self.assertEqual(stats.tasks_completed, 2)
+        self.assertAlmostEqual(stats.success_rate, 0.5)
+        self.assertAlmostEqual(stats.avg_score, 60.0)
+        self.assertEqual(db.get_stats("unknown").tasks_completed, 0)
+
+    def test_parallel_updates_are_not_lost(self):
+        def _worker():
+            db = ReputationDB(self.path, legacy_path=None)
+            for _ in range(100):
+                db.update_stats("w1", True, 80)
+
+        ReputationDB(self.path, legacy_path=None)
+        threads = [threading.Thread(target=_worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(ReputationDB(self.path, legacy_path=None).get_stats("w1").tasks_completed, 400)
+
+    def test_legacy_import_and_leaderboard(self):
+        with open(self.legacy, "w") as f:
+            json.dump({
+                "w1": {"agent_id": "w1", "tasks_completed": 4, "success_rate": 0.5, "avg_score": 60.0, "disputes": 0},
+                "w2": {"agent_id": "w2", "tasks_completed": 1, "success_rate": 1.0, "avg_score": 95.0, "disputes": 0},
+            }, f)
+        db = ReputationDB(self.path, legacy_path=self.legacy)
+        db.update_stats("w1", True, 100)
+        self.assertAlmostEqual(db.get_stats("w1").avg_score, 68.0)
+        self.assertAlmostEqual(db.get_stats("w1").success_rate, 0.6)
+        self.assertEqual([s.agent_id for s in db.leaderboard(limit=2)], ["w2", "w1"])
+
+if __name__ == '__main__':
+    unittest.main()
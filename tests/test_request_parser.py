@@ -0,0 +1,127 @@
+import sys
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+from bench.fake_model import FakeModel, install_fake_model, uninstall_fake_model
+from src.agents.broker import BrokerAgent
+from src.models.schemas import TaskSpec
+from src.orchestration import MarketSimulation
+from src.utils.request_parser import parse_request
+
+FORM = """Task: Build a CSV parser
+Budget: $1.5k
+Deadline: 5 days
+Skills: Python, pandas
+Acceptance criteria:
+- Parses quoted fields
+- Handles empty lines"""
+
+class TestRequestParser(unittest.TestCase):
+    def test_templated_form_is_complete(self):
+        parsed = parse_request(FORM)
+        self.assertTrue(parsed.complete)
+        self.assertEqual(parsed.description, "Build a CSV parser")
+        self.assertEqual(parsed.budget, 1500.0)
+        self.assertEqual(parsed.deadline, "5 days")
+        self.assertEqual(parsed.required_skills, ["python", "pandas"])
+        self.assertEqual(parsed.acceptance_criteria, ["Parses quoted fields", "Handles empty lines"])
+
+    def test_free_text_is_partial(self):
+        parsed = parse_request("Write a very short poem about coding within 2 days. Budget $40.")
+        self.assertEqual(parsed.budget, 40.0)
+        # Prose durations are left to the LLM
+        self.assertIsNone(parsed.deadline)
+        self.assertEqual(parsed.missing, ["deadline", "acceptance_criteria"])
+
+    def test_dash_is_not_a_label_separator(self):
+        parsed = parse_request("Skills-based resume rewrite for $80 within 3 days\n- one page")
+        self.assertEqual(parsed.required_skills, [])
+        self.assertEqual(parsed.description, "Skills-based resume rewrite for $80 within 3 days one page")
+        self.assertEqual(parsed.budget, 80.0)
+        self.assertFalse(parsed.complete)
+
+    def test_prose_durations_are_not_deadlines(self):
+        parsed = parse_request("Write a script that deletes logs older than 30 days. Budget $50\nCriteria:\n- deletes files\n- logs actions")
+        self.assertIsNone(parsed.deadline)
+        self.assertEqual(parsed.missing, ["deadline"])
+        self.assertEqual(parse_request("Plan a 7 day itinerary for Rome\nDue: 2 weeks").deadline, "2 weeks")
+
+    def test_bullets_without_heading_are_description(self):
+        parsed = parse_request("Write a script that:\n- reads X\n- writes Y\nBudget: $50\nDeadline: 2 days")
+        self.assertEqual(parsed.description, "Write a script that: reads X writes Y")
+        self.assertEqual(parsed.acceptance_criteria, [])
+        self.assertEqual(parsed.missing, ["acceptance_criteria"])
+        self.assertFalse(parsed.complete)
+
+        # A criteria section ends at the next non-bullet line
+        parsed = parse_request("Build a parser\nMust:\n- handle quotes\nBudget: $50\n- not a criterion")
+        self.assertEqual(parsed.acceptance_criteria, ["handle quotes"])
+        self.assertEqual(parsed.description, "Build a parser not a criterion")
+
+    def test_ambiguous_budget_is_left_out(self):
+        parsed = parse_request("Fix my site for $20 or $30\nRequirements:\n1. works on mobile")
+        self.assertIsNone(parsed.budget)
+        self.assertEqual(parsed.acceptance_criteria, ["works on mobile"])
+
+class TestBrokerFastPath(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        install_fake_model()
+
+    def tearDown(self):
+        uninstall_fake_model()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_complete_form_skips_llm(self):
+        broker = BrokerAgent(use_cache=False)
+        task = broker.create_task(FORM)
+        self.assertEqual(task.budget, 1500.0)
+        self.assertIsNone(broker._agent)  # the Agno agent was never built
+        self.assertEqual(broker.fast_path_rate, 1.0)
+
+    def test_partial_parse_overrides_llm_fields(self):
+        broker = BrokerAgent(use_cache=False)
+        task = broker.create_task("Write a haiku within 2 days. Budget $40.")
+        self.assertEqual(task.budget, 40.0)
+        self.assertEqual(broker.fast_path_stats, {"hits": 0, "partial": 1, "misses": 0})
+
+    def test_prose_duration_does_not_skip_llm(self):
+        broker = BrokerAgent(use_cache=False)
+        task = broker.create_task("Plan a 7 day itinerary. Budget $50\n- daily schedule\n- costs")
+        # The deadline is the LLM's, not the trip length
+        self.assertEqual(task.deadline, "3 days")
+        self.assertEqual(broker.fast_path_stats, {"hits": 0, "partial": 1, "misses": 0})
+
+    def test_model_task_ids_are_replaced(self):
+        structured = FakeModel._structured
+
+        def _fixed_id(model, schema, prompt):
+            reply = structured(model, schema, prompt)
+            if schema is TaskSpec:
+                reply["task_id"] = "task-1"
+            return reply
+
+        with mock.patch.object(FakeModel, "_structured", _fixed_id):
+            sim = MarketSimulation(bid_strategy="heuristic")
+            task_ids = []
+            for _ in range(2):
+                events = list(sim.run_stream("Write a haiku about rivers. Budget $40."))
+                self.assertEqual(events[-1]["step"], "FINAL")
+                task_ids.append(events[1]["data"]["task_id"])
+        self.assertNotIn("task-1", task_ids)
+        self.assertNotEqual(task_ids[0], task_ids[1])
+        # Each transaction has its own checkpoints
+        self.assertEqual([sim.checkpoints.load(t)["FINAL"]["status"] for t in task_ids], ["success", "success"])
+        self.assertIn("already closed", list(sim.resume(task_ids[1]))[0]["message"])
+
+if __name__ == '__main__':
+    unittest.main()
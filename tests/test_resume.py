@@ -0,0 +1,94 @@
+import sys
+import os
+import asyncio
+import tempfile
+import unittest
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+from bench.fake_model import install_fake_model, uninstall_fake_model
+from src.orchestration import MarketSimulation
+from src.async_orchestration import AsyncMarketSimulation
+
+REQUEST = "Write a very short poem about coding. Budget $40."
+
+class TestResume(unittest.TestCase):
+    def setUp(self):
+        # Ledger, reputation, checkpoint and cache files live in the working directory
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        install_fake_model(pass_rate=1.0)
+
+    def tearDown(self):
+        uninstall_fake_model()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def _crash_after(self, sim, step, status="done"):
+        """Runs a transaction until the given event, then abandons it; returns the task id."""
+        stream = sim.run_stream(REQUEST)
+        task_id = None
+        for event in stream:
+            if event["step"] == "BROKER" and event["status"] == "done":
+                task_id = event["data"]["task_id"]
+            if event["step"] == step and event.get("status") == status:
+                break
+        stream.close()
+        return task_id
+
+    def test_resume_skips_completed_stages(self):
+        task_id = self._crash_after(MarketSimulation(), "ESCROW")
+
+        sim = MarketSimulation()
+        self.assertEqual(len(sim.escrow.ledger.locked()), 1)
+        events = list(sim.resume(task_id))
+        steps = [e["step"] for e in events]
+        self.assertEqual(steps[0], "RESUME")
+        self.assertEqual(events[0]["data"]["completed"], ["BROKER", "WORKERS", "NEGOTIATOR", "CONTRACT", "ESCROW"])
+        for step in ["BROKER", "WORKERS", "NEGOTIATOR", "CONTRACT"]:
+            self.assertNotIn(step, steps)
+        self.assertEqual(events[-1]["status"], "success")
+        self.assertEqual(sim.escrow.ledger.locked(), {})
+
+        # A closed transaction is not run again
+        again = list(sim.resume(task_id))
+        self.assertEqual(len(again), 1)
+        self.assertEqual(again[0]["status"], "success")
+        self.assertEqual(list(sim.resume("unknown"))[0]["step"], "ERROR")
+
+    def test_sweeper_finishes_or_refunds_orphaned_locks(self):
+        executed = self._crash_after(MarketSimulation(), "EXECUTOR")
+        locked_only = self._crash_after(MarketSimulation(), "ESCROW")
+
+        sim = MarketSimulation()
+        self.assertEqual(list(sim.sweep_escrow(max_age=3600)), [])
+        events = list(sim.sweep_escrow(max_age=0))
+        self.assertEqual(sim.escrow.ledger.locked(), {})
+
+        resumed = [e for e in events if e["step"] == "SWEEPER"]
+        self.assertEqual([e["data"]["task_id"] for e in resumed], [executed])
+        self.assertNotIn("EXECUTOR", [e["step"] for e in events])
+        self.assertIn("success", [e.get("status") for e in events if e["step"] == "FINAL"])
+        refunds = [e for e in events if e["message"].startswith("Orphaned lock")]
+        self.assertEqual(len(refunds), 1)
+        self.assertEqual(sim.checkpoints.unfinished(), [])
+        self.assertEqual(list(sim.resume(locked_only))[0]["status"], "refunded")
+
+    def test_async_resume(self):
+        task_id = self._crash_after(MarketSimulation(), "CONTRACT")
+
+        async def _resume():
+            return [e async for e in AsyncMarketSimulation().resume(task_id)]
+
+        events = asyncio.run(_resume())
+        steps = [e["step"] for e in events]
+        self.assertEqual(steps[0], "RESUME")
+        self.assertNotIn("CONTRACT", steps)
+        self.assertIn("ESCROW", steps)
+        self.assertEqual(events[-1]["status"], "success")
+
+if __name__ == '__main__':
+    unittest.main()
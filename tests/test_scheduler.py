@@ -0,0 +1,157 @@
+import sys
+import os
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+from bench.fake_model import install_fake_model, uninstall_fake_model
+from src.async_orchestration import AsyncMarketSimulation, MarketScheduler
+from src.utils.event_store import EventStore
+
+REQUESTS = [f"Write a haiku about topic {i}. Budget $40." for i in range(6)]
+
+class _Peak:
+    """Tracks how many calls of a wrapped coroutine function run at once."""
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    def wrap(self, fn):
+        async def _wrapped(*args, **kwargs):
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self.active -= 1
+        return _wrapped
+
+class TestMarketScheduler(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        install_fake_model(pass_rate=1.0, latency=0.02)
+
+    def tearDown(self):
+        uninstall_fake_model()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def _finals(self, logs):
+        return [log[-1]["step"] for log in logs]
+
+    def test_max_concurrent_caps_transactions(self):
+        sim = AsyncMarketSimulation(bid_strategy="heuristic")
+        peak = _Peak()
+        run_stream = sim.run_stream
+
+        async def _run_stream(user_request, bid_strategy=None):
+            peak.active += 1
+            peak.peak = max(peak.peak, peak.active)
+            try:
+                async for event in run_stream(user_request, bid_strategy):
+                    yield event
+            finally:
+                peak.active -= 1
+
+        sim.run_stream = _run_stream
+        logs = asyncio.run(MarketScheduler(sim, max_concurrent=2).run_all(REQUESTS))
+        self.assertEqual(self._finals(logs), ["FINAL"] * len(REQUESTS))
+        self.assertEqual(peak.peak, 2)
+
+    def test_stage_limits_cap_one_stage(self):
+        def _executor_peak(stage_limits):
+            sim = AsyncMarketSimulation(bid_strategy="heuristic", stage_limits=stage_limits)
+            peak = _Peak()
+            executor = sim.executor
+            original = executor.aexecute_task
+            executor.aexecute_task = peak.wrap(original)
+            try:
+                logs = asyncio.run(MarketScheduler(sim, max_concurrent=4).run_all(REQUESTS))
+            finally:
+                del executor.aexecute_task   # the executor is shared across simulations
+            self.assertEqual(self._finals(logs), ["FINAL"] * len(REQUESTS))
+            return peak.peak
+
+        self.assertEqual(_executor_peak({"EXECUTOR": 1}), 1)
+        self.assertGreater(_executor_peak(None), 1)
+
+    def test_storage_io_does_not_block_the_loop(self):
+        sim = AsyncMarketSimulation(bid_strategy="heuristic", event_store=EventStore())
+
+        # Stand-ins for slow disks: checkpoints, the escrow lock, every recorded
+        # event and reputation reads take 50 ms each
+        def _slow(fn):
+            def _wrapped(*args, **kwargs):
+                time.sleep(0.05)
+                return fn(*args, **kwargs)
+            return _wrapped
+
+        sim.checkpoints.save = _slow(sim.checkpoints.save)
+        sim.escrow.lock = _slow(sim.escrow.lock)
+        sim.event_store.append = _slow(sim.event_store.append)
+        sim.rep_db.avg_scores = _slow(sim.rep_db.avg_scores)
+
+        async def _main():
+            gaps = []
+            stop = asyncio.Event()
+
+            async def _heartbeat():
+                last = time.monotonic()
+                while not stop.is_set():
+                    await asyncio.sleep(0.005)
+                    now = time.monotonic()
+                    gaps.append(now - last)
+                    last = now
+
+            beat = asyncio.ensure_future(_heartbeat())
+            logs = await MarketScheduler(sim, max_concurrent=2).run_all(REQUESTS[:2])
+            stop.set()
+            await beat
+            return logs, max(gaps)
+
+        logs, worst_gap = asyncio.run(_main())
+        sim.event_store.close()
+        self.assertEqual(self._finals(logs), ["FINAL", "FINAL"])
+        self.assertLess(worst_gap, 0.045)
+
+    def test_resume_and_sweep_stay_off_the_loop(self):
+        sim = AsyncMarketSimulation(bid_strategy="heuristic")
+
+        async def _crash_after_execution():
+            task_id = None
+            async for event in sim.run_stream(REQUESTS[0]):
+                if event["step"] == "BROKER" and event["status"] == "done":
+                    task_id = event["data"]["task_id"]
+                if event["step"] == "EXECUTOR" and event["status"] == "done":
+                    return task_id
+
+        task_id = asyncio.run(_crash_after_execution())
+        sim._in_flight.clear()
+        restore = sim._restore
+        loop_threads = []
+
+        def _restore(*args):
+            loop_threads.append(threading.current_thread() is threading.main_thread())
+            return restore(*args)
+
+        sim._restore = _restore
+        events = asyncio.run(self._collect(sim.sweep_escrow(max_age=0)))
+        self.assertEqual(events[-1]["status"], "success")
+        self.assertEqual(events[0]["data"]["task_id"], task_id)
+        # _orphaned_locks and resume() both read checkpoints, from worker threads
+        self.assertEqual(loop_threads, [False, False])
+
+    @staticmethod
+    async def _collect(stream):
+        return [event async for event in stream]
+
+if __name__ == '__main__':
+    unittest.main()
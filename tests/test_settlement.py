@@ -0,0 +1,179 @@
+import sys
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+from bench.fake_model import install_fake_model, uninstall_fake_model
+from src.orchestration import MarketSimulation
+from src.utils.ledger import Ledger, SqliteLedgerStorage, WalLedgerStorage
+from src.utils.reputation_db import ReputationDB
+from src.utils.settlement import ReputationUpdateError, SettlementQueue
+
+class TestBulkSettlement(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def _rep_db(self):
+        return ReputationDB(self._path("rep.sqlite3"), legacy_path=None)
+
+    def test_settle_many_is_one_append(self):
+        for storage in (WalLedgerStorage(self._path("l.wal"), self._path("l.snap"), legacy_path=None),
+                        SqliteLedgerStorage(self._path("l.sqlite3"))):
+            ledger = Ledger(storage)
+            for cid in ("c1", "c2", "c3"):
+                ledger.lock_funds(cid, 10.0, f"t-{cid}")
+            appends = []
+            original = storage.append
+            storage.append = lambda ops: appends.append(len(ops)) or original(ops)
+
+            settled = ledger.settle_many([("c1", "worker_a"), ("c2", None), ("c1", "worker_b"), ("missing", None)])
+            self.assertEqual(settled, [True, True, False, False])
+            self.assertEqual(appends, [2])
+            self.assertEqual(list(ledger.locked()), ["c3"])
+            history = list(ledger.history())
+            self.assertEqual([(h["status"], h.get("recipient")) for h in history], [("RELEASED", "worker_a"), ("REFUNDED", None)])
+            ledger.flush()
+
+    def test_update_many_matches_single_updates(self):
+        batched = self._rep_db()
+        batched.update_many([("a", True, 90), ("b", False, 10), ("a", False, 30)])
+        single = ReputationDB(self._path("single.sqlite3"), legacy_path=None)
+        for row in [("a", True, 90), ("b", False, 10), ("a", False, 30)]:
+            single.update_stats(*row)
+        self.assertEqual(batched.get_stats("a"), single.get_stats("a"))
+        self.assertEqual(batched.get_stats("a").tasks_completed, 2)
+
+        # Outcome ids are counted once, across calls and within one batch
+        self.assertEqual(batched.update_many([("b", True, 50, "c1"), ("b", True, 50, "c1")]), 1)
+        self.assertEqual(batched.update_many([("b", True, 50, "c1"), ("b", False, 0, "c2")]), 1)
+        self.assertEqual(batched.get_stats("b").tasks_completed, 3)
+
+        # All or nothing
+        with self.assertRaises(Exception):
+            batched.update_many([("c", True, 50), ("d", True, None)])
+        self.assertEqual(batched.get_stats("c").tasks_completed, 0)
+
+    def test_queue_coalesces_concurrent_outcomes(self):
+        ledger = Ledger(SqliteLedgerStorage(self._path("l.sqlite3")))
+        for i in range(20):
+            ledger.lock_funds(f"c{i}", 10.0, f"t{i}")
+        queue = SettlementQueue(ledger, self._rep_db(), window=0.05)
+        results = [None] * 20
+
+        def _settle(i):
+            recipient = "worker_a" if i % 2 else None
+            results[i] = queue.submit(f"c{i}", recipient, "worker_a", bool(i % 2), 80.0).result(timeout=10)
+
+        threads = [threading.Thread(target=_settle, args=(i,)) for i in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, [True] * 20)
+        self.assertEqual(queue.outcomes, 20)
+        self.assertLess(queue.batches, 20)
+        self.assertEqual(ledger.locked(), {})
+        self.assertEqual(queue.rep_db.get_stats("worker_a").tasks_completed, 20)
+        # Reputation only (e.g. resuming after the payout was written)
+        self.assertIsNone(queue.submit(None, None, "worker_b", True, 70.0).result(timeout=10))
+        self.assertEqual(queue.rep_db.get_stats("worker_b").tasks_completed, 1)
+
+    def test_reputation_failure_keeps_ledger_results(self):
+        ledger = Ledger(SqliteLedgerStorage(self._path("l.sqlite3")))
+        for cid in ("c1", "c2"):
+            ledger.lock_funds(cid, 10.0, f"t-{cid}")
+        queue = SettlementQueue(ledger, self._rep_db(), window=0.05)
+        queue.REPUTATION_BACKOFF_S = 0.0
+        update_many = queue.rep_db.update_many
+
+        with mock.patch.object(queue.rep_db, "update_many", side_effect=OSError("disk full")) as failing:
+            paid = queue.submit("c1", "worker_a", "worker_a", True, 90.0)
+            refund_only = queue.submit("c2", None, None, False, 0.0)
+            with self.assertRaises(ReputationUpdateError) as raised:
+                paid.result(timeout=10)
+            self.assertIs(refund_only.result(timeout=10), True)
+        self.assertEqual(failing.call_count, queue.REPUTATION_RETRIES + 1)
+        self.assertIs(raised.exception.settled, True)
+        self.assertIsInstance(raised.exception.__cause__, OSError)
+        self.assertEqual(ledger.locked(), {})
+        self.assertEqual(queue.rep_db.get_stats("worker_a").tasks_completed, 0)
+
+        # A transient failure is retried within the batch
+        with mock.patch.object(queue.rep_db, "update_many", side_effect=[OSError("busy"), None]) as flaky:
+            self.assertIsNone(queue.submit(None, None, "worker_a", True, 90.0).result(timeout=10))
+        self.assertEqual(flaky.call_count, 2)
+        # The ledger failing still fails every outcome
+        with mock.patch.object(ledger, "settle_many", side_effect=OSError("ledger down")), \
+                mock.patch.object(queue.rep_db, "update_many", wraps=update_many) as untouched:
+            with self.assertRaises(OSError):
+                queue.submit("c3", None, "worker_a", False, 0.0).result(timeout=10)
+        self.assertEqual(untouched.call_count, 0)
+
+class TestPartialSettlement(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        install_fake_model(pass_rate=1.0)
+
+    def tearDown(self):
+        uninstall_fake_model()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_transaction_stays_open_until_reputation_is_written(self):
+        sim = MarketSimulation()
+        sim.settlement.REPUTATION_BACKOFF_S = 0.0
+        with mock.patch.object(sim.rep_db, "update_many", side_effect=OSError("disk full")):
+            events = list(sim.run_stream("Write a very short poem about coding. Budget $40."))
+        task_id = events[1]["data"]["task_id"]
+        steps = [e["step"] for e in events]
+        self.assertIn("release", [e.get("status") for e in events if e["step"] == "ESCROW"])
+        self.assertEqual(steps[-1], "ERROR")
+        self.assertIn("disk full", events[-1]["message"])
+        self.assertNotIn("FINAL", steps)
+        self.assertEqual(sim.escrow.ledger.locked(), {})
+        self.assertEqual(sim.checkpoints.unfinished(), [task_id])
+
+        history = list(sim.escrow.ledger.history())
+        resumed = list(sim.resume(task_id))
+        self.assertEqual([e["step"] for e in resumed], ["RESUME", "REPUTATION", "FINAL"])
+        self.assertEqual(resumed[-1]["status"], "success")
+        # The payout is not written again
+        self.assertEqual(list(sim.escrow.ledger.history()), history)
+        self.assertEqual(sim.checkpoints.unfinished(), [])
+        winner = [e for e in resumed if e["step"] == "REPUTATION"][0]["data"]["agent_id"]
+        self.assertEqual(sim.rep_db.get_stats(winner).tasks_completed, 1)
+
+    def test_crash_after_settlement_commit_counts_reputation_once(self):
+        sim = MarketSimulation()
+        # Dies after the settlement batch is committed, before its checkpoints are written
+        with mock.patch.object(MarketSimulation, "_settled", side_effect=RuntimeError("killed")):
+            stream = sim.run_stream("Write a very short poem about coding. Budget $40.")
+            task_id = None
+            with self.assertRaises(RuntimeError):
+                for event in stream:
+                    if event["step"] == "BROKER" and event["status"] == "done":
+                        task_id = event["data"]["task_id"]
+        self.assertEqual(sim.escrow.ledger.locked(), {})
+        winner = sim.checkpoints.load(task_id)["NEGOTIATOR"]["winning_bid"]["agent_id"]
+        self.assertEqual(sim.rep_db.get_stats(winner).tasks_completed, 1)
+
+        resumed = list(MarketSimulation().resume(task_id))
+        self.assertEqual(resumed[-1]["step"], "FINAL")
+        self.assertIn("REPUTATION", [e["step"] for e in resumed])
+        self.assertEqual(sim.rep_db.get_stats(winner).tasks_completed, 1)
+
+if __name__ == '__main__':
+    unittest.main()
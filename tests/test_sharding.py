@@ -0,0 +1,92 @@
+import sys
+import os
+import pickle
+import tempfile
+import threading
+import unittest
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+from bench.fake_model import install_fake_model, uninstall_fake_model
+from src.sharded_orchestration import ShardedMarket, _run_shard
+from src.utils.ledger import Ledger, SqliteLedgerStorage
+from src.utils.metrics import MetricsRegistry, Span
+
+class TestSqliteLedger(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "ledger.sqlite3")
+
+    def test_instances_share_state(self):
+        a = Ledger(SqliteLedgerStorage(self.path))
+        b = Ledger(SqliteLedgerStorage(self.path))
+        a.lock_funds("c1", 50.0, "t1")
+        b.lock_funds("c2", 70.0, "t2")
+        self.assertEqual(sorted(a.locked()), ["c1", "c2"])
+        self.assertTrue(b.release_funds("c1", "worker_a"))
+        self.assertFalse(a.release_funds("c1", "worker_b"))
+
+        reloaded = Ledger(SqliteLedgerStorage(self.path))
+        self.assertEqual(list(reloaded.data["locked_funds"]), ["c2"])
+        history = list(reloaded.history())
+        self.assertEqual(len(history), 1)
+        self.assertEqual(history[0]["recipient"], "worker_a")
+
+class TestShardedMarket(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_metrics_registry_pickles(self):
+        metrics = MetricsRegistry()
+        with metrics.stage("BROKER", Span("TRANSACTION")):
+            pass
+        copy = pickle.loads(pickle.dumps(metrics))
+        merged = MetricsRegistry()
+        merged.merge(copy)
+        merged.merge(copy)
+        self.assertEqual(merged.counters["BROKER"]["spans"], 2)
+
+    def test_sharded_run_shares_state_and_metrics(self):
+        metrics = MetricsRegistry()
+        market = ShardedMarket(processes=2, concurrency=2, chunk_size=2, metrics=metrics,
+                               initializer=install_fake_model)
+        requests = [f"Write a haiku about shard number {i}. Budget ${20 + i}." for i in range(6)]
+        logs = market.run_all(requests)
+
+        for log in logs:
+            self.assertEqual(log[0]["step"], "BROKER")
+            self.assertEqual(log[-1]["step"], "FINAL")
+        self.assertEqual(metrics.counters["BROKER"]["spans"], len(requests))
+        self.assertEqual(Ledger(SqliteLedgerStorage()).locked(), {})
+        settled = list(Ledger(SqliteLedgerStorage()).history())
+        self.assertEqual(len(settled), len(requests))
+
+    def test_event_puts_stay_off_the_loop(self):
+        class _Queue:
+            def __init__(self):
+                self.items, self.threads = [], set()
+
+            def put(self, item):
+                self.threads.add(threading.current_thread())
+                self.items.append(item)
+
+        install_fake_model()
+        self.addCleanup(uninstall_fake_model)
+        events = _Queue()
+        _run_shard([(7, "Write a haiku about queues. Budget $20.")], events, {}, 1, "sqlite")
+        self.assertEqual({i for i, _ in events.items}, {7})
+        self.assertEqual(events.items[-1][1]["step"], "FINAL")
+        # The shard's loop runs on this thread; the puts must not
+        self.assertNotIn(threading.current_thread(), events.threads)
+
+if __name__ == '__main__':
+    unittest.main()
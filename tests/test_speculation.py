@@ -0,0 +1,137 @@
+import sys
+import os
+import asyncio
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+from bench.fake_model import install_fake_model, uninstall_fake_model
+from src.async_orchestration import AsyncMarketSimulation
+from src.models.schemas import Contract, TaskSpec
+from src.orchestration import MarketSimulation
+from src.pipelined_orchestration import PipelinedMarket
+from src.speculation import deliverable_overlap
+
+REQUEST = "Write a very short poem about coding. Budget $40."
+
+def _executor_events(events):
+    return [(e["status"], e["message"]) for e in events if e["step"] == "EXECUTOR"]
+
+class TestSpeculativeExecution(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        install_fake_model(pass_rate=1.0)
+
+    def tearDown(self):
+        uninstall_fake_model()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_overlap(self):
+        task = TaskSpec(task_id="t", description="Write a CSV parser", acceptance_criteria=["Handles quoted fields"],
+                        budget=10, deadline="1 day")
+        contract = Contract(contract_id="c", task_id="t", selected_worker="w", deliverables=["CSV parser", "Handles quoted fields"],
+                            tests=[], payment=10, penalty_rules=[])
+        self.assertEqual(deliverable_overlap(contract, task, ""), 1.0)
+        contract.deliverables = ["CSV parser", "Excel export"]
+        self.assertAlmostEqual(deliverable_overlap(contract, task, ""), 1 / 3)
+        self.assertEqual(deliverable_overlap(contract, task, "also exports to Excel"), 1.0)
+
+    def test_speculative_output_is_adopted(self):
+        events = list(MarketSimulation(speculative_execution=True).run_stream(REQUEST))
+        executor = _executor_events(events)
+        self.assertEqual(executor[0][0], "speculative")
+        self.assertEqual(executor[-1][0], "done")
+        self.assertIn("before the contract was signed", executor[-1][1])
+        # Started before the contract was drafted, adopted without a second run
+        steps = [(e["step"], e.get("status")) for e in events]
+        self.assertLess(steps.index(("EXECUTOR", "speculative")), steps.index(("CONTRACT", "active")))
+        self.assertNotIn("active", [status for status, _ in executor])
+        self.assertEqual(events[-1]["status"], "success")
+
+    def test_mismatch_reruns_against_contract(self):
+        sim = MarketSimulation(speculative_execution=True)
+        sim.SPECULATION_MIN_OVERLAP = 1.01
+        events = list(sim.run_stream(REQUEST))
+        statuses = [status for status, _ in _executor_events(events)]
+        self.assertEqual(statuses, ["speculative", "discarded", "active", "done"])
+        self.assertEqual(events[-1]["status"], "success")
+
+    def test_async_engines(self):
+        async def _run():
+            return [e async for e in AsyncMarketSimulation(speculative_execution=True).run_stream(REQUEST)]
+
+        events = asyncio.run(_run())
+        self.assertEqual([s for s, _ in _executor_events(events)], ["speculative", "done"])
+        self.assertEqual(events[-1]["status"], "success")
+
+        market = PipelinedMarket(AsyncMarketSimulation(speculative_execution=True))
+        logs = asyncio.run(market.run_all([REQUEST, REQUEST]))
+        for log in logs:
+            self.assertEqual([s for s, _ in _executor_events(log)], ["speculative", "done"])
+            self.assertEqual(log[-1]["status"], "success")
+
+    def test_closing_the_stream_cancels_the_speculation(self):
+        sim = MarketSimulation(speculative_execution=True)
+        started = []
+
+        def _slow(task):
+            # Long enough to outlive the test unless the run is cancelled
+            for _ in range(1000):
+                time.sleep(0.01)
+                yield "line "
+
+        def _speculate(*args):
+            started.append(speculate(*args))
+            return started[-1]
+
+        speculate = sim._speculate
+        with mock.patch.object(sim.executor, "stream_spec", side_effect=_slow), \
+                mock.patch.object(sim, "_speculate", side_effect=_speculate):
+            stream = sim.run_stream(REQUEST)
+            for event in stream:
+                if event["step"] == "CONTRACT" and event["status"] == "done":
+                    break
+            stream.close()
+            spec, = started
+            self.assertTrue(spec.cancelled.is_set())
+            # The speculative run stops instead of generating forever
+            self.assertIsNone(spec.future.result(timeout=5))
+
+    def test_closing_the_async_stream_cancels_the_speculation(self):
+        sim = AsyncMarketSimulation(speculative_execution=True)
+        started = []
+
+        async def _slow(task):
+            for _ in range(1000):
+                await asyncio.sleep(0.01)
+                yield "line "
+
+        def _speculate(*args):
+            started.append(speculate(*args))
+            return started[-1]
+
+        async def _run():
+            stream = sim.run_stream(REQUEST)
+            async for event in stream:
+                if event["step"] == "CONTRACT" and event["status"] == "done":
+                    break
+            await stream.aclose()
+            # Checked before asyncio.run() cancels whatever is left over
+            await asyncio.sleep(0.05)
+            return started[0].future.cancelled()
+
+        speculate = sim._speculate
+        with mock.patch.object(sim.executor, "astream_spec", side_effect=_slow), \
+                mock.patch.object(sim, "_speculate", side_effect=_speculate):
+            self.assertTrue(asyncio.run(_run()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import sys
+import os
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.agents.base import LLMAgent
+from src.models.schemas import ValidationResult
+from src.utils.metrics import PARSE_FAILURES
+from src.utils.structured_output import StructuredOutputError, coerce_output, repair_json
+
+VALID = '{"task_id": "t1", "passed": true, "score": 80, "issues": [], "retry_allowed": false}'
+
+class _ScriptedAgent:
+    """Stands in for an Agno Agent: replies with the scripted contents in order."""
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.prompts = []
+        self.output_schema = ValidationResult
+
+    def run(self, prompt):
+        self.prompts.append(prompt)
+        return SimpleNamespace(content=self.replies.pop(0), metrics=None)
+
+    async def arun(self, prompt):
+        return self.run(prompt)
+
+class _Validator(LLMAgent):
+    PARSE_BACKOFF_S = 0
+
+    def __init__(self, replies):
+        super().__init__("scripted-model", use_cache=False)
+        self.scripted = _ScriptedAgent(replies)
+
+    def _build_agent(self):
+        return self.scripted
+
+class TestRepairJson(unittest.TestCase):
+    def test_common_breakages(self):
+        self.assertEqual(repair_json('Sure! ```json\n{"a": 1,}\n``` Hope that helps.'), {"a": 1})
+        self.assertEqual(repair_json('Here it is: {"a": {"b": [1, 2]}} and more {"c": 3}'), {"a": {"b": [1, 2]}})
+        self.assertEqual(repair_json('{"a": "x}", "b": [1, 2'), {"a": "x}", "b": [1, 2]})
+        self.assertEqual(repair_json("{'a': True, 'b': None}"), {"a": True, "b": None})
+        self.assertIsNone(repair_json("I cannot help with that."))
+
+    def test_coerce_output(self):
+        model, error, repaired = coerce_output(VALID, ValidationResult)
+        self.assertTrue(repaired)
+        self.assertEqual(model.score, 80)
+        model, _, _ = coerce_output({"ValidationResult": {"task_id": "t", "passed": False, "score": 1, "issues": [], "retry_allowed": True}}, ValidationResult)
+        self.assertFalse(model.passed)
+        model, error, _ = coerce_output('{"task_id": "t1"}', ValidationResult)
+        self.assertIsNone(model)
+        self.assertIn("passed", error)
+
+class TestStructuredOutputGuard(unittest.TestCase):
+    def test_repairs_locally_without_retry(self):
+        agent = _Validator(["```json\n" + VALID + "\n```"])
+        call = agent._run("validate")
+        self.assertIsInstance(call.content, ValidationResult)
+        self.assertEqual(len(agent.scripted.prompts), 1)
+
+    def test_reprompts_with_error_then_succeeds(self):
+        before = PARSE_FAILURES[("_Validator", "scripted-model", "invalid")]
+        agent = _Validator(['{"task_id": "t1", "score": "high"}', VALID])
+        call = asyncio.run(agent._arun("validate"))
+        self.assertEqual(call.content.score, 80)
+        self.assertEqual(len(agent.scripted.prompts), 2)
+        self.assertIn("could not be used as a ValidationResult", agent.scripted.prompts[1])
+        self.assertIn('"score": "high"', agent.scripted.prompts[1])
+        self.assertEqual(PARSE_FAILURES[("_Validator", "scripted-model", "invalid")], before + 1)
+
+    def test_gives_up_after_bounded_retries(self):
+        agent = _Validator(["no", "still no", "nope", VALID])
+        with self.assertRaises(StructuredOutputError) as ctx:
+            agent._run("validate")
+        self.assertEqual(ctx.exception.attempts, 3)
+        self.assertEqual(len(agent.scripted.prompts), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import sys
+import os
+import asyncio
+import threading
+import unittest
+from types import SimpleNamespace
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.agents.validator import ValidatorAgent
+from src.models.schemas import Contract, ExecutionResult, ValidationResult
+from src.utils.metrics import MetricsRegistry
+from src.utils.token_budget import TokenBudget, dedupe_sentences, estimate_tokens, split_chunks, trim_extractive
+
+VALID = '{"task_id": "t1", "passed": true, "score": 80, "issues": [], "retry_allowed": false}'
+
+class _RecordingAgent:
+    """Stands in for an Agno Agent: records prompts, always replies VALID."""
+    def __init__(self):
+        self.prompts = []
+        self.output_schema = ValidationResult
+        self._lock = threading.Lock()
+
+    def run(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+        return SimpleNamespace(content=VALID, metrics=None)
+
+    async def arun(self, prompt):
+        return self.run(prompt)
+
+class _Validator(ValidatorAgent):
+    def __init__(self):
+        super().__init__("recording-model", use_cache=False)
+        self.recording = _RecordingAgent()
+        self.budget = TokenBudget({"validator": 500})
+
+    def _build_agent(self):
+        return self.recording
+
+CONTRACT = Contract(contract_id="c1", task_id="t1", selected_worker="w1", deliverables=["A `parse_config` function"],
+                    tests=["`parse_config` returns a dict", "Handles empty files"], payment=10.0, penalty_rules=[])
+
+class TestCompaction(unittest.TestCase):
+    def test_trim_keeps_ends_and_key_lines(self):
+        lines = [f"line {i} " + "x" * 60 for i in range(200)]
+        lines[120] = "def parse_config(path): ..."
+        trimmed = trim_extractive("\n".join(lines), 300, keep=["parse_config"])
+        self.assertLessEqual(estimate_tokens(trimmed), 300)
+        self.assertTrue(trimmed.startswith("line 0 "))
+        self.assertTrue(trimmed.endswith(lines[-1]))
+        self.assertIn("def parse_config", trimmed)
+        self.assertIn("omitted ...]", trimmed)
+        self.assertEqual(trim_extractive("short", 300), "short")
+
+    def test_dedupe_and_chunks(self):
+        self.assertEqual(dedupe_sentences("Write a poem. It must rhyme.  write a  poem. Keep it short."),
+                         "Write a poem. It must rhyme. Keep it short.")
+        self.assertEqual(dedupe_sentences("No repeats here.\nNone."), "No repeats here.\nNone.")
+        # Line and paragraph breaks survive a dedupe, including one before a dropped sentence
+        self.assertEqual(dedupe_sentences("Goal.\n- Parse it.\n- Test it.\n- Parse it.\n\nDone."),
+                         "Goal.\n- Parse it.\n- Test it.\n\nDone.")
+        self.assertEqual(dedupe_sentences("Intro.\n\nSame. Next.\n\nSame. Last."), "Intro.\n\nSame. Next.\n\nLast.")
+        text = "\n".join("y" * 50 for _ in range(100))
+        chunks = split_chunks(text, 100)
+        self.assertEqual("\n".join(chunks), text)
+        self.assertTrue(all(len(c) <= 400 for c in chunks))
+
+class TestChunkedValidation(unittest.TestCase):
+    def test_short_output_is_one_call(self):
+        agent = _Validator()
+        agent.validate_work(CONTRACT, ExecutionResult(task_id="t1", worker_id="w1", output="def parse_config(p): return {}"))
+        self.assertEqual(len(agent.recording.prompts), 1)
+
+    def test_long_output_is_map_reduced_within_budget(self):
+        output = "\n".join(f"step {i}: " + "z" * 70 for i in range(2000)) + "\ndef parse_config(path): return {}"
+        metrics = MetricsRegistry()
+        for validate in (lambda a, r: a.validate_work(CONTRACT, r), lambda a, r: asyncio.run(a.avalidate_work(CONTRACT, r))):
+            agent = _Validator()
+            with metrics.stage("VALIDATOR") as span:
+                validation = validate(agent, ExecutionResult(task_id="t1", worker_id="w1", output=output))
+            self.assertTrue(validation.passed)
+
+            prompts = agent.recording.prompts
+            self.assertEqual(len(prompts), ValidatorAgent.MAX_CHUNKS + 1)
+            for prompt in prompts:
+                # Acceptance tests are never compacted
+                self.assertIn("Handles empty files", prompt)
+                self.assertLessEqual(estimate_tokens(prompt), 600)
+            self.assertTrue(any("part 1 of 4" in p for p in prompts))
+            self.assertIn("def parse_config", "".join(prompts[:-1]))
+            self.assertIn("Part 4: score 80.0, passed", prompts[-1])
+            self.assertGreater(span.prompt_tokens_saved, 0)
+            self.assertEqual(span.prompt_size, sum(estimate_tokens(p) for p in prompts))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import sys
+import os
+import tempfile
+import unittest
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.agents.worker_registry import WorkerRegistry
+from src.models.schemas import TaskSpec, WorkerProfile
+from src.utils.reputation_db import ReputationDB
+
+def make_task(skills):
+    return TaskSpec(task_id="t1", description="d", acceptance_criteria=["c"], budget=100.0, deadline="1 day", required_skills=skills)
+
+class TestWorkerRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.registry = WorkerRegistry([
+            WorkerProfile(agent_id="py", persona="p", skills=["Python"]),
+            WorkerProfile(agent_id="py_sql", persona="p", skills=["python", "sql"]),
+            WorkerProfile(agent_id="writer", persona="p", skills=["writing"]),
+            WorkerProfile(agent_id="generalist", persona="p"),
+        ])
+
+    def test_skill_index_filters_workers(self):
+        ids = [w.agent_id for w in self.registry.select(make_task(["python", "sql"]))]
+        self.assertEqual(ids[0], "py_sql")  # covers both skills
+        self.assertEqual(set(ids), {"py_sql", "py", "generalist"})
+        self.assertEqual(len(self.registry.select(make_task([]))), 4)
+
+    def test_runtime_register_and_unregister(self):
+        self.assertTrue(self.registry.unregister("py_sql"))
+        self.assertFalse(self.registry.unregister("py_sql"))
+        self.registry.register(WorkerProfile(agent_id="writer", persona="p", skills=["sql"]))
+        ids = {w.agent_id for w in self.registry.select(make_task(["sql"]))}
+        self.assertEqual(ids, {"writer", "generalist"})
+        self.assertEqual(self.registry.select(make_task(["writing"]))[0].agent_id, "generalist")
+
+    def test_top_k_prefers_reputation_and_drops_poor_workers(self):
+        db = ReputationDB(os.path.join(self.tmp.name, "rep.sqlite3"), legacy_path=None)
+        db.update_stats("py", True, 95)
+        db.update_stats("generalist", False, 10)
+        ids = [w.agent_id for w in self.registry.select(make_task(["python"]), k=2, rep_db=db)]
+        self.assertEqual(ids, ["py", "py_sql"])
+        ids = {w.agent_id for w in self.registry.select(make_task(["python"]), rep_db=db, min_reputation=30)}
+        self.assertNotIn("generalist", ids)
+
+    def test_selects_from_thousands(self):
+        registry = WorkerRegistry(
+            WorkerProfile(agent_id=f"w{i}", persona="p", skills=[f"skill{i % 50}"], price_min=0.5 + (i % 7) / 10, price_max=0.9 + (i % 7) / 10)
+            for i in range(5000)
+        )
+        workers = registry.select(make_task(["skill3", "skill4"]), k=5)
+        self.assertEqual(len(workers), 5)
+        self.assertTrue(all(int(w.agent_id[1:]) % 50 in (3, 4) for w in workers))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,9 +6,10 @@ import time
 import asyncio
 import importlib
 
-# --- FORCE RELOAD MODULES ---
-# This ensures that when we update agent logic, the UI picks it up immediately
-# without needing a full server restart.
+# --- DEV RELOAD ---
+# With AGENTBAZAAR_RELOAD=1, agent logic changes are picked up on the next rerun
+# without a server restart. Off by default: reloading on every rerun is slow and
+# throws away the cached dashboard state.
 def reload_modules():
     modules = [
         "src.orchestration",
@@ -33,14 +34,25 @@ except RuntimeError:
 # Add src to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-# Reload logic to ensure 'score_bid' and others are available
-reload_modules()
+if os.environ.get("AGENTBAZAAR_RELOAD") == "1":
+    reload_modules()
 
 from src.orchestration import MarketSimulation
-from src.utils.ledger import Ledger
-from src.utils.reputation_db import ReputationDB
+from src.utils.dashboard_data import DashboardData, PAGE_SIZE, page_count
 from src.agents.worker import get_worker_team
 
+# Seconds between feed events; 0 shows them as fast as the agents produce them
+REPLAY_SPEEDS = {"Live": 0.0, "Slow": 0.4, "Demo": 0.8}
+
+@st.cache_resource
+def get_dashboard_data() -> DashboardData:
+    # One instance per server process; each rerun only reads what changed since the last
+    return DashboardData()
+
+@st.cache_resource
+def get_roster():
+    return [(w.agent_id, w.persona) for w in get_worker_team()]
+
 st.set_page_config(page_title="AgentBazaar", layout="wide", page_icon="🤖")
 
 st.markdown("""
@@ -66,39 +78,57 @@ st.markdown('<div class="sub-title">Autonomous Agent Marketplace Simulation</div
 
 # Sidebar
 st.sidebar.markdown("## 📊 Live Market Stats")
-trigger_refresh = st.sidebar.button("🔄 Refresh Data")
-
-ledger = Ledger()
-rep_db = ReputationDB()
+data = get_dashboard_data()
+# Every rerun applies new ledger ops; the button just asks for one
+st.sidebar.button("🔄 Refresh Data", on_click=data.refresh)
+data.refresh()
+replay_delay = REPLAY_SPEEDS[st.sidebar.radio("⏱ Replay speed", list(REPLAY_SPEEDS), horizontal=True)]
+
+def _page_picker(label: str, total: int, key: str) -> int:
+    pages = page_count(total)
+    if pages == 1:
+        return 0
+    return st.number_input(f"{label} page (of {pages})", min_value=1, max_value=pages, value=1, key=key) - 1
 
 with st.sidebar.expander("🏆 Reputation Leaderboard", expanded=True):
-    if rep_db.data:
-        sorted_reps = sorted(rep_db.data.items(), key=lambda x: x[1]['avg_score'], reverse=True)
-        for agent_id, data in sorted_reps:
-            st.markdown(f"**{agent_id}**")
+    total = data.agent_count()
+    if total:
+        page = _page_picker("Leaderboard", total, "leaderboard_page")
+        for rank, stats in enumerate(data.leaderboard_page(page), start=page * PAGE_SIZE + 1):
+            st.markdown(f"**{rank}. {stats.agent_id}**")
             cols = st.columns([3, 1])
-            cols[0].progress(int(data['avg_score']))
-            cols[1].caption(f"{data['avg_score']:.0f}%")
+            cols[0].progress(int(stats.avg_score))
+            cols[1].caption(f"{stats.avg_score:.0f}%")
     else:
         st.info("No reputation data yet.")
 
 with st.sidebar.expander("💰 Escrow Ledger", expanded=True):
-    if ledger.data["locked_funds"]:
-        for cid, data in ledger.data["locked_funds"].items():
-            st.code(f"Contract: {cid[:6]}...\nAmount: ${data['amount']}\nStatus: {data['status']}")
+    if data.locked_funds:
+        st.caption(f"{len(data.locked_funds)} contracts locked, newest first")
+        page = _page_picker("Locked", len(data.locked_funds), "locked_page")
+        for cid, entry in data.locked_page(page):
+            st.code(f"Contract: {cid[:6]}...\nAmount: ${entry['amount']}\nStatus: {entry['status']}")
     else:
         st.caption("No funds currently locked.")
 
+with st.sidebar.expander("🧾 Settlement History", expanded=False):
+    if data.history:
+        page = _page_picker("History", len(data.history), "history_page")
+        for entry in data.history_page(page):
+            st.caption(f"{entry['status']} ${entry['amount']} {entry.get('recipient', '')}".rstrip())
+    else:
+        st.caption("No settlements yet.")
+
 # --- Active Agents Roster ---
 st.markdown("### 👥 Active Agents Marketplace")
-workers = get_worker_team()
-cols = st.columns(len(workers))
-for idx, worker in enumerate(workers):
+roster = get_roster()
+cols = st.columns(len(roster))
+for idx, (agent_id, persona) in enumerate(roster):
     with cols[idx]:
         st.markdown(f"""
         <div class="agent-card">
-            <div class="agent-name">{worker.agent_id}</div>
-            <div class="agent-persona">{worker.persona}</div>
+            <div class="agent-name">{agent_id}</div>
+            <div class="agent-persona">{persona}</div>
         </div>
         """, unsafe_allow_html=True)
 
@@ -118,49 +148,81 @@ with col2:
     st.markdown("### 📡 Live Simulation Feed")
     feed_placeholder = st.empty()
 
+STEP_ICONS = {"WORKERS": "👷", "NEGOTIATOR": "🤝", "CONTRACT": "📜", "EXECUTOR": "⚙️",
+              "VALIDATOR": "✅", "ESCROW": "💰", "FINAL": "🏁"}
+
+def render_event(container, event):
+    step = event.get("step")
+    # Write to history with formatted markdown
+    # st.write or st.markdown appends to the bottom, acting like scrolling log
+    container.markdown(f"### {STEP_ICONS.get(step, '🔹')} {step}")
+    container.info(event.get("message"))
+
+    # Render Data if available
+    if "data" in event:
+        container.markdown("**📦 Data Payload**")
+        container.json(event["data"])
+
+def close_status(status, final):
+    if final is None:
+        status.update(label="⚠️ Transaction Did Not Close", state="error", expanded=True)
+    elif final["status"] == "success":
+        status.update(label="✅ Transaction Complete!", state="complete", expanded=True)
+    else:
+        status.update(label="❌ Transaction Failed", state="error", expanded=True)
+
 if start_btn and user_request:
-    sim = MarketSimulation()
-    
+    sim = MarketSimulation(stream_execution=True)
+    feed, final = [], None
+
     with feed_placeholder.container():
         # Use st.status for the main container to show active "Loading..." state
         with st.status("Agents are working...", expanded=True) as status:
-            
+
             # Container for scrollable logs or cards
             history_container = st.container()
-            
+            live_output = None
+
             for event in sim.run_stream(user_request):
                 step = event.get("step")
                 msg = event.get("message")
-                
+
+                # Streamed executor output grows in place instead of adding a card per chunk
+                if event.get("status") == "partial":
+                    if live_output is None:
+                        streamed = ""
+                        live_output = history_container.empty()
+                    streamed += event["data"]["chunk"]
+                    live_output.code(streamed, language=None)
+                    status.update(label=f"**{step}**: {msg}")
+                    continue
+                live_output = None
+
                 # Update status label to show what is happening currently
                 status.update(label=f"**{step}**: {msg}")
-                
-                # Icon mapping
-                icon = "🔹"
-                if step == "WORKERS": icon = "👷"
-                elif step == "NEGOTIATOR": icon = "🤝"
-                elif step == "CONTRACT": icon = "📜"
-                elif step == "EXECUTOR": icon = "⚙️"
-                elif step == "VALIDATOR": icon = "✅"
-                elif step == "ESCROW": icon = "💰"
-                elif step == "FINAL": icon = "🏁"
-                
-                # Write to history with formatted markdown
-                # st.write or st.markdown appends to the bottom, acting like scrolling log
-                history_container.markdown(f"### {icon} {step}")
-                history_container.info(msg)
-                
-                # Render Data if available
-                if "data" in event:
-                    history_container.markdown("**📦 Data Payload**")
-                    history_container.json(event["data"])
-
-                # UX Pause
-                time.sleep(0.8) 
-                
+                render_event(history_container, event)
+                feed.append(event)
+
+                # Opt-in replay pause, so a demo can be followed step by step
+                if replay_delay:
+                    time.sleep(replay_delay)
+
                 if step == "FINAL":
-                    if event["status"] == "success":
-                        status.update(label="✅ Transaction Complete!", state="complete", expanded=True)
-                        st.balloons()
-                    else:
-                        status.update(label="❌ Transaction Failed", state="error", expanded=True)
+                    final = event
+            close_status(status, final)
+
+    # Rerun so the sidebar shows the settlement and reputation this run wrote; the
+    # feed is kept in the session and drawn again below
+    st.session_state["last_feed"] = {"events": feed, "final": final, "celebrate": final is not None and final["status"] == "success"}
+    data.refresh()
+    st.rerun()
+elif "last_feed" in st.session_state:
+    last = st.session_state["last_feed"]
+    with feed_placeholder.container():
+        with st.status("Last transaction", expanded=True) as status:
+            history_container = st.container()
+            for event in last["events"]:
+                render_event(history_container, event)
+            close_status(status, last["final"])
+    if last.pop("celebrate", False):
+        st.balloons()